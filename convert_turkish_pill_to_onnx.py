@@ -8,13 +8,21 @@ from transformers import ViTForImageClassification, ViTImageProcessor
 import onnx
 from onnxruntime.quantization import quantize_dynamic, QuantType
 import os
+import sys
 from pathlib import Path
 
+# Fusion yardimcilari turkish_pill altinda
+sys.path.insert(0, str(Path(__file__).parent / 'turkish_pill'))
+from optimize_onnx import optimize_vit_onnx, check_top1_parity, compare_latency
+from checkpoints import resolve_checkpoint
+
 # Model yolu
-MODEL_PATH = r"C:\Users\excalibur\Desktop\Projeler\AI Real Project\turkish_pill\models\classification\checkpoint-10350"
-OUTPUT_DIR = r"C:\Users\excalibur\Desktop\Projeler\AI Real Project\turkish_pill\models\classification"
+OUTPUT_DIR = str(Path(__file__).parent / 'turkish_pill' / 'models' / 'classification')
+# Diger scriptlerle ayni kural: TURKISH_PILL_CHECKPOINT verilmediyse en yuksek adim
+MODEL_PATH = str(resolve_checkpoint(OUTPUT_DIR, os.environ.get('TURKISH_PILL_CHECKPOINT')))
 ONNX_MODEL_PATH = os.path.join(OUTPUT_DIR, "classification_150.onnx")
 ONNX_QUANTIZED_PATH = os.path.join(OUTPUT_DIR, "classification_150_quantized.onnx")
+ONNX_OPTIMIZED_PATH = os.path.join(OUTPUT_DIR, "classification_150_optimized.onnx")
 
 def convert_to_onnx():
     """Hugging Face modelini ONNX formatına dönüştür"""
@@ -24,7 +32,7 @@ def convert_to_onnx():
     print("=" * 60)
     
     # 1. Model yükle
-    print("\n[1/5] Model yükleniyor...")
+    print("\n[1/6] Model yükleniyor...")
     try:
         model = ViTForImageClassification.from_pretrained(MODEL_PATH)
         model.eval()
@@ -35,13 +43,13 @@ def convert_to_onnx():
         return False
     
     # 2. Dummy input oluştur
-    print("\n[2/5] Dummy input oluşturuluyor...")
+    print("\n[2/6] Dummy input oluşturuluyor...")
     # ViT input: [batch, channels, height, width] = [1, 3, 224, 224]
     dummy_input = torch.randn(1, 3, 224, 224)
     print(f"✅ Dummy input: {dummy_input.shape}")
     
     # 3. ONNX'a dönüştür
-    print("\n[3/5] ONNX formatına dönüştürülüyor...")
+    print("\n[3/6] ONNX formatına dönüştürülüyor...")
     try:
         torch.onnx.export(
             model,
@@ -67,7 +75,7 @@ def convert_to_onnx():
         return False
     
     # 4. ONNX modelini doğrula
-    print("\n[4/5] ONNX model doğrulanıyor...")
+    print("\n[4/6] ONNX model doğrulanıyor...")
     try:
         onnx_model = onnx.load(ONNX_MODEL_PATH)
         onnx.checker.check_model(onnx_model)
@@ -75,8 +83,26 @@ def convert_to_onnx():
     except Exception as e:
         print(f"⚠️ ONNX doğrulama uyarısı: {e}")
     
+    # 5. Graph optimizasyonu (transformer fusion)
+    print("\n[5/6] Transformer fusion uygulanıyor (Attention, LayerNorm, GELU, BiasAdd)...")
+    try:
+        optimize_vit_onnx(
+            ONNX_MODEL_PATH,
+            ONNX_OPTIMIZED_PATH,
+            num_heads=model.config.num_attention_heads,
+            hidden_size=model.config.hidden_size,
+        )
+        parity_input = torch.randn(8, 3, 224, 224)
+        with torch.no_grad():
+            reference_logits = model(pixel_values=parity_input).logits.numpy()
+        check_top1_parity(reference_logits, ONNX_OPTIMIZED_PATH, parity_input.numpy(), label='Fused ONNX')
+        compare_latency(ONNX_MODEL_PATH, ONNX_OPTIMIZED_PATH)
+    except Exception as e:
+        print(f"⚠️ Optimizasyon hatası: {e}")
+        print("   Optimizasyon olmadan devam edilebilir")
+    
     # 5. Quantization (opsiyonel ama önerilir)
-    print("\n[5/5] Quantization yapılıyor (INT8)...")
+    print("\n[6/6] Quantization yapılıyor (INT8)...")
     try:
         quantize_dynamic(
             ONNX_MODEL_PATH,
@@ -98,6 +124,8 @@ def convert_to_onnx():
     print("=" * 60)
     print(f"\n📁 Çıktı dosyaları:")
     print(f"   - Full model: {ONNX_MODEL_PATH}")
+    if os.path.exists(ONNX_OPTIMIZED_PATH):
+        print(f"   - Optimize model: {ONNX_OPTIMIZED_PATH}")
     if os.path.exists(ONNX_QUANTIZED_PATH):
         print(f"   - Quantized model: {ONNX_QUANTIZED_PATH} (ÖNERİLEN)")
     print(f"\n💡 Sonraki adım: Model dosyasını PharmaApp/assets/ klasörüne kopyalayın")
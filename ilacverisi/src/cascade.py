@@ -0,0 +1,212 @@
+"""
+Detector Sınıfı Kısayolu (Cascade)
+YOLO detector ilaç bazında sınıflarla eğitildiği için, detector yeterince
+eminse ViT hiç çalıştırılmadan detector'ın sınıfı döndürülür.
+
+- Kutu güveni: en iyi kutunun conf değeri
+- Sınıf olasılığı: YOLOv8 NMS sınıf bazında olduğundan aynı konumda farklı
+  sınıflı kutular kalabilir; en iyi kutunun conf'u, onunla örtüşen (IoU) tüm
+  kutuların conf toplamına bölünür (rakip sınıf yoksa 1.0)
+- Eşikler valid split'inde, kısayol alınan görüntülerde detector sınıfının
+  ViT sonucu ile uyumu hedef oranı sağlayacak şekilde otomatik kalibre edilir
+  (en yüksek kısayol oranı seçilir) ve JSON olarak kaydedilir.
+
+Kalibrasyon:
+    python src/cascade.py --target-agreement 0.99
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+def _box_iou(box, boxes):
+    """Tek kutu ile kutu dizisi arasındaki IoU"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+def class_probabilities(xyxy, conf, cls, best_idx, iou_threshold=0.5):
+    """
+    En iyi kutunun konumundaki sınıf dağılımı
+
+    Args:
+        xyxy, conf, cls: detector kutuları (numpy)
+        best_idx: en yüksek conf'lu kutu
+    Returns:
+        dict: sınıf id -> olasılık (toplam 1)
+    """
+    overlapping = _box_iou(xyxy[best_idx], xyxy) >= iou_threshold
+    scores = {}
+    for class_id, score in zip(cls[overlapping].astype(int), conf[overlapping]):
+        # Aynı sınıftan birden fazla kutu: en güçlüsü sayılır
+        scores[int(class_id)] = max(scores.get(int(class_id), 0.0), float(score))
+    total = sum(scores.values())
+    return {class_id: score / total for class_id, score in scores.items()}
+
+def select_packages(xyxy, conf, conf_threshold=0.5, iou_threshold=0.5):
+    """
+    Çoklu paket modu: sınıftan bağımsız NMS
+
+    Sınıf bazında NMS aynı paket için farklı sınıflı kutular bırakabilir; bunlar
+    tek pakete indirgenir (rakipler class_probabilities ile değerlendirilir).
+
+    Returns:
+        list: conf_threshold'u geçen paket kutularının indeksleri (conf azalan)
+    """
+    kept = []
+    for idx in np.argsort(-conf):
+        if conf[idx] < conf_threshold:
+            break
+        if not kept or (_box_iou(xyxy[idx], xyxy[kept]) < iou_threshold).all():
+            kept.append(int(idx))
+    return kept
+
+def calibrate(records, target_agreement=0.99, min_shortcuts=20, grid=None):
+    """
+    Kısayol eşiklerini kalibre et
+
+    Args:
+        records: [{'box_confidence', 'class_probability', 'detector_class', 'classifier_class', 'label'}]
+        target_agreement: Kısayol alınan görüntülerde detector == ViT oranı alt sınırı
+        min_shortcuts: Uyum oranının anlamlı olması için gereken en az kısayol sayısı
+    Returns:
+        dict: eşikler ve valid split istatistikleri (hedef sağlanamazsa None)
+    """
+    if grid is None:
+        grid = np.round(np.arange(0.50, 1.00, 0.01), 2)
+    box_conf = np.array([r['box_confidence'] for r in records])
+    class_prob = np.array([r['class_probability'] for r in records])
+    agree = np.array([r['detector_class'] == r['classifier_class'] for r in records])
+    correct = np.array([r['detector_class'] == r['label'] for r in records])
+    classifier_correct = np.array([r['classifier_class'] == r['label'] for r in records])
+
+    best = None
+    for box_threshold in grid:
+        for prob_threshold in grid:
+            mask = (box_conf >= box_threshold) & (class_prob >= prob_threshold)
+            shortcuts = int(mask.sum())
+            if shortcuts < min_shortcuts:
+                continue
+            agreement = float(agree[mask].mean())
+            if agreement < target_agreement:
+                continue
+            # En yüksek kısayol oranı; eşitlikte daha sıkı eşikler
+            key = (shortcuts, box_threshold + prob_threshold)
+            if best is None or key > best[0]:
+                final_correct = np.where(mask, correct, classifier_correct)
+                best = (key, {
+                    'box_confidence': float(box_threshold),
+                    'class_probability': float(prob_threshold),
+                    'target_agreement': target_agreement,
+                    'agreement': agreement,
+                    'shortcut_rate': shortcuts / len(records),
+                    'shortcut_accuracy': float(correct[mask].mean()),
+                    'cascade_accuracy': float(final_correct.mean()),
+                    'classifier_accuracy': float(classifier_correct.mean()),
+                    'images': len(records),
+                })
+    return best[1] if best else None
+
+def load_calibration(path):
+    """Kalibrasyon dosyasını yükle (yoksa None)"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def collect_records(inference, images_dir, labels_dir, class_names, conf_threshold=0.5, max_images=None):
+    """Her görüntü için detector ve ViT sonucunu topla (cascade kapalı)"""
+    from PIL import Image
+    from tqdm import tqdm
+
+    image_files = sorted(list(Path(images_dir).glob('*.jpg')) + list(Path(images_dir).glob('*.png')))
+    if max_images:
+        image_files = image_files[:max_images]
+    if not image_files:
+        raise FileNotFoundError(f"Görüntü bulunamadı: {images_dir}")
+
+    records = []
+    for img_path in tqdm(image_files, desc="Kalibrasyon"):
+        label_path = Path(labels_dir) / (img_path.stem + '.txt')
+        label = None
+        if label_path.exists():
+            with open(label_path, 'r', encoding='utf-8') as f:
+                first_line = f.readline().split()
+            if first_line:
+                label = class_names[int(first_line[0])]
+
+        image = Image.open(img_path).convert('RGB')
+        detection = inference.detect(image, conf_threshold=conf_threshold)
+        if detection is None or detection['class_name'] is None:
+            continue
+        classifier_class, _, _ = inference.classify(inference.crop_image(image, detection['bbox']))
+        records.append({
+            'image': img_path.name,
+            'box_confidence': detection['confidence'],
+            'class_probability': detection['class_probability'],
+            'detector_class': detection['class_name'],
+            'classifier_class': classifier_class,
+            'label': label,
+        })
+    return records
+
+def main():
+    """Valid split'inde eşikleri kalibre et"""
+    import argparse
+    from inference import MedicineInference
+
+    parser = argparse.ArgumentParser(description="Detector sınıfı kısayolu kalibrasyonu")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--split', default='valid')
+    parser.add_argument('--target-agreement', type=float, help="Varsayılan: config cascade.target_agreement")
+    parser.add_argument('--min-shortcuts', type=int, default=20)
+    parser.add_argument('--max-images', type=int)
+    parser.add_argument('--output', help="Varsayılan: config cascade.calibration")
+    args = parser.parse_args()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    cascade_config = config.get('cascade') or {}
+    target = args.target_agreement or cascade_config.get('target_agreement', 0.99)
+    output = Path(args.output or cascade_config.get('calibration', 'models/detection/cascade.json'))
+
+    inference = MedicineInference(config_path=args.config)
+    # Kalibrasyon her görüntüde ViT sonucuna ihtiyaç duyar; sınıf olasılığı
+    # inference ile aynı rakip kutu eşiğiyle hesaplanır
+    inference.cascade = None
+    inference.competitor_conf = cascade_config.get('competitor_conf', 0.1)
+
+    dataset_path = Path(config['data']['dataset_path'])
+    records = collect_records(
+        inference, dataset_path / args.split / 'images', dataset_path / args.split / 'labels',
+        inference.class_names, max_images=args.max_images,
+    )
+    result = calibrate(records, target_agreement=target, min_shortcuts=args.min_shortcuts)
+
+    print("\n" + "="*50)
+    print(f"CASCADE KALİBRASYONU ({args.split}, {len(records)} tespit)")
+    print("="*50)
+    if result is None:
+        print(f"⚠ Hedef uyum ({target:.1%}) hiçbir eşik çiftiyle sağlanamadı; kısayol kullanılmamalı")
+        return
+    print(f"Kutu güveni eşiği: {result['box_confidence']:.2f}")
+    print(f"Sınıf olasılığı eşiği: {result['class_probability']:.2f}")
+    print(f"Uyum (kısayol, detector == ViT): {result['agreement']:.2%} (hedef {target:.1%})")
+    print(f"Kısayol oranı (ViT atlanır): {result['shortcut_rate']:.2%}")
+    print(f"Doğruluk: ViT {result['classifier_accuracy']:.2%} -> cascade {result['cascade_accuracy']:.2%}")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(dict(result, split=args.split), f, indent=2)
+    print(f"\n✓ Kalibrasyon kaydedildi: {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+CPU Inference Optimizasyonu (ViT)
+ONNX kullanılamayan ortamlarda PyTorch ViT modelini CPU için hazırlar:
+- Linear katmanlarına dinamik INT8 quantization (ağırlıklar int8, aktivasyonlar çalışma anında)
+- channels_last girdi (patch embedding Conv2d)
+- Opsiyonel TorchScript trace veya torch.compile
+- Opsiyonel token merging (token_merging.py, CPU/GPU fark etmez)
+
+MedicineInference ve turkish_pill PillClassifier tarafından kullanılır.
+"""
+
+import io
+import torch
+
+from token_merging import apply_token_merging
+
+COMPILE_MODES = (None, 'trace', 'compile')
+
+class LogitsModule(torch.nn.Module):
+    """HF modelini pixel_values -> logits tensörüne indirger (trace/compile için)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+def quantize_dynamic_int8(model):
+    """Tüm nn.Linear katmanlarını dinamik INT8'e çevir (sadece CPU)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def prepare_classifier(model, quantize=False, channels_last=False, compile_mode=None,
+                       image_size=224, threads=None, merge_ratio=0.0):
+    """
+    Sınıflandırma modelini inference için hazırla
+
+    Args:
+        model: ViTForImageClassification (eval, CPU'da)
+        quantize: Linear katmanlarına dinamik INT8
+        channels_last: Girdi ve Conv ağırlıkları NHWC bellek düzeninde
+        compile_mode: None, 'trace' (TorchScript) veya 'compile' (torch.compile)
+        image_size: Trace için örnek girdi boyutu
+        threads: torch.set_num_threads (None: değiştirme)
+        merge_ratio: Katman başına birleştirilecek token oranı (0: kapalı)
+
+    Returns:
+        (model, forward): forward(pixel_values) -> logits; torch.inference_mode içinde çağrılmalı
+    """
+    if compile_mode not in COMPILE_MODES:
+        raise ValueError(f"Bilinmeyen compile modu: {compile_mode} (trace / compile)")
+    if threads:
+        torch.set_num_threads(threads)
+
+    model.eval()
+    if quantize:
+        model = quantize_dynamic_int8(model)
+    # Hook'lar trace'ten önce eklenmeli
+    apply_token_merging(model, merge_ratio)
+
+    module = LogitsModule(model).eval()
+    if channels_last:
+        module = module.to(memory_format=torch.channels_last)
+
+    if compile_mode == 'trace':
+        example = torch.randn(1, 3, image_size, image_size)
+        if channels_last:
+            example = example.contiguous(memory_format=torch.channels_last)
+        # inference_mode tensörleri trace edilemez; tek thread ile çalıştırılır
+        # (pre-fork parent'ta OpenMP havuzu fork öncesi açılmasın)
+        previous = torch.get_num_threads()
+        torch.set_num_threads(1)
+        try:
+            with torch.no_grad():
+                module = torch.jit.trace(module, example, strict=False)
+        finally:
+            torch.set_num_threads(previous)
+    elif compile_mode == 'compile':
+        module = torch.compile(module)
+
+    def forward(pixel_values):
+        if channels_last:
+            pixel_values = pixel_values.contiguous(memory_format=torch.channels_last)
+        return module(pixel_values)
+
+    return model, forward
+
+def model_size_mb(model):
+    """state_dict serileştirilmiş boyutu (quantize modelde paketlenmiş ağırlıklar dahil)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
@@ -0,0 +1,246 @@
+"""
+Yüke Göre Kalite Kontrolü (Degradation)
+Trafik artışında her isteğe tam kalite (tam çözünürlük detection, ViT, OCR)
+uygulamak kuyruğu büyütür ve herkesin gecikmesini patlatır. QualityController
+MedicineInference.predict'i sarar; eşzamanlı istek sayısı ve son isteklerin p99
+gecikmesine göre config'deki seviyeler arasında adım adım iner / çıkar.
+
+Seviyeler (sırayla, her biri öncekileri de içerir):
+    full             tam kalite
+    no_ocr           OCR kapalı
+    low_res          detection tek geçiş, düşük çözünürlükte (low_size)
+    fast_classifier  student veya INT8 sınıflandırıcı (load_fast_classifier)
+    shed             kuyruk max_queue'yu aşarsa yeni istek reddedilir
+
+- Aşırı yük: kuyruk > max_queue veya p99 > latency_target -> bir seviye yukarı
+- Rahatlama: kuyruk <= max_queue * recover_ratio ve p99 < latency_target * recover_ratio
+  -> bir seviye aşağı
+- Seviye en fazla step_interval saniyede bir değişir (salınım olmaz); seviye
+  değişince gecikme penceresi sıfırlanır (eski seviyenin ölçümleri karar vermez)
+- Her sonuç 'quality_level' (0 = full) ve 'quality_mode' ile işaretlenir
+
+Kullanım:
+    controller = inference.quality_controller()
+    result = controller.predict(image, use_ocr=True)
+
+    python src/degradation.py --concurrency 16 --requests 400
+"""
+
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from metrics import REGISTRY
+
+LEVELS = ('full', 'no_ocr', 'low_res', 'fast_classifier', 'shed')
+
+class QualityController:
+    """Kuyruk derinliği ve p99 gecikmeye göre predict kalitesini ayarlar"""
+
+    def __init__(self, inference, levels=LEVELS[1:], latency_target=1.0, max_queue=8, window=50,
+                 min_samples=10, step_interval=2.0, recover_ratio=0.5, low_size=320,
+                 fast_classifier=None, queue_depth=None):
+        """
+        Args:
+            inference: MedicineInference
+            levels: Sırayla uygulanacak degradation seviyeleri ('full' her zaman ilk seviye)
+            latency_target: p99 gecikme hedefi (saniye)
+            max_queue: Eşzamanlı istek sınırı (aşılırsa seviye artar, shed seviyesinde reddedilir)
+            window: p99 için tutulan son istek sayısı
+            min_samples: Gecikmeye göre karar için gereken en az ölçüm
+            step_interval: İki seviye değişimi arasındaki en kısa süre (saniye)
+            recover_ratio: Seviye düşürmek için eşiklerin bu oranının altına inilmeli
+            low_size: low_res seviyesinde YOLO giriş boyutu
+            fast_classifier: load_fast_classifier argümanları ({'checkpoint', 'quantize'})
+            queue_depth: Dış kuyruk derinliği fonksiyonu (ör. sunucu / worker havuzu bekleyenleri)
+        """
+        unknown = [level for level in levels if level not in LEVELS[1:]]
+        if unknown:
+            raise ValueError(f"Bilinmeyen degradation seviyesi: {', '.join(unknown)} ({', '.join(LEVELS[1:])})")
+        # Seviyeler her zaman LEVELS sırasıyla uygulanır
+        self.levels = ['full'] + [level for level in LEVELS[1:] if level in levels]
+        self.inference = inference
+        self.latency_target = latency_target
+        self.max_queue = max_queue
+        self.min_samples = min_samples
+        self.step_interval = step_interval
+        self.recover_ratio = recover_ratio
+        self.low_size = low_size
+        self.queue_depth = queue_depth
+
+        # Hızlı sınıflandırıcı yük gelmeden önce yüklenir ve ısıtılır
+        if 'fast_classifier' in self.levels and not inference.load_fast_classifier(**(fast_classifier or {})):
+            self.levels.remove('fast_classifier')
+
+        self.level = 0
+        self.latencies = deque(maxlen=window)
+        self.inflight = 0
+        self.last_change = time.monotonic()
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+        self.metrics = {
+            'level': REGISTRY.gauge('medicine_quality_level', 'Geçerli degradation seviyesi (0: tam kalite)'),
+            'requests': REGISTRY.counter('medicine_quality_requests_total', 'Degradation seviyesine göre istekler'),
+            'shed': REGISTRY.counter('medicine_shed_requests_total', 'Aşırı yükte reddedilen istekler'),
+        }
+        self.metrics['level'].set(0)
+
+    @property
+    def mode(self):
+        return self.levels[self.level]
+
+    def p99(self):
+        """Son istekler üzerinden p99 gecikme (yeterli ölçüm yoksa None)"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return float(np.percentile(self.latencies, 99))
+
+    def _update(self, depth):
+        """Kuyruk ve gecikmeye göre seviyeyi en fazla bir adım değiştir (lock altında)"""
+        now = time.monotonic()
+        if now - self.last_change < self.step_interval:
+            return
+        p99 = self.p99()
+        overloaded = depth > self.max_queue or (p99 is not None and p99 > self.latency_target)
+        relaxed = (depth <= self.max_queue * self.recover_ratio
+                   and p99 is not None and p99 < self.latency_target * self.recover_ratio)
+        if overloaded and self.level < len(self.levels) - 1:
+            step = 1
+        elif relaxed and self.level > 0:
+            step = -1
+        else:
+            return
+
+        previous = self.mode
+        self.level += step
+        self.last_change = now
+        self.latencies.clear()
+        self.metrics['level'].set(self.level)
+        p99_text = f"{p99 * 1000:.0f} ms" if p99 is not None else "-"
+        print(f"{'⚠' if step > 0 else '✓'} Kalite seviyesi: {previous} -> {self.mode} "
+              f"(kuyruk {depth}, p99 {p99_text})")
+
+    def options(self, level=None):
+        """Seviyenin predict argümanları (öncekilerin degradation'ları dahil)"""
+        active = self.levels[:(self.level if level is None else level) + 1]
+        options = {}
+        if 'no_ocr' in active:
+            options['use_ocr'] = False
+        if 'low_res' in active:
+            options['detection_size'] = self.low_size
+        if 'fast_classifier' in active:
+            options['fast_classifier'] = True
+        return options
+
+    def predict(self, image_path_or_pil, **kwargs):
+        """
+        Seviyeye göre predict; aşırı yükte reddedilen istek hata ile döner
+
+        Returns:
+            dict: predict() sonucu + 'quality_level', 'quality_mode'
+                  (reddedilirse 'error' ve 'shed': True)
+        """
+        with self.lock:
+            depth = self.inflight + (self.queue_depth() if self.queue_depth else 0)
+            self._update(depth)
+            level, mode = self.level, self.mode
+            if mode == 'shed' and depth >= self.max_queue:
+                self.counts['rejected'] += 1
+                self.metrics['shed'].inc()
+                return {
+                    'class_name': None, 'confidence': 0.0, 'detection_confidence': 0.0, 'bbox': None,
+                    'all_probs': {}, 'ocr_text': None, 'error': 'Sistem yoğun, istek reddedildi',
+                    'shed': True, 'quality_level': level, 'quality_mode': mode,
+                }
+            self.inflight += 1
+
+        start = time.perf_counter()
+        try:
+            result = self.inference.predict(image_path_or_pil, **dict(kwargs, **self.options(level)))
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.inflight -= 1
+                # Seviye bu istek sürerken değiştiyse ölçüm yeni seviyeye ait değil
+                if level == self.level:
+                    self.latencies.append(elapsed)
+
+        with self.lock:
+            self.counts[mode] += 1
+        self.metrics['requests'].inc(mode=mode)
+        result['quality_level'] = level
+        result['quality_mode'] = mode
+        return result
+
+    def stats(self):
+        """Seviye bazında sunulan istek oranları ve reddedilenler"""
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.get(mode, 0) for mode in self.levels) or 1
+        return {
+            'mode': self.mode,
+            'levels': {mode: counts.get(mode, 0) / total for mode in self.levels},
+            'rejected': counts.get('rejected', 0),
+            'p99': self.p99(),
+        }
+
+def run_load(predict, images, concurrency, requests):
+    """requests isteği concurrency eşzamanlı istemciyle gönder; (sonuçlar, gecikmeler) döndür"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def call(index):
+        start = time.perf_counter()
+        result = predict(images[index % len(images)])
+        return result, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outputs = list(pool.map(call, range(requests)))
+    return [r for r, _ in outputs], np.array([t for _, t in outputs])
+
+def main():
+    """Eşzamanlı yük altında controller'lı ve controller'sız gecikme karşılaştırması"""
+    import argparse
+    from pathlib import Path
+    import yaml
+    from PIL import Image
+    from inference import MedicineInference
+
+    parser = argparse.ArgumentParser(description="Yüke göre kalite kontrolü (degradation) testi")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--max-images', type=int, default=50)
+    parser.add_argument('--no-baseline', action='store_true', help="Controller'sız ölçümü atla")
+    args = parser.parse_args()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    images_dir = Path(config['data']['dataset_path']) / 'test' / 'images'
+    images = [Image.open(p).convert('RGB') for p in sorted(images_dir.glob('*.jpg'))[:args.max_images]]
+    if not images:
+        raise FileNotFoundError(f"Görüntü bulunamadı: {images_dir}")
+
+    inference = MedicineInference(config_path=args.config)
+    runs = []
+    if not args.no_baseline:
+        runs.append(('Tam kalite', lambda image: inference.predict(image, use_ocr=True)))
+    controller = inference.quality_controller()
+    runs.append(('Controller', lambda image: controller.predict(image, use_ocr=True)))
+
+    print("\n" + "="*60)
+    print(f"YÜK TESTİ ({args.requests} istek, {args.concurrency} eşzamanlı)")
+    print("="*60)
+    for name, predict in runs:
+        results, latencies = run_load(predict, images, args.concurrency, args.requests)
+        shed = sum(1 for r in results if r.get('shed'))
+        print(f"{name:<12} p50 {np.percentile(latencies, 50) * 1000:>7.0f} ms   "
+              f"p99 {np.percentile(latencies, 99) * 1000:>7.0f} ms   reddedilen {shed}")
+
+    for mode, share in controller.stats()['levels'].items():
+        print(f"   {mode}: {share:.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Uçtan Uca ONNX Inference
+Tek ONNX modeli (detection + crop + classification) ile tahmin yapar.
+MedicineInference.predict ile aynı sonuç formatını döndürür.
+"""
+
+import sys
+import yaml
+from pathlib import Path
+from PIL import Image
+import numpy as np
+
+# Autotune profilli session (turkish_pill/ort_session.py)
+PILL_SRC = Path(__file__).resolve().parent.parent.parent / 'turkish_pill'
+if str(PILL_SRC) not in sys.path:
+    sys.path.append(str(PILL_SRC))
+from ort_session import create_session
+
+class EndToEndInference:
+    """Tek session çalıştırmasıyla ilaç tanıma"""
+
+    def __init__(self, config_path='config.yaml', model_path=None):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.config = yaml.safe_load(f)
+
+        model_path = Path(model_path or self.config['models'].get('e2e_onnx', 'models/e2e/medicine_e2e.onnx'))
+        if not model_path.exists():
+            raise FileNotFoundError(f"Uçtan uca model bulunamadı: {model_path} (python src/export_e2e_onnx.py)")
+
+        print(f"Uçtan uca model yükleniyor: {model_path}")
+        self.session = create_session(model_path)
+        self.class_names = self._load_class_names()
+        print(f"✓ Model yüklendi ({len(self.class_names)} sınıf)")
+
+    def _load_class_names(self):
+        """Sınıf isimlerini yükle"""
+        data_yaml = Path(self.config['data']['dataset_path']) / 'data.yaml'
+        with open(data_yaml, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f)['names']
+
+    def predict(self, image_path_or_pil, conf_threshold=0.5):
+        """
+        Tahmin yap
+        Returns: MedicineInference.predict ile aynı anahtarlar (OCR hariç)
+        """
+        if isinstance(image_path_or_pil, (str, Path)):
+            image = Image.open(image_path_or_pil).convert('RGB')
+        else:
+            image = image_path_or_pil.convert('RGB')
+
+        images = np.asarray(image, dtype=np.uint8)[None]
+        bbox, det_conf, class_index, confidence, probs = self.session.run(None, {'images': images})
+
+        det_confidence = float(det_conf[0])
+        if det_confidence < conf_threshold:
+            return {
+                'class_name': None,
+                'confidence': 0.0,
+                'detection_confidence': 0.0,
+                'bbox': None,
+                'all_probs': {},
+                'ocr_text': None,
+                'error': 'İlaç kutusu tespit edilemedi'
+            }
+
+        return {
+            'class_name': self.class_names[int(class_index[0])],
+            'confidence': float(confidence[0]),
+            'detection_confidence': det_confidence,
+            'bbox': bbox[0].tolist(),
+            'all_probs': {name: float(p) for name, p in zip(self.class_names, probs[0])},
+            'ocr_text': None,
+        }
+
+def check_parity(config_path='config.yaml', split='test', max_images=200, conf_threshold=0.5):
+    """
+    Uçtan uca ONNX modelini mevcut MedicineInference.predict ile karşılaştır
+
+    Returns:
+        dict: sınıf uyumu, tespit uyumu, kutu IoU ve gecikme özetleri
+    """
+    import time
+    from inference import MedicineInference
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    images_dir = Path(config['data']['dataset_path']) / split / 'images'
+    image_files = sorted(list(images_dir.glob('*.jpg')) + list(images_dir.glob('*.png')))[:max_images]
+    if not image_files:
+        raise FileNotFoundError(f"Görüntü bulunamadı: {images_dir}")
+
+    reference = MedicineInference(config_path)
+    e2e = EndToEndInference(config_path)
+
+    detection_agree = 0
+    class_agree = 0
+    both_detected = 0
+    ious = []
+    ref_times, e2e_times = [], []
+
+    for img_path in image_files:
+        image = Image.open(img_path).convert('RGB')
+
+        start = time.perf_counter()
+        ref = reference.predict(image, use_ocr=False, conf_threshold=conf_threshold)
+        ref_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        out = e2e.predict(image, conf_threshold=conf_threshold)
+        e2e_times.append(time.perf_counter() - start)
+
+        ref_detected = ref['bbox'] is not None
+        e2e_detected = out['bbox'] is not None
+        detection_agree += int(ref_detected == e2e_detected)
+        if ref_detected and e2e_detected:
+            both_detected += 1
+            class_agree += int(ref['class_name'] == out['class_name'])
+            ious.append(_iou(ref['bbox'], out['bbox']))
+
+    n = len(image_files)
+    summary = {
+        'images': n,
+        'detection_agreement': detection_agree / n,
+        'class_agreement': class_agree / both_detected if both_detected else 0.0,
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+        'reference_ms': float(np.mean(ref_times) * 1000),
+        'e2e_ms': float(np.mean(e2e_times) * 1000),
+    }
+
+    print("\n" + "="*50)
+    print("PARİTE SONUÇLARI (MedicineInference vs uçtan uca ONNX)")
+    print("="*50)
+    print(f"Görüntü: {n} ({split})")
+    print(f"Tespit uyumu: {summary['detection_agreement']:.2%}")
+    print(f"Sınıf uyumu (ikisi de tespit etti): {summary['class_agreement']:.2%}")
+    print(f"Ortalama kutu IoU: {summary['mean_iou']:.3f}")
+    print(f"Gecikme: {summary['reference_ms']:.1f} ms -> {summary['e2e_ms']:.1f} ms")
+    return summary
+
+def _iou(a, b):
+    """İki kutu arasındaki IoU"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def main():
+    """Test için main fonksiyonu"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Uçtan uca ONNX inference")
+    parser.add_argument('image', nargs='?', help="Görüntü yolu")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--parity', action='store_true', help="MedicineInference.predict ile karşılaştır")
+    parser.add_argument('--split', default='test')
+    parser.add_argument('--max-images', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.parity:
+        check_parity(args.config, split=args.split, max_images=args.max_images)
+        return
+    if not args.image:
+        parser.error("Görüntü yolu veya --parity gerekli")
+
+    result = EndToEndInference(args.config).predict(args.image)
+    print(f"Sınıf: {result['class_name']}")
+    print(f"Güven: {result['confidence']:.2%}")
+    print(f"Detection Güven: {result['detection_confidence']:.2%}")
+    print(f"Kutu: {result['bbox']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Early-Exit ViT
+Ara encoder katmanlarına hafif sınıflandırıcı head'ler (LayerNorm + Linear, CLS
+token'ı üzerinde) ekler. Eğitimde tüm head'ler ana head ile birlikte eğitilir;
+inference'ta güveni eşiği geçen ilk head'de durulur.
+
+- Checkpoint'ler standart HF formatındadır (config.early_exit_layers);
+  ViTForImageClassification ile yüklenirse exit head'ler yok sayılır.
+- ONNX: model, exit noktalarında bölünmüş segment graph'ları olarak export
+  edilir (her segment: hidden_states + probs çıktısı). EarlyExitOnnx segmentleri
+  sırayla çalıştırır ve eşik geçildiğinde durur.
+"""
+
+import json
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+from transformers import ViTForImageClassification
+from transformers.modeling_outputs import ImageClassifierOutput
+
+@dataclass
+class EarlyExitClassifierOutput(ImageClassifierOutput):
+    """ImageClassifierOutput + ara head logit'leri (sadece eğitimde)"""
+    exit_logits: Optional[Tuple[torch.FloatTensor, ...]] = None
+
+class ExitHead(torch.nn.Module):
+    """CLS token'ı üzerinde LayerNorm + Linear"""
+
+    def __init__(self, config):
+        super().__init__()
+        self.layernorm = torch.nn.LayerNorm(config.hidden_size, eps=config.layer_norm_eps)
+        self.classifier = torch.nn.Linear(config.hidden_size, config.num_labels)
+
+    def forward(self, hidden_states):
+        return self.classifier(self.layernorm(hidden_states[:, 0]))
+
+class ViTEarlyExitForImageClassification(ViTForImageClassification):
+    """
+    Ara katman head'li ViT
+
+    Yükleme: ViTEarlyExitForImageClassification.from_pretrained(path, early_exit_layers=[4, 6, 8, 10])
+    Katman numaraları 1'den başlar (4 = 4. encoder katmanının çıkışı).
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.exit_layers = sorted(int(layer) for layer in getattr(config, 'early_exit_layers', None) or [])
+        if any(not 1 <= layer < config.num_hidden_layers for layer in self.exit_layers):
+            raise ValueError(f"Early-exit katmanları 1..{config.num_hidden_layers - 1} aralığında olmalı")
+        self.exit_heads = torch.nn.ModuleList(ExitHead(config) for _ in self.exit_layers)
+        self.exit_heads.apply(self._init_weights)
+
+    def forward(self, pixel_values=None, head_mask=None, labels=None, output_attentions=None,
+                output_hidden_states=None, interpolate_pos_encoding=None, return_dict=None):
+        return_dict = return_dict if return_dict is not None else self.config.use_return_dict
+        output_hidden_states = (output_hidden_states if output_hidden_states is not None
+                                else self.config.output_hidden_states)
+        # Eğitimde exit head'ler için ara katman çıkışları her zaman gerekir
+        outputs = self.vit(
+            pixel_values,
+            head_mask=head_mask,
+            output_attentions=output_attentions,
+            output_hidden_states=output_hidden_states or self.training,
+            interpolate_pos_encoding=interpolate_pos_encoding,
+            return_dict=True,
+        )
+        logits = self.classifier(outputs[0][:, 0, :])
+
+        exit_logits = None
+        if self.training:
+            # hidden_states[k] = k. katmanın çıkışı (0 = embedding)
+            exit_logits = tuple(head(outputs.hidden_states[layer])
+                                for layer, head in zip(self.exit_layers, self.exit_heads))
+
+        loss = None
+        if labels is not None:
+            loss_fct = torch.nn.CrossEntropyLoss()
+            losses = [loss_fct(l.view(-1, self.num_labels), labels.view(-1)) for l in (logits,) + (exit_logits or ())]
+            loss = sum(losses) / len(losses)
+
+        output = EarlyExitClassifierOutput(
+            loss=loss,
+            logits=logits,
+            hidden_states=outputs.hidden_states if output_hidden_states else None,
+            attentions=outputs.attentions,
+            exit_logits=exit_logits,
+        )
+        return output if return_dict else output.to_tuple()
+
+def exit_head_loss(loss, exit_logits, labels, loss_fct):
+    """Ana loss ile ara head loss'larının ortalaması (WeightedTrainer için)"""
+    if not exit_logits:
+        return loss
+    losses = [loss] + [loss_fct(l.view(-1, l.shape[-1]), labels.view(-1)) for l in exit_logits]
+    return sum(losses) / len(losses)
+
+def _layer_output(output):
+    return output[0] if isinstance(output, tuple) else output
+
+def predict_early_exit(model, pixel_values, threshold=0.9):
+    """
+    Katman katman çalıştır, güveni eşiği geçen ilk head'de dur
+
+    Batch'te her örnek kendi çıkış katmanını alır; tüm örnekler çıkınca durulur.
+
+    Returns:
+        (probs [B, C], exit_layer [B]) - son katmanda çıkanlar için exit_layer = num_hidden_layers
+    """
+    vit = model.vit
+    layers = vit.encoder.layer
+    heads = dict(zip(model.exit_layers, model.exit_heads))
+
+    hidden = vit.embeddings(pixel_values)
+    probs = None
+    exit_layer = torch.full((pixel_values.shape[0],), len(layers), dtype=torch.long, device=pixel_values.device)
+    done = torch.zeros(pixel_values.shape[0], dtype=torch.bool, device=pixel_values.device)
+
+    for index, layer in enumerate(layers, start=1):
+        hidden = _layer_output(layer(hidden))
+        if index not in heads:
+            continue
+        head_probs = torch.softmax(heads[index](hidden), dim=-1)
+        exits = ~done & (head_probs.max(dim=-1).values >= threshold)
+        if probs is None:
+            probs = torch.zeros_like(head_probs)
+        probs[exits] = head_probs[exits]
+        exit_layer[exits] = index
+        done |= exits
+        if bool(done.all()):
+            return probs, exit_layer
+
+    final_probs = torch.softmax(model.classifier(vit.layernorm(hidden)[:, 0]), dim=-1)
+    if probs is None:
+        return final_probs, exit_layer
+    probs[~done] = final_probs[~done]
+    return probs, exit_layer
+
+def format_exit_distribution(counts, num_layers):
+    """Çıkış katmanı dağılımı ve ortalama çalıştırılan katman sayısı"""
+    total = sum(counts.values()) or 1
+    lines = [f"   Katman {layer:>2}: {count:>6} ({count / total:.1%})" for layer, count in sorted(counts.items())]
+    mean_layers = sum(layer * count for layer, count in counts.items()) / total
+    lines.append(f"   Ortalama katman: {mean_layers:.2f} / {num_layers} (hesap ~{mean_layers / num_layers:.0%})")
+    return '\n'.join(lines)
+
+class EarlyExitSegment(torch.nn.Module):
+    """[start, end) katmanları + exit head (veya son LayerNorm + classifier)"""
+
+    def __init__(self, model, start, end, head=None):
+        super().__init__()
+        self.embeddings = model.vit.embeddings if start == 0 else None
+        self.layers = torch.nn.ModuleList(model.vit.encoder.layer[start:end])
+        self.head = head
+        self.final_layernorm = model.vit.layernorm if head is None else None
+        self.classifier = model.classifier if head is None else None
+
+    def forward(self, inputs):
+        hidden = self.embeddings(inputs) if self.embeddings is not None else inputs
+        for layer in self.layers:
+            hidden = _layer_output(layer(hidden))
+        if self.head is not None:
+            logits = self.head(hidden)
+        else:
+            logits = self.classifier(self.final_layernorm(hidden)[:, 0])
+        return hidden, torch.softmax(logits, dim=-1)
+
+def export_early_exit_onnx(model, output_dir, threshold=0.9, image_size=224, opset_version=17):
+    """
+    Modeli exit noktalarında segmentlere bölüp ONNX'e export et
+
+    Returns:
+        Path: early_exit.json (segment dosyaları, exit katmanları, varsayılan eşik)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model.eval()
+
+    bounds = [0] + list(model.exit_layers) + [model.config.num_hidden_layers]
+    heads = list(model.exit_heads) + [None]
+    segments = []
+    inputs = torch.randn(1, 3, image_size, image_size)
+
+    with torch.no_grad():
+        for index, (start, end, head) in enumerate(zip(bounds[:-1], bounds[1:], heads)):
+            segment = EarlyExitSegment(model, start, end, head).eval()
+            path = output_dir / f"segment_{index}.onnx"
+            input_name = 'pixel_values' if start == 0 else 'hidden_states_in'
+            torch.onnx.export(
+                segment,
+                inputs,
+                str(path),
+                input_names=[input_name],
+                output_names=['hidden_states', 'probs'],
+                dynamic_axes={input_name: {0: 'batch_size'}, 'hidden_states': {0: 'batch_size'},
+                              'probs': {0: 'batch_size'}},
+                opset_version=opset_version,
+                do_constant_folding=True,
+            )
+            inputs = segment(inputs)[0]
+            segments.append({'file': path.name, 'exit_layer': end})
+            print(f"   [OK] Segment {index}: katman {start + 1}-{end} -> {path.name}")
+
+    manifest = output_dir / 'early_exit.json'
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump({'segments': segments, 'threshold': threshold,
+                   'num_layers': model.config.num_hidden_layers}, f, indent=2)
+    return manifest
+
+class EarlyExitOnnx:
+    """Segment ONNX modellerini sırayla çalıştır, eşik geçilince dur"""
+
+    def __init__(self, manifest_path, threshold=None, providers=None):
+        # Autotune profilli session (turkish_pill/ort_session.py)
+        pill_src = Path(__file__).resolve().parent.parent.parent / 'turkish_pill'
+        if str(pill_src) not in sys.path:
+            sys.path.append(str(pill_src))
+        from ort_session import create_session
+
+        manifest_path = Path(manifest_path)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.threshold = manifest['threshold'] if threshold is None else threshold
+        self.num_layers = manifest['num_layers']
+        self.exit_counts = Counter()
+        self.segments = [
+            (create_session(manifest_path.parent / s['file'], providers=providers), s['exit_layer'])
+            for s in manifest['segments']
+        ]
+
+    def predict(self, pixel_values):
+        """pixel_values [1, 3, H, W] float32 -> (probs [C], exit_layer)"""
+        hidden = pixel_values.astype(np.float32)
+        for session, exit_layer in self.segments:
+            hidden, probs = session.run(None, {session.get_inputs()[0].name: hidden})
+            if probs[0].max() >= self.threshold or exit_layer == self.num_layers:
+                self.exit_counts[exit_layer] += 1
+                return probs[0], exit_layer
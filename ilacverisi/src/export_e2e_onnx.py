@@ -0,0 +1,153 @@
+"""
+Uçtan Uca ONNX Export
+YOLOv8 detection + en iyi kutu seçimi + graph içi kırpma (RoiAlign) + ViT
+classification'ı tek bir ONNX modelinde birleştirir.
+
+Girdi:  images uint8 [1, H, W, 3] (tam çözünürlüklü fotoğraf)
+Çıktı:  bbox [1, 4] (orijinal piksel koordinatları, x1 y1 x2 y2)
+        detection_confidence [1], class_index [1], confidence [1], probs [1, C]
+"""
+
+import yaml
+from pathlib import Path
+import torch
+from torchvision.ops import roi_align
+from ultralytics import YOLO
+from transformers import ViTForImageClassification, ViTImageProcessor
+
+class EndToEndMedicineModel(torch.nn.Module):
+    """Detection -> en iyi kutu -> RoiAlign crop -> ViT"""
+
+    def __init__(self, detector, classifier, image_mean, image_std,
+                 detection_size=640, classification_size=224, padding=10):
+        super().__init__()
+        self.detector = detector
+        self.classifier = classifier
+        self.detection_size = detection_size
+        self.classification_size = classification_size
+        self.padding = padding
+        self.register_buffer('mean', torch.tensor(image_mean, dtype=torch.float32).view(1, 3, 1, 1))
+        self.register_buffer('std', torch.tensor(image_std, dtype=torch.float32).view(1, 3, 1, 1))
+
+    def forward(self, images):
+        # uint8 NHWC -> float NCHW [0, 1]
+        image = images.permute(0, 3, 1, 2).float() / 255.0
+        height = images.shape[1]
+        width = images.shape[2]
+
+        # 1. Detection (letterbox yerine doğrudan detection_size'a ölçekleme)
+        det_input = torch.nn.functional.interpolate(
+            image, size=(self.detection_size, self.detection_size), mode='bilinear', align_corners=False
+        )
+        preds = self.detector(det_input)
+        preds = preds[0] if isinstance(preds, (list, tuple)) else preds  # [1, 4 + nc, anchors]
+
+        # 2. En yüksek skorlu kutu (NMS sonrası argmax ile aynı kutu)
+        class_scores = preds[0, 4:, :]
+        anchor_scores = class_scores.max(dim=0).values
+        best = anchor_scores.argmax()
+        detection_confidence = anchor_scores[best].unsqueeze(0)
+        cx, cy, w, h = preds[0, 0, best], preds[0, 1, best], preds[0, 2, best], preds[0, 3, best]
+
+        # Orijinal çözünürlüğe geri ölçekle + padding + sınırla
+        scale_x = width / self.detection_size
+        scale_y = height / self.detection_size
+        x1 = ((cx - w / 2) * scale_x - self.padding).clamp(min=0)
+        y1 = ((cy - h / 2) * scale_y - self.padding).clamp(min=0)
+        x2 = torch.minimum((cx + w / 2) * scale_x + self.padding, width * torch.ones_like(cx))
+        y2 = torch.minimum((cy + h / 2) * scale_y + self.padding, height * torch.ones_like(cy))
+        bbox = torch.stack([x1, y1, x2, y2]).unsqueeze(0)
+
+        # 3. Tam çözünürlükten kırp + classification boyutuna getir
+        rois = torch.cat([torch.zeros(1, 1, dtype=bbox.dtype), bbox], dim=1)
+        crop = roi_align(
+            image, rois, output_size=(self.classification_size, self.classification_size),
+            spatial_scale=1.0, sampling_ratio=2, aligned=True
+        )
+
+        # 4. Classification
+        pixel_values = (crop - self.mean) / self.std
+        logits = self.classifier(pixel_values=pixel_values).logits
+        probs = torch.nn.functional.softmax(logits, dim=-1)
+        confidence, class_index = probs.max(dim=-1)
+
+        return bbox, detection_confidence, class_index, confidence, probs
+
+def load_config(config_path='config.yaml'):
+    """Config dosyasını yükle"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+def resolve_detection_path(config):
+    """Detection model yolu (inference.py ile aynı sıra)"""
+    detection_path = Path(config['models']['detection'])
+    if not detection_path.exists():
+        runs_path = Path(config['detection']['project']) / config['detection']['name'] / 'weights' / 'best.pt'
+        if runs_path.exists():
+            return runs_path
+        raise FileNotFoundError(f"Detection model bulunamadı: {detection_path}")
+    return detection_path
+
+def export_e2e_onnx(config, output_path, opset_version=17):
+    """Uçtan uca modeli ONNX'e export et"""
+    detection_path = resolve_detection_path(config)
+    classification_path = Path(config['models']['classification'])
+
+    print(f"Detection model yükleniyor: {detection_path}")
+    detector = YOLO(str(detection_path)).model
+    detector.fuse()
+    detector.eval()
+
+    print(f"Classification model yükleniyor: {classification_path}")
+    classifier = ViTForImageClassification.from_pretrained(str(classification_path))
+    classifier.eval()
+    processor = ViTImageProcessor.from_pretrained(str(classification_path))
+
+    model = EndToEndMedicineModel(
+        detector,
+        classifier,
+        processor.image_mean,
+        processor.image_std,
+        detection_size=config['detection']['image_size'],
+        classification_size=config['classification']['image_size'],
+    )
+    model.eval()
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    dummy = torch.randint(0, 256, (1, 720, 960, 3), dtype=torch.uint8)
+
+    print(f"ONNX export ediliyor (opset {opset_version})...")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            dummy,
+            str(output_path),
+            input_names=['images'],
+            output_names=['bbox', 'detection_confidence', 'class_index', 'confidence', 'probs'],
+            dynamic_axes={'images': {1: 'height', 2: 'width'}},
+            opset_version=opset_version,
+            do_constant_folding=True,
+        )
+
+    size_mb = output_path.stat().st_size / (1024 * 1024)
+    print(f"✓ Uçtan uca model kaydedildi: {output_path} ({size_mb:.1f} MB)")
+    return output_path
+
+def main():
+    """Ana fonksiyon"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Detection + crop + classification tek ONNX modeli")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--output', help="Çıktı yolu (varsayılan: config models.e2e_onnx)")
+    parser.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    output_path = args.output or config['models'].get('e2e_onnx', 'models/e2e/medicine_e2e.onnx')
+    export_e2e_onnx(config, output_path, opset_version=args.opset)
+    print("\n💡 Parite kontrolü: python src/e2e_inference.py --parity")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Checkpoint Hot Reload (Kesintisiz Model Güncelleme)
+Yeni eğitim çıktısı process yeniden başlatılmadan devreye alınır.
+
+- Arka plan thread'i modelin checkpoint_files() dosyalarını (yol, mtime, boyut)
+  periyodik olarak kontrol eder; yeni checkpoint-* klasörü veya üzerine yazılan
+  best.pt / model.safetensors değişiklik olarak görülür
+- Dosyalar iki ardışık kontrolde aynı kalana kadar beklenir (yazımı süren
+  checkpoint yüklenmez)
+- Yeni model arka planda yüklenir, smoke görüntüleriyle ısıtılır ve eski modelle
+  parite testi yapılır (top-1 uyumu min_agreement altındaysa reddedilir)
+- Geçen model tek referans ataması ile devreye alınır: yeni istekler yeni modeli,
+  süren istekler eski modeli kullanmaya devam eder; eski model son istek
+  bitince serbest kalır
+- Reddedilen / yüklenemeyen checkpoint tekrar denenmez (dosyalar değişene kadar)
+
+Kullanım:
+    reloader = HotReloader(lambda: MedicineInference('config.yaml'),
+                           smoke_images=find_smoke_images('SAP_BABA_CLEAN/valid/images'))
+    result = reloader.predict(image)
+
+    python src/hot_reload.py --config config.yaml
+"""
+
+import threading
+import time
+from pathlib import Path
+
+from metrics import REGISTRY
+
+def file_fingerprint(paths):
+    """Dosyaların (yol, mtime_ns, boyut) listesi; silinen dosyalar atlanır"""
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            continue
+        fingerprint.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(fingerprint))
+
+def find_smoke_images(directory, count=8):
+    """Klasördeki görüntülerden eşit aralıklı count tanesi (alt klasörler dahil)"""
+    images = sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    if len(images) <= count:
+        return images
+    step = len(images) / count
+    return [images[int(i * step)] for i in range(count)]
+
+def parity(candidate, reference, images):
+    """
+    Smoke görüntülerinde top-1 uyumu (candidate aynı zamanda ısınmış olur)
+
+    Returns:
+        (uyum oranı veya None, candidate ortalama predict süresi saniye)
+    """
+    matches = 0
+    elapsed = 0.0
+    for image in images:
+        start = time.perf_counter()
+        predicted = candidate.predict(image)['class_name']
+        elapsed += time.perf_counter() - start
+        if reference is not None:
+            matches += predicted == reference.predict(image)['class_name']
+    agreement = matches / len(images) if reference is not None and images else None
+    return agreement, elapsed / max(len(images), 1)
+
+class HotReloader:
+    """Checkpoint değişince modeli arka planda yükleyip atomik olarak değiştirir"""
+
+    def __init__(self, factory, smoke_images=(), interval=10.0, min_agreement=0.9, name='model', start=True):
+        """
+        Args:
+            factory: Argümansız model oluşturucu (MedicineInference / PillClassifier);
+                     model checkpoint_files() ve predict(image) sağlamalı
+            smoke_images: Isınma ve parite testi görüntüleri
+            interval: Dosya kontrol aralığı (saniye)
+            min_agreement: Eski modelle en düşük top-1 uyumu (0: parite kontrolü yok)
+            name: Log ve metrik etiketi
+            start: İzleme thread'ini hemen başlat
+        """
+        self.factory = factory
+        self.smoke_images = list(smoke_images)
+        self.interval = interval
+        self.min_agreement = min_agreement
+        self.name = name
+        if not self.smoke_images:
+            print(f"⚠ Hot reload ({name}): smoke görüntüsü yok, yeni model parite testi olmadan devreye alınır")
+
+        # (model, nesil) tek referans: predict ikisini tutarlı okur
+        self._active = (factory(), 1)
+        self.fingerprint = file_fingerprint(self.model.checkpoint_files())
+        self.rejected = None  # Son reddedilen fingerprint
+        self.history = []
+
+        self.metrics = {
+            'reloads': REGISTRY.counter('model_reloads_total', 'Checkpoint hot reload denemeleri'),
+            'generation': REGISTRY.gauge('model_generation', 'Devredeki model nesli'),
+        }
+        self.metrics['generation'].set(self.generation, model=name)
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._reload_lock = threading.Lock()  # İzleyici ve elle reload() aynı anda yüklemesin
+        if start:
+            self.start()
+
+    @property
+    def model(self):
+        return self._active[0]
+
+    @property
+    def generation(self):
+        return self._active[1]
+
+    def predict(self, *args, **kwargs):
+        """Devredeki modelle tahmin (referans bir kez okunur, swap süren isteği etkilemez)"""
+        model, generation = self._active
+        result = model.predict(*args, **kwargs)
+        result['model_generation'] = generation
+        return result
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name=f'hot-reload-{self.name}', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _current_fingerprint(self):
+        try:
+            return file_fingerprint(self.model.checkpoint_files())
+        except FileNotFoundError:
+            # Checkpoint klasörü geçici olarak yok (ör. eğitim yeniden yazıyor)
+            return self.fingerprint
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            fingerprint = self._current_fingerprint()
+            if fingerprint == self.fingerprint or fingerprint == self.rejected:
+                pending = None
+                continue
+            if fingerprint != pending:
+                # Yazım sürüyor olabilir: bir sonraki kontrolde aynıysa yükle
+                pending = fingerprint
+                continue
+            pending = None
+            self.reload(fingerprint)
+
+    def reload(self, fingerprint=None):
+        """
+        Yeni modeli yükle, ısıt, parite testi yap ve geçerse devreye al
+
+        Returns:
+            bool: model değiştirildi mi
+        """
+        with self._reload_lock:
+            return self._reload(fingerprint or self._current_fingerprint())
+
+    def _reload(self, fingerprint):
+        start = time.perf_counter()
+        try:
+            candidate = self.factory()
+            agreement, latency = parity(candidate, self.model if self.min_agreement else None, self.smoke_images)
+        except Exception as e:
+            print(f"⚠ Hot reload ({self.name}): yeni model yüklenemedi: {e}")
+            return self._reject(fingerprint, 'failed', str(e))
+
+        if agreement is not None and agreement < self.min_agreement:
+            print(f"⚠ Hot reload ({self.name}): parite testi geçmedi "
+                  f"(uyum {agreement:.1%} < {self.min_agreement:.1%}), eski model devrede")
+            return self._reject(fingerprint, 'rejected', f'agreement {agreement:.3f}')
+
+        old = self.model
+        self._active = (candidate, self.generation + 1)
+        self.fingerprint = fingerprint
+        self.rejected = None
+
+        # Paylaşılan bileşen önbelleği kullanılıyorsa eski referansları bırak;
+        # süren istekler nesnelere hâlâ kendi referanslarıyla erişir
+        components = getattr(old, 'components', None)
+        if components is not None:
+            components.release(old.shared_components)
+
+        elapsed = time.perf_counter() - start
+        self.metrics['reloads'].inc(model=self.name, result='ok')
+        self.metrics['generation'].set(self.generation, model=self.name)
+        self.history.append({'generation': self.generation, 'result': 'ok', 'agreement': agreement,
+                             'load_seconds': elapsed, 'smoke_latency': latency, 'time': time.time()})
+        agreement_text = f"uyum {agreement:.1%}, " if agreement is not None else ""
+        print(f"✓ Hot reload ({self.name}): nesil {self.generation} devrede "
+              f"({agreement_text}yükleme {elapsed:.1f} s, smoke {latency * 1000:.0f} ms/görüntü)")
+        return True
+
+    def _reject(self, fingerprint, result, reason):
+        self.rejected = fingerprint
+        self.metrics['reloads'].inc(model=self.name, result=result)
+        self.history.append({'generation': self.generation, 'result': result, 'reason': reason, 'time': time.time()})
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    """Checkpoint'leri izle; değişince yeni modeli devreye al"""
+    import argparse
+    import yaml
+    from inference import MedicineInference
+
+    parser = argparse.ArgumentParser(description="Checkpoint hot reload")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--image', help="Her kontrolde tahmin edilecek görüntü (opsiyonel)")
+    args = parser.parse_args()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    reload_config = config.get('hot_reload') or {}
+    smoke_dir = reload_config.get('smoke_dir') or Path(config['data']['dataset_path']) / 'valid' / 'images'
+
+    reloader = HotReloader(
+        lambda: MedicineInference(config_path=args.config),
+        smoke_images=find_smoke_images(smoke_dir, reload_config.get('smoke_images', 8)),
+        interval=reload_config.get('interval', 10),
+        min_agreement=reload_config.get('min_agreement', 0.9),
+        name='medicine',
+    )
+    print(f"İzlenen dosyalar: {', '.join(path for path, _, _ in reloader.fingerprint)}")
+    try:
+        with reloader:
+            while True:
+                time.sleep(reloader.interval)
+                if args.image:
+                    result = reloader.predict(args.image)
+                    print(f"Nesil {result['model_generation']}: {result['class_name']} ({result['confidence']:.2%})")
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,14 @@ from transformers import ViTForImageClassification, ViTImageProcessor
 from PIL import Image
 import torch
 import numpy as np
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY, StageTimer, NULL_TIMER, serve_metrics
+from cpu_optimization import prepare_classifier
+from early_exit import ViTEarlyExitForImageClassification, predict_early_exit
+from cascade import class_probabilities, load_calibration, select_packages
 
 try:
     from paddleocr import PaddleOCR
@@ -42,18 +50,58 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     print("⚠ pytesseract yüklü değil")
 
+def _merge_config(config, overrides):
+    """overrides sözlüğünü config'e iç içe birleştir"""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            _merge_config(config[key], value)
+        else:
+            config[key] = value
+
 class MedicineInference:
     """İlaç tanıma inference sınıfı"""
     
-    def __init__(self, config_path='config.yaml'):
-        """Inference pipeline'ı başlat"""
+    def __init__(self, config_path='config.yaml', track_memory=None, overrides=None, components=None):
+        """
+        Inference pipeline'ı başlat
+        track_memory: Bellek ölçümünü aç/kapat (None ise config'deki memory.enabled)
+        overrides: Config üzerine yazılacak ayarlar (ör. müşteriye özel classification modeli)
+        components: Paylaşılan bileşen önbelleği (model_registry.ComponentCache); detector ve
+                    processor aynı ayarlarla yüklenmişse yeniden yüklenmez
+        """
         self.config = self._load_config(config_path)
+        if overrides:
+            _merge_config(self.config, overrides)
+        self.components = components
+        self.shared_components = []
+        if track_memory is not None:
+            self.config.setdefault('memory', {})['enabled'] = track_memory
         self.detection_model = None
         self.classification_model = None
+        self.classification_forward = None
         self.classification_processor = None
+        self.early_exit_threshold = None
+        self.fast_classifier = None
+        self.cascade = None
+        self.competitor_conf = None
+        self.detection_sizes = Counter()
+        self.detection_sizes_lock = threading.Lock()  # predict birden çok thread'den çağrılır
         self.ocr_engine = None
+        self.ocr_lock = threading.Lock()  # PaddleOCR predictor'ı thread-safe değil
         self.class_names = None
         
+        # Bellek ölçümü (opsiyonel - model yüklemeden önce başlamalı)
+        self.memory = None
+        if self.config.get('memory', {}).get('enabled', False):
+            from memory_tracking import MemoryTracker
+            self.memory = MemoryTracker(trace_frames=self.config['memory'].get('trace_frames', 1))
+        
+        # Metrikler (opsiyonel - kapalıyken predict'e ek yük getirmez)
+        metrics_config = self.config.get('metrics', {})
+        self.metrics_enabled = metrics_config.get('enabled', False)
+        if self.metrics_enabled:
+            self._init_metrics(metrics_config)
+        
         # Modelleri yükle
         self._load_models()
         
@@ -75,6 +123,86 @@ class MedicineInference:
         with open(config_path, 'r', encoding='utf-8') as f:
             return yaml.safe_load(f)
     
+    def _shared(self, kind, key, loader):
+        """Bileşeni paylaşılan önbellekten al (önbellek yoksa doğrudan yükle)"""
+        if self.components is None:
+            return loader()
+        component, key = self.components.acquire(kind, key, loader)
+        self.shared_components.append((kind, key))
+        return component
+    
+    def _init_metrics(self, metrics_config):
+        """Process seviyesindeki metrikleri tanımla ve (isteğe bağlı) endpoint'i aç"""
+        self.metrics = {
+            'predictions': REGISTRY.counter('medicine_predictions_total', 'Toplam predict çağrısı'),
+            'detection_failures': REGISTRY.counter('medicine_detection_failures_total', 'İlaç kutusu tespit edilemeyen istekler'),
+            'ocr_invocations': REGISTRY.counter('medicine_ocr_invocations_total', 'OCR çalıştırılan istekler'),
+            'cache_hits': REGISTRY.counter('medicine_cache_hits_total', 'Önbellekten karşılanan işlemler'),
+            'stage_seconds': REGISTRY.histogram('medicine_stage_seconds', 'predict aşama süreleri (saniye)'),
+            'predict_seconds': REGISTRY.histogram('medicine_predict_seconds', 'Toplam predict süresi (saniye)'),
+            'early_exits': REGISTRY.counter('medicine_early_exit_total', 'Early-exit çıkış katmanı dağılımı'),
+            'detection_resolution': REGISTRY.counter('medicine_detection_resolution_total', 'Tespitin kullandığı YOLO giriş boyutu'),
+            'cascade_shortcuts': REGISTRY.counter('medicine_cascade_shortcuts_total', 'ViT atlanıp detector sınıfı dönen istekler'),
+        }
+        port = metrics_config.get('port')
+        if port and not getattr(MedicineInference, '_metrics_server', None):
+            MedicineInference._metrics_server = serve_metrics(port=port, host=metrics_config.get('host', '0.0.0.0'))
+    
+    def _record_metrics(self, result, timer):
+        """predict sonucunu registry'ye ve sink'lere işle"""
+        total = timer.total()
+        result['timings'] = dict(timer.timings, total=total)
+        
+        self.metrics['predictions'].inc()
+        if result.get('error'):
+            self.metrics['detection_failures'].inc()
+        if 'ocr' in timer.timings:
+            self.metrics['ocr_invocations'].inc(engine=str(self.config['ocr'].get('engine')))
+        for stage, seconds in timer.timings.items():
+            self.metrics['stage_seconds'].observe(seconds, stage=stage)
+        self.metrics['predict_seconds'].observe(total)
+        # Çoklu paket modunda kutu başına sayılır
+        for package in result.get('packages', [result]):
+            if package.get('detection_size'):
+                self.metrics['detection_resolution'].inc(size=str(package['detection_size']))
+            if package.get('source') == 'detector':
+                self.metrics['cascade_shortcuts'].inc()
+            if package.get('exit_layer') is not None:
+                self.metrics['early_exits'].inc(layer=str(package['exit_layer']))
+        
+        REGISTRY.emit({
+            'event': 'predict',
+            'timings': result['timings'],
+            'class_name': result.get('class_name'),
+            'confidence': result.get('confidence'),
+            'detection_confidence': result.get('detection_confidence'),
+            'error': result.get('error'),
+            'count': result.get('count'),
+        })
+    
+    def _memory_checkpoint(self, label):
+        """Bellek ölçümü açıksa yükleme aşaması sonrası snapshot al"""
+        if self.memory is not None:
+            self.memory.checkpoint(label)
+    
+    def _make_timer(self):
+        """predict için timer: bellek > metrik > no-op"""
+        if self.memory is not None:
+            return self.memory.stage_timer()
+        if self.metrics_enabled:
+            return StageTimer()
+        return NULL_TIMER
+    
+    def _finish(self, result, timer):
+        """Ölçüm açıksa sonucu süre/bellek bilgisiyle zenginleştir"""
+        if self.metrics_enabled:
+            self._record_metrics(result, timer)
+        else:
+            result['timings'] = dict(timer.timings, total=timer.total())
+        if self.memory is not None:
+            result['memory'] = timer.memory
+        return result
+    
     def _load_class_names(self):
         """Sınıf isimlerini yükle"""
         data_yaml = Path(self.config['data']['dataset_path']) / 'data.yaml'
@@ -82,9 +210,8 @@ class MedicineInference:
             data = yaml.safe_load(f)
             return data['names']
     
-    def _load_models(self):
-        """Detection ve classification modellerini yükle"""
-        # Detection model
+    def _detection_path(self):
+        """Kullanılacak detection checkpoint'i (config yolu, yoksa son eğitim çıktısı)"""
         detection_path = Path(self.config['models']['detection'])
         if not detection_path.exists():
             # Alternatif yol dene
@@ -93,9 +220,31 @@ class MedicineInference:
                 detection_path = runs_path
             else:
                 raise FileNotFoundError(f"Detection model bulunamadı: {detection_path}")
-        
+        return detection_path
+    
+    def checkpoint_files(self):
+        """
+        Yüklenecek modeli tanımlayan dosyalar (hot_reload bunları izler)
+        Seçim kuralı her çağrıda config'e göre yeniden uygulanır.
+        """
+        files = [self._detection_path()]
+        classification_path = Path(self.config['models']['classification'])
+        files += [classification_path / name for name in
+                  ('config.json', 'model.safetensors', 'pytorch_model.bin', 'preprocessor_config.json')]
+        cascade_config = self.config.get('cascade') or {}
+        if cascade_config.get('enabled'):
+            files.append(Path(cascade_config.get('calibration', 'models/detection/cascade.json')))
+        return [path for path in files if path.exists()]
+    
+    def _load_models(self):
+        """Detection ve classification modellerini yükle"""
+        # Detection model
+        detection_path = self._detection_path()
         print(f"Detection model yükleniyor: {detection_path}")
-        self.detection_model = YOLO(str(detection_path))
+        # Anahtar mtime içerir: aynı yola yazılan yeni checkpoint eski detector'ı paylaşmaz
+        detector_key = f"{detection_path.resolve()}@{detection_path.stat().st_mtime_ns}"
+        self.detection_model = self._shared('detector', detector_key, lambda: YOLO(str(detection_path)))
+        self._memory_checkpoint('detection_model')
         
         # Classification model
         classification_path = Path(self.config['models']['classification'])
@@ -103,16 +252,64 @@ class MedicineInference:
             raise FileNotFoundError(f"Classification model bulunamadı: {classification_path}")
         
         print(f"Classification model yükleniyor: {classification_path}")
-        self.classification_model = ViTForImageClassification.from_pretrained(str(classification_path))
-        self.classification_processor = ViTImageProcessor.from_pretrained(str(classification_path))
+        early_exit = self.config['classification'].get('early_exit') or {}
+        if early_exit.get('enabled'):
+            # Checkpoint early-exit head'leri ile eğitilmiş olmalı (config.early_exit_layers)
+            self.classification_model = ViTEarlyExitForImageClassification.from_pretrained(str(classification_path))
+            if not self.classification_model.exit_layers:
+                raise ValueError(f"Checkpoint'te early-exit head'i yok: {classification_path}")
+            self.early_exit_threshold = early_exit.get('threshold', 0.9)
+            print(f"✓ Early-exit: katman {self.classification_model.exit_layers}, eşik {self.early_exit_threshold}")
+        else:
+            self.classification_model = ViTForImageClassification.from_pretrained(str(classification_path))
+        self.classification_processor = self._shared(
+            'processor', None, lambda: ViTImageProcessor.from_pretrained(str(classification_path)))
         self.classification_model.eval()
+        self._memory_checkpoint('classification_model')
         
         # Sınıf isimlerini yükle
         self.class_names = self._load_class_names()
         
+        # Detector sınıfı kısayolu (kalibre edilmiş eşikler gerekli)
+        cascade_config = self.config.get('cascade') or {}
+        if cascade_config.get('enabled'):
+            self.cascade = load_calibration(cascade_config.get('calibration', 'models/detection/cascade.json'))
+            if self.cascade is None:
+                print("⚠ Cascade kalibrasyonu bulunamadı (python src/cascade.py), kısayol kapalı")
+            else:
+                self.competitor_conf = cascade_config.get('competitor_conf', 0.1)
+                print(f"✓ Cascade: kutu ≥ {self.cascade['box_confidence']:.2f}, "
+                      f"sınıf ≥ {self.cascade['class_probability']:.2f} "
+                      f"(valid kısayol oranı {self.cascade['shortcut_rate']:.0%})")
+        
         # Device ayarla
         self.device = torch.device(self.config['classification']['device'] if torch.cuda.is_available() else 'cpu')
         self.classification_model.to(self.device)
+        self._memory_checkpoint('classification_device')
+        
+        # CPU'da opsiyonel dinamik INT8 / trace (GPU'da model olduğu gibi kullanılır)
+        cpu_config = self.config['classification'].get('cpu_optimization') or {}
+        if self.device.type != 'cpu':
+            cpu_config = {}
+        merge_ratio = self.config['classification'].get('token_merging_ratio', 0.0)
+        if self.early_exit_threshold is not None:
+            # Katman katman çalıştırma trace/compile edilemez; token merging hook'ları
+            # encoder pre-hook'una bağlı olduğu için bu yolda kullanılmaz
+            cpu_config = {k: v for k, v in cpu_config.items() if k != 'compile'}
+            merge_ratio = 0.0
+        self.classification_model, self.classification_forward = prepare_classifier(
+            self.classification_model,
+            quantize=cpu_config.get('quantize', False),
+            channels_last=cpu_config.get('channels_last', False),
+            compile_mode=cpu_config.get('compile'),
+            image_size=self.config['classification']['image_size'],
+            threads=cpu_config.get('threads'),
+            merge_ratio=merge_ratio,
+        )
+        if cpu_config.get('quantize') or cpu_config.get('compile'):
+            self._memory_checkpoint('classification_cpu_optimization')
+            print(f"✓ CPU optimizasyonu (INT8: {bool(cpu_config.get('quantize'))}, "
+                  f"compile: {cpu_config.get('compile')})")
         
         print(f"✓ Modeller yüklendi (Device: {self.device})")
     
@@ -135,6 +332,7 @@ class MedicineInference:
                 else:
                     self.ocr_engine = PaddleOCR(use_angle_cls=True, lang='tr', use_gpu=False)
                 print("✓ PaddleOCR hazır")
+                self._memory_checkpoint('ocr_paddleocr')
             except Exception as e:
                 print(f"⚠ PaddleOCR başlatılamadı: {e}")
                 self.ocr_engine = None
@@ -151,6 +349,7 @@ class MedicineInference:
                 self.ocr_engine = 'tesseract'
                 languages = self.config['ocr'].get('languages', ['tr', 'eng'])
                 print(f"✓ Tesseract hazır (Diller: {', '.join(languages)})")
+                self._memory_checkpoint('ocr_tesseract')
             except Exception as e:
                 print(f"⚠ Tesseract bulunamadı: {e}")
                 print("💡 Tesseract'ı sisteminize kurmanız gerekiyor: https://github.com/tesseract-ocr/tesseract")
@@ -159,23 +358,135 @@ class MedicineInference:
             print(f"⚠ Desteklenmeyen OCR engine: {engine}")
             self.ocr_engine = None
     
-    def detect_box(self, image, conf_threshold=0.5):
+    def detect(self, image, conf_threshold=0.5, image_size=None):
         """
-        YOLOv8 ile ilaç kutusunu tespit et
-        Returns: (bbox, confidence) veya (None, None)
+        YOLOv8 ile ilaç kutusunu ve detector sınıfını tespit et
+        
+        Adaptif modda önce düşük çözünürlükte denenir; güven düşükse veya kutu
+        küçükse tam çözünürlükte tekrar çalıştırılır. Kutu her durumda orijinal
+        görüntü koordinatlarındadır (crop tam detayla alınır).
+        image_size verilirse tek geçiş o boyutta yapılır (yük altında degradation).
+        
+        Returns: {'bbox', 'confidence', 'class_name', 'class_probability', 'class_probs', 'image_size'} veya None
+        """
+        if image_size is not None:
+            self._count_detection(image_size)
+            return self._detect_at(image, conf_threshold, image_size)
+        
+        full_size = self.config['detection']['image_size']
+        adaptive = self.config['detection'].get('adaptive') or {}
+        if adaptive.get('enabled'):
+            detection = self._detect_at(image, conf_threshold, adaptive.get('low_size', 320))
+            if detection is not None and not self._needs_escalation(detection, image, adaptive):
+                self._count_detection(detection['image_size'])
+                return detection
+        
+        detection = self._detect_at(image, conf_threshold, full_size)
+        self._count_detection(full_size)
+        return detection
+    
+    def _needs_escalation(self, detection, image, adaptive):
+        """Düşük çözünürlük sonucu yetersizse (düşük güven veya küçük kutu) True"""
+        if detection['confidence'] < adaptive.get('escalate_conf', 0.7):
+            return True
+        x1, y1, x2, y2 = detection['bbox']
+        box_area = (x2 - x1) * (y2 - y1) / (image.size[0] * image.size[1])
+        return box_area < adaptive.get('min_box_area', 0.05)
+    
+    def _count_detection(self, image_size):
+        """Tespitin kullandığı çözünürlüğü say (eşzamanlı predict'lerde sayım kaybolmasın)"""
+        with self.detection_sizes_lock:
+            self.detection_sizes[image_size] += 1
+    
+    def detection_resolution_stats(self):
+        """Adaptif tespitte her çözünürlüğün kullanım sayısı ve oranı"""
+        with self.detection_sizes_lock:
+            sizes = dict(self.detection_sizes)
+        total = sum(sizes.values())
+        return {size: {'count': count, 'share': count / total}
+                for size, count in sorted(sizes.items())}
+    
+    def _run_detector(self, image, conf_threshold, image_size):
+        """
+        YOLO'yu çalıştır (ultralytics kutuları orijinal boyuta ölçekler)
+        Returns: (xyxy, conf, cls) numpy dizileri veya None
         """
-        results = self.detection_model(image, conf=conf_threshold, verbose=False)
+        # Rakip sınıflı kutular sınıf olasılığı için düşük eşikle alınır;
+        # paket kutuları yine conf_threshold ile filtrelenir
+        query_conf = conf_threshold
+        if self.competitor_conf is not None:
+            query_conf = min(conf_threshold, self.competitor_conf)
+        results = self.detection_model(image, conf=query_conf, imgsz=image_size, verbose=False)
         
         if len(results) == 0 or results[0].boxes is None or len(results[0].boxes) == 0:
-            return None, None
-        
-        # En yüksek confidence'lı box'ı al
+            return None
         boxes = results[0].boxes
-        best_idx = boxes.conf.argmax().item()
-        box = boxes.xyxy[best_idx].cpu().numpy()  # [x1, y1, x2, y2]
-        confidence = float(boxes.conf[best_idx].item())
+        return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()
+    
+    def _detection(self, xyxy, conf, cls, idx, image_size):
+        """idx kutusu için tespit sözlüğü (örtüşen rakip kutulardan sınıf olasılığı)"""
+        probs = class_probabilities(xyxy, conf, cls, idx)
+        # Detector isimleri ViT sınıflarıyla eşleşmiyorsa kısayol kullanılamaz
+        names = self.detection_model.names
+        class_probs = {names[c]: p for c, p in probs.items() if names.get(c) in self.class_names}
+        class_name = names.get(int(cls[idx]))
+        if class_name not in class_probs:
+            class_name = None
+        
+        return {
+            'bbox': xyxy[idx],  # [x1, y1, x2, y2]
+            'confidence': float(conf[idx]),
+            'class_name': class_name,
+            'class_probability': class_probs.get(class_name, 0.0),
+            'class_probs': class_probs,
+            'image_size': image_size,
+        }
+    
+    def _detect_at(self, image, conf_threshold, image_size):
+        """Tek çözünürlükte en yüksek confidence'lı kutu"""
+        boxes = self._run_detector(image, conf_threshold, image_size)
+        if boxes is None:
+            return None
+        xyxy, conf, cls = boxes
+        best_idx = int(conf.argmax())
+        if conf[best_idx] < conf_threshold:
+            return None
+        return self._detection(xyxy, conf, cls, best_idx, image_size)
+    
+    def detect_all(self, image, conf_threshold=0.5, image_size=None):
+        """
+        Fotoğraftaki tüm ilaç kutuları (çoklu paket modu)
+        
+        Küçük kutular için varsayılan olarak tam çözünürlükte çalışır; aynı paket için
+        kalan farklı sınıflı kutular sınıftan bağımsız NMS ile tek kutuya indirgenir.
         
-        return box, confidence
+        Returns: detect() sözlüklerinin listesi (detection confidence azalan)
+        """
+        image_size = image_size or self.config['detection']['image_size']
+        boxes = self._run_detector(image, conf_threshold, image_size)
+        self._count_detection(image_size)
+        if boxes is None:
+            return []
+        xyxy, conf, cls = boxes
+        return [self._detection(xyxy, conf, cls, idx, image_size)
+                for idx in select_packages(xyxy, conf, conf_threshold=conf_threshold)]
+    
+    def detect_box(self, image, conf_threshold=0.5):
+        """
+        YOLOv8 ile ilaç kutusunu tespit et
+        Returns: (bbox, confidence) veya (None, None)
+        """
+        detection = self.detect(image, conf_threshold=conf_threshold)
+        if detection is None:
+            return None, None
+        return detection['bbox'], detection['confidence']
+    
+    def _use_detector_class(self, detection):
+        """Detector kalibre edilmiş eşiklerin ikisini de geçtiyse ViT atlanır"""
+        return (self.cascade is not None
+                and detection['class_name'] is not None
+                and detection['confidence'] >= self.cascade['box_confidence']
+                and detection['class_probability'] >= self.cascade['class_probability'])
     
     def crop_image(self, image, bbox, padding=10):
         """Bounding box ile görüntüyü kırp"""
@@ -188,31 +499,86 @@ class MedicineInference:
         
         return image.crop((x1, y1, x2, y2))
     
-    def classify(self, cropped_image):
+    def load_fast_classifier(self, checkpoint=None, quantize=True):
+        """
+        Yük altında kullanılacak hızlı sınıflandırıcıyı yükle (bkz. degradation.py)
+        
+        Args:
+            checkpoint: Student model klasörü (distillation çıktısı); None ise ana
+                        classification modeli ayrı bir kopya olarak yüklenir
+            quantize: CPU'da Linear katmanlarına dinamik INT8
+        Returns:
+            bool: hızlı yol ana modelden farklı mı (GPU'da student yoksa False)
+        """
+        path = Path(checkpoint or self.config['models']['classification'])
+        quantize = quantize and self.device.type == 'cpu'
+        if checkpoint is None and not quantize:
+            print("⚠ Hızlı sınıflandırıcı: student yok ve INT8 sadece CPU'da, ana model kullanılacak")
+            return False
+        
+        model = ViTForImageClassification.from_pretrained(str(path))
+        if model.config.num_labels != len(self.class_names):
+            raise ValueError(f"Hızlı sınıflandırıcı sınıf sayısı uyuşmuyor: "
+                             f"{model.config.num_labels} != {len(self.class_names)} ({path})")
+        processor = self._shared('processor', None, lambda: ViTImageProcessor.from_pretrained(str(path)))
+        model.to(self.device)
+        cpu_config = (self.config['classification'].get('cpu_optimization') or {}) if self.device.type == 'cpu' else {}
+        model, forward = prepare_classifier(model, quantize=quantize,
+                                            channels_last=cpu_config.get('channels_last', False))
+        self.fast_classifier = {'model': model, 'forward': forward, 'processor': processor}
+        self._memory_checkpoint('fast_classifier')
+        print(f"✓ Hızlı sınıflandırıcı: {path} (INT8: {quantize})")
+        return True
+    
+    def classify(self, cropped_image, fast=False):
         """
         ViT ile kırpılmış görüntüyü sınıflandır
+        fast: Yüklüyse hızlı sınıflandırıcıyı kullan (load_fast_classifier)
         Returns: (class_name, confidence, all_probs)
         """
+        return self.classify_batch([cropped_image], fast=fast)[0]
+    
+    def classify_batch(self, cropped_images, fast=False):
+        """
+        Birden fazla crop'u tek ViT forward'unda sınıflandır
+        Returns: crop sırasıyla (class_name, confidence, all_probs) listesi
+        """
+        return self._classify_batch(cropped_images, fast=fast)[0]
+    
+    def _classify_batch(self, cropped_images, fast=False):
+        """
+        classify_batch + crop başına early-exit çıkış katmanı
+        Çıkış katmanları instance üzerinde tutulmaz (eşzamanlı predict çağrıları için)
+        Returns: (sonuç listesi, çıkış katmanı listesi; early-exit yoksa None elemanlı)
+        """
+        exit_layers = [None] * len(cropped_images)
+        fast = fast and self.fast_classifier is not None
+        processor = self.fast_classifier['processor'] if fast else self.classification_processor
+        
         # Preprocess
-        inputs = self.classification_processor(cropped_image, return_tensors="pt")
+        inputs = processor(cropped_images, return_tensors="pt")
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
         
         # Inference
-        with torch.no_grad():
-            outputs = self.classification_model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
-        
-        # En yüksek olasılıklı sınıfı bul
-        predicted_idx = probs.argmax().item()
-        confidence = float(probs[0][predicted_idx].item())
-        class_name = self.class_names[predicted_idx]
-        
-        # Tüm olasılıkları al
-        all_probs = {self.class_names[i]: float(probs[0][i].item()) 
-                     for i in range(len(self.class_names))}
-        
-        return class_name, confidence, all_probs
+        with torch.inference_mode():
+            if fast:
+                probs = torch.nn.functional.softmax(self.fast_classifier['forward'](inputs['pixel_values']), dim=-1)
+            elif self.early_exit_threshold is not None:
+                probs, exit_layer = predict_early_exit(self.classification_model, inputs['pixel_values'],
+                                                       threshold=self.early_exit_threshold)
+                exit_layers = exit_layer.tolist()
+            else:
+                logits = self.classification_forward(inputs['pixel_values'])
+                probs = torch.nn.functional.softmax(logits, dim=-1)
+        
+        results = []
+        for row in probs.float().cpu().numpy():
+            # En yüksek olasılıklı sınıfı bul
+            predicted_idx = int(row.argmax())
+            # Tüm olasılıkları al
+            all_probs = {self.class_names[i]: float(row[i]) for i in range(len(self.class_names))}
+            results.append((self.class_names[predicted_idx], float(row[predicted_idx]), all_probs))
+        return results, exit_layers
     
     def _check_medicine_in_text(self, text):
         """OCR metninde desteklenen ilaç isimlerinden birini ara"""
@@ -265,7 +631,8 @@ class MedicineInference:
             else:
                 # PaddleOCR
                 img_array = np.array(image)
-                result = self.ocr_engine.ocr(img_array, cls=True)
+                with self.ocr_lock:
+                    result = self.ocr_engine.ocr(img_array, cls=True)
                 
                 if result and result[0]:
                     # Tüm metinleri birleştir
@@ -287,7 +654,19 @@ class MedicineInference:
             print(f"⚠ OCR hatası: {e}")
             return None
     
-    def predict(self, image_path_or_pil, return_image=False, use_ocr=False, conf_threshold=0.5):
+    def _ensure_ocr(self, timer):
+        """OCR engine henüz başlatılmamışsa başlat; kullanılabilir mi döndür"""
+        if self.ocr_engine is None and self.ocr_available:
+            try:
+                with timer.stage('ocr_init'):
+                    self._init_ocr()
+            except Exception as e:
+                print(f"⚠ OCR başlatılamadı: {e}")
+                self.ocr_available = False
+        return self.ocr_engine is not None
+    
+    def predict(self, image_path_or_pil, return_image=False, use_ocr=False, conf_threshold=0.5, multi=False,
+                detection_size=None, fast_classifier=False):
         """
         Ana tahmin fonksiyonu
         Args:
@@ -295,6 +674,9 @@ class MedicineInference:
             return_image: Kırpılmış görüntüyü de döndür
             use_ocr: OCR kullanılsın mı
             conf_threshold: Detection için güven eşiği
+            multi: Fotoğraftaki tüm kutuları döndür (bkz. predict_multi)
+            detection_size: Tespiti tek geçişte bu YOLO giriş boyutunda yap (None: config / adaptif)
+            fast_classifier: Hızlı sınıflandırıcıyı kullan (yük altında, bkz. degradation.py)
         Returns:
             dict: {
                 'class_name': str,
@@ -303,20 +685,31 @@ class MedicineInference:
                 'bbox': [x1, y1, x2, y2],
                 'all_probs': dict,
                 'ocr_text': str (opsiyonel),
-                'cropped_image': PIL Image (opsiyonel)
+                'cropped_image': PIL Image (opsiyonel),
+                'detection_size': int (tespitin yapıldığı YOLO giriş boyutu),
+                'source': 'detector' (cascade kısayolu) veya 'classifier' (ViT),
+                'exit_layer': int (early-exit açıksa, çıkılan encoder katmanı),
+                'timings': dict (metrik/bellek ölçümü açıksa, aşama -> saniye),
+                'memory': dict (bellek ölçümü açıksa, aşama -> tepe MB)
             }
         """
+        if multi:
+            return self.predict_multi(image_path_or_pil, return_image=return_image, use_ocr=use_ocr,
+                                      conf_threshold=conf_threshold, detection_size=detection_size,
+                                      fast_classifier=fast_classifier)
+        
+        timer = self._make_timer()
+        
         # Görüntüyü yükle
-        if isinstance(image_path_or_pil, (str, Path)):
-            image = Image.open(image_path_or_pil).convert('RGB')
-        else:
-            image = image_path_or_pil.convert('RGB')
+        with timer.stage('load'):
+            image = self._load_image(image_path_or_pil)
         
         # 1. Detection
-        bbox, det_confidence = self.detect_box(image, conf_threshold=conf_threshold)
+        with timer.stage('detect'):
+            detection = self.detect(image, conf_threshold=conf_threshold, image_size=detection_size)
         
-        if bbox is None:
-            return {
+        if detection is None:
+            result = {
                 'class_name': None,
                 'confidence': 0.0,
                 'detection_confidence': 0.0,
@@ -326,26 +719,34 @@ class MedicineInference:
                 'cropped_image': None if not return_image else image,
                 'error': 'İlaç kutusu tespit edilemedi'
             }
+            if timer.enabled:
+                self._finish(result, timer)
+            return result
         
-        # 2. Crop
-        cropped = self.crop_image(image, bbox)
+        bbox, det_confidence = detection['bbox'], detection['confidence']
         
-        # 3. Classification
-        class_name, cls_confidence, all_probs = self.classify(cropped)
+        # 2. Crop
+        with timer.stage('crop'):
+            cropped = self.crop_image(image, bbox)
+        
+        # 3. Classification (detector yeterince eminse ViT atlanır)
+        exit_layer = None
+        if self._use_detector_class(detection):
+            source = 'detector'
+            class_name, cls_confidence = detection['class_name'], detection['class_probability']
+            all_probs = {name: detection['class_probs'].get(name, 0.0) for name in self.class_names}
+        else:
+            source = 'classifier'
+            with timer.stage('classify'):
+                batch, exit_layers = self._classify_batch([cropped], fast=fast_classifier)
+            (class_name, cls_confidence, all_probs), exit_layer = batch[0], exit_layers[0]
         
         # 4. OCR (opsiyonel)
         ocr_text = None
         if use_ocr:
-            # OCR engine henüz başlatılmamışsa başlat
-            if self.ocr_engine is None and self.ocr_available:
-                try:
-                    self._init_ocr()
-                except Exception as e:
-                    print(f"⚠ OCR başlatılamadı: {e}")
-                    self.ocr_available = False
-            
-            if self.ocr_engine is not None:
-                ocr_text = self.extract_text(cropped)
+            if self._ensure_ocr(timer):
+                with timer.stage('ocr'):
+                    ocr_text = self.extract_text(cropped)
             elif not self.ocr_available:
                 ocr_text = "OCR engine kullanılamıyor (PaddleOCR yüklü değil)"
         
@@ -356,25 +757,186 @@ class MedicineInference:
             'bbox': bbox.tolist() if isinstance(bbox, np.ndarray) else bbox,
             'all_probs': all_probs,
             'ocr_text': ocr_text,
+            'source': source,
+            'detection_size': detection['image_size'],
         }
+        if exit_layer is not None:
+            result['exit_layer'] = exit_layer
         
         if return_image:
             result['cropped_image'] = cropped
         
+        if timer.enabled:
+            self._finish(result, timer)
+        
+        return result
+    
+    def stream(self, **kwargs):
+        """
+        Video / kamera akışı oturumu (bkz. stream.MedicineStream)
+        Ayarlar config'deki stream bölümünden alınır; kwargs ile ezilebilir.
+        """
+        from stream import MedicineStream
+        options = dict(self.config.get('stream') or {}, **kwargs)
+        return MedicineStream(self, **options)
+    
+    def quality_controller(self, **kwargs):
+        """
+        Yüke göre kalite düşüren predict sarmalayıcısı (bkz. degradation.QualityController)
+        Ayarlar config'deki degradation bölümünden alınır; kwargs ile ezilebilir.
+        """
+        from degradation import QualityController
+        options = dict(self.config.get('degradation') or {}, **kwargs)
+        return QualityController(self, **options)
+    
+    def _load_image(self, image_path_or_pil):
+        """Görüntü yolu veya PIL Image -> RGB PIL Image"""
+        if isinstance(image_path_or_pil, (str, Path)):
+            return Image.open(image_path_or_pil).convert('RGB')
+        return image_path_or_pil.convert('RGB')
+    
+    def predict_multi(self, image_path_or_pil, return_image=False, use_ocr=False, conf_threshold=0.5,
+                      detection_size=None, fast_classifier=False):
+        """
+        Çoklu paket tahmini (ör. hastanın tüm ilaçları tek fotoğrafta)
+        
+        Eşiği geçen tüm kutular sınıftan bağımsız NMS sonrası döndürülür; ViT'e
+        giden crop'lar tek batch forward'unda sınıflandırılır. OCR açıksa Tesseract
+        (ayrı process olarak çalışır) crop'lar üzerinde eşzamanlı çalıştırılır;
+        PaddleOCR predictor'ı thread-safe olmadığı için crop'lar sırayla işlenir.
+        
+        Returns:
+            dict: {
+                'packages': kutu başına predict() sonuç sözlükleri (detection confidence azalan),
+                'count': int,
+                'error': str (kutu yoksa),
+                'timings' / 'memory': predict() ile aynı
+            }
+        """
+        timer = self._make_timer()
+        
+        with timer.stage('load'):
+            image = self._load_image(image_path_or_pil)
+        
+        # 1. Detection
+        with timer.stage('detect'):
+            detections = self.detect_all(image, conf_threshold=conf_threshold, image_size=detection_size)
+        
+        if not detections:
+            result = {'packages': [], 'count': 0, 'error': 'İlaç kutusu tespit edilemedi'}
+            if timer.enabled:
+                self._finish(result, timer)
+            return result
+        
+        # 2. Crop
+        with timer.stage('crop'):
+            crops = [self.crop_image(image, d['bbox']) for d in detections]
+        
+        # 3. Classification: cascade kısayolu alamayan crop'lar tek batch'te
+        classify_idx = [i for i, d in enumerate(detections) if not self._use_detector_class(d)]
+        classified = {}
+        exit_layers = {}
+        if classify_idx:
+            with timer.stage('classify'):
+                batch, batch_exit_layers = self._classify_batch([crops[i] for i in classify_idx],
+                                                                fast=fast_classifier)
+            classified = dict(zip(classify_idx, batch))
+            exit_layers = dict(zip(classify_idx, batch_exit_layers))
+        
+        # 4. OCR (opsiyonel; Tesseract crop'lar üzerinde eşzamanlı, PaddleOCR sırayla)
+        ocr_texts = [None] * len(crops)
+        if use_ocr:
+            if self._ensure_ocr(timer):
+                with timer.stage('ocr'):
+                    if self.ocr_engine == 'tesseract' and len(crops) > 1:
+                        with ThreadPoolExecutor(max_workers=self.config['ocr'].get('max_workers', 4)) as pool:
+                            ocr_texts = list(pool.map(self.extract_text, crops))
+                    else:
+                        ocr_texts = [self.extract_text(crop) for crop in crops]
+            elif not self.ocr_available:
+                ocr_texts = ["OCR engine kullanılamıyor (PaddleOCR yüklü değil)"] * len(crops)
+        
+        packages = []
+        for i, detection in enumerate(detections):
+            if i in classified:
+                source = 'classifier'
+                class_name, cls_confidence, all_probs = classified[i]
+            else:
+                source = 'detector'
+                class_name, cls_confidence = detection['class_name'], detection['class_probability']
+                all_probs = {name: detection['class_probs'].get(name, 0.0) for name in self.class_names}
+            package = {
+                'class_name': class_name,
+                'confidence': cls_confidence,
+                'detection_confidence': detection['confidence'],
+                'bbox': detection['bbox'].tolist(),
+                'all_probs': all_probs,
+                'ocr_text': ocr_texts[i],
+                'source': source,
+                'detection_size': detection['image_size'],
+            }
+            if exit_layers.get(i) is not None:
+                package['exit_layer'] = exit_layers[i]
+            if return_image:
+                package['cropped_image'] = crops[i]
+            packages.append(package)
+        
+        result = {'packages': packages, 'count': len(packages)}
+        if timer.enabled:
+            self._finish(result, timer)
         return result
 
 def main():
     """Test için main fonksiyonu"""
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="İlaç tanıma inference")
+    parser.add_argument('images', nargs='+', help="Görüntü yolu (profil modunda birden fazla verilebilir)")
+    parser.add_argument('--config', default='config.yaml', help="Config dosyası")
+    parser.add_argument('--profile', action='store_true', help="Tahminleri profiling altında çalıştır")
+    parser.add_argument('--runs', type=int, default=20, help="Profil alınacak tahmin sayısı")
+    parser.add_argument('--warmup', type=int, default=3, help="Profil öncesi ısınma tahmin sayısı")
+    parser.add_argument('--profile-dir', default='profiles', help="Profil çıktı klasörü")
+    parser.add_argument('--memory-report', action='store_true', help="Yükleme/predict bellek raporu yazdır")
+    parser.add_argument('--multi', action='store_true', help="Fotoğraftaki tüm ilaç kutularını tahmin et")
+    args = parser.parse_args()
+    if args.profile and args.runs < 1:
+        parser.error(f"--runs en az 1 olmalı: {args.runs}")
+    
+    # Inference pipeline'ı başlat
+    inference = MedicineInference(config_path=args.config, track_memory=args.memory_report)
     
-    if len(sys.argv) < 2:
-        print("Kullanım: python inference.py <görüntü_yolu>")
+    if args.profile:
+        from profiling import profile_predictions
+        profile_predictions(
+            lambda image_path: inference.predict(image_path, use_ocr=True, multi=args.multi),
+            args.images,
+            runs=args.runs,
+            warmup=args.warmup,
+            output_dir=args.profile_dir,
+            prefix='medicine_inference',
+        )
+        for size, stats in inference.detection_resolution_stats().items():
+            print(f"Tespit çözünürlüğü {size}px: {stats['count']} ({stats['share']:.1%})")
         return
     
-    image_path = sys.argv[1]
+    image_path = args.images[0]
     
-    # Inference pipeline'ı başlat
-    inference = MedicineInference()
+    if args.multi:
+        result = inference.predict(image_path, use_ocr=True, multi=True)
+        print("\n" + "="*50)
+        print(f"TAHMIN SONUÇLARI ({result['count']} kutu)")
+        print("="*50)
+        for i, package in enumerate(result['packages'], 1):
+            print(f"{i}. {package['class_name']} ({package['confidence']:.2%}, "
+                  f"detection {package['detection_confidence']:.2%}) bbox={[round(v) for v in package['bbox']]}")
+            if package['ocr_text']:
+                print(f"   OCR Metni: {package['ocr_text']}")
+        if result.get('timings'):
+            print("\nAşama Süreleri:")
+            for stage, seconds in result['timings'].items():
+                print(f"  {stage}: {seconds * 1000:.1f} ms")
+        return
     
     # Tahmin yap
     result = inference.predict(image_path, return_image=True, use_ocr=True)
@@ -385,11 +947,23 @@ def main():
     print(f"Sınıf: {result['class_name']}")
     print(f"Güven: {result['confidence']:.2%}")
     print(f"Detection Güven: {result['detection_confidence']:.2%}")
+    if result.get('detection_size'):
+        print(f"Detection Çözünürlüğü: {result['detection_size']}px")
     if result['ocr_text']:
         print(f"OCR Metni: {result['ocr_text']}")
+    if result.get('timings'):
+        print("\nAşama Süreleri:")
+        for stage, seconds in result['timings'].items():
+            print(f"  {stage}: {seconds * 1000:.1f} ms")
     print("\nTüm Olasılıklar:")
     for class_name, prob in sorted(result['all_probs'].items(), key=lambda x: x[1], reverse=True)[:5]:
         print(f"  {class_name}: {prob:.2%}")
+    
+    if inference.memory is not None:
+        # Tüm görüntüler üzerinden aşama tepelerini topla
+        for extra_path in args.images[1:]:
+            inference.predict(extra_path, use_ocr=True)
+        print("\n" + inference.memory.report())
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,197 @@
+"""
+Bellek Ölçümü
+Model yükleme aşamalarından sonra RSS + tracemalloc snapshot'ları alır,
+predict aşamaları için tepe bellek kullanımını ölçer ve en büyük
+bellek ayıranları raporlar.
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import torch
+
+from metrics import StageTimer
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+MB = 1024 * 1024
+
+def current_rss():
+    """Process'in anlık RSS değeri (byte), ölçülemezse None"""
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _format_mb(value):
+    return f"{value / MB:.1f} MB" if value is not None else "-"
+
+class _RssPeakSampler:
+    """Bir aşama boyunca RSS'i örnekleyip tepe değeri tutar"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return False
+
+class MemoryTracker:
+    """
+    Yükleme aşamaları için checkpoint, predict aşamaları için tepe bellek ölçümü
+
+    Kullanım:
+        tracker = MemoryTracker()
+        ... model yükle ...
+        tracker.checkpoint('detection_model')
+        print(tracker.report())
+    """
+
+    def __init__(self, trace_frames=1, sample_interval=0.005):
+        self.sample_interval = sample_interval
+        self.checkpoints = []
+        self.stage_peaks = {}
+        self.last_stage = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(trace_frames)
+        self._baseline = tracemalloc.take_snapshot()
+        self._last_snapshot = self._baseline
+        self._baseline_rss = current_rss()
+
+    def checkpoint(self, label):
+        """Bir yükleme aşamasından sonra RSS ve tracemalloc snapshot'ı al"""
+        snapshot = tracemalloc.take_snapshot()
+        rss = current_rss()
+        previous_rss = self.checkpoints[-1]['rss'] if self.checkpoints else self._baseline_rss
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        entry = {
+            'label': label,
+            'rss': rss,
+            'rss_delta': rss - previous_rss if rss is not None and previous_rss is not None else None,
+            'traced_current': traced_current,
+            'traced_peak': traced_peak,
+            'top_allocators': snapshot.compare_to(self._last_snapshot, 'lineno'),
+        }
+        self.checkpoints.append(entry)
+        self._last_snapshot = snapshot
+        print(f"  [MEM] {label}: RSS {_format_mb(rss)} (Δ {_format_mb(entry['rss_delta'])})")
+        return entry
+
+    @contextmanager
+    def stage(self, name):
+        """Bir aşamanın tepe RSS, Python ve (varsa) CUDA bellek kullanımını ölç"""
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        rss_before = current_rss()
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        with _RssPeakSampler(self.sample_interval) as sampler:
+            yield
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        stage_info = {
+            'rss_before': rss_before,
+            'rss_peak': sampler.peak,
+            'rss_peak_delta': sampler.peak - rss_before if sampler.peak is not None and rss_before is not None else None,
+            'python_peak_delta': traced_peak - traced_before,
+        }
+        if torch.cuda.is_available():
+            stage_info['cuda_peak'] = torch.cuda.max_memory_allocated()
+        # Süreç boyunca her aşamanın en yüksek değeri tutulur
+        previous = self.stage_peaks.get(name)
+        if previous is None or (stage_info['rss_peak'] or 0) > (previous['rss_peak'] or 0):
+            self.stage_peaks[name] = stage_info
+        self.last_stage = stage_info
+
+    def stage_timer(self):
+        """predict için süre + bellek ölçen timer"""
+        return MemoryStageTimer(self)
+
+    def report(self, top_n=10):
+        """Yükleme aşamaları, predict aşama tepeleri ve en büyük bellek ayıranlar"""
+        lines = ["=" * 70, "BELLEK RAPORU", "=" * 70]
+        lines.append(f"Başlangıç RSS: {_format_mb(self._baseline_rss)}")
+        lines.append(f"Güncel RSS: {_format_mb(current_rss())}")
+        if not PSUTIL_AVAILABLE and current_rss() is None:
+            lines.append("⚠ RSS ölçülemiyor (psutil kurun: pip install psutil)")
+
+        lines.append("\nYükleme aşamaları:")
+        lines.append(f"  {'Aşama':<28} {'RSS':>12} {'Δ RSS':>12} {'Python':>12}")
+        for entry in self.checkpoints:
+            lines.append(
+                f"  {entry['label']:<28} {_format_mb(entry['rss']):>12} "
+                f"{_format_mb(entry['rss_delta']):>12} {_format_mb(entry['traced_current']):>12}"
+            )
+
+        if self.stage_peaks:
+            lines.append("\nPredict aşamaları (tepe):")
+            lines.append(f"  {'Aşama':<28} {'Tepe RSS':>12} {'Δ Tepe':>12} {'Python Δ':>12}")
+            for name, info in self.stage_peaks.items():
+                line = (
+                    f"  {name:<28} {_format_mb(info['rss_peak']):>12} "
+                    f"{_format_mb(info['rss_peak_delta']):>12} {_format_mb(info['python_peak_delta']):>12}"
+                )
+                if 'cuda_peak' in info:
+                    line += f"  CUDA {_format_mb(info['cuda_peak'])}"
+                lines.append(line)
+
+        for entry in self.checkpoints:
+            lines.append(f"\nEn büyük bellek ayıranlar - {entry['label']} (ilk {top_n}):")
+            for stat in entry['top_allocators'][:top_n]:
+                frame = stat.traceback[0]
+                lines.append(
+                    f"  {stat.size_diff / MB:>+8.1f} MB  {stat.count_diff:>+8} blok  "
+                    f"{frame.filename}:{frame.lineno}"
+                )
+        return '\n'.join(lines)
+
+    def stop(self):
+        tracemalloc.stop()
+
+class MemoryStageTimer(StageTimer):
+    """StageTimer ile aynı arayüz; her aşamada bellek de ölçülür"""
+
+    def __init__(self, tracker):
+        super().__init__()
+        self.tracker = tracker
+        self.memory = {}
+
+    @contextmanager
+    def stage(self, name):
+        with self.tracker.stage(name):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start)
+        stage_info = self.tracker.last_stage
+        self.memory[name] = {
+            'rss_peak_mb': stage_info['rss_peak'] / MB if stage_info['rss_peak'] is not None else None,
+            'python_peak_delta_mb': stage_info['python_peak_delta'] / MB,
+        }
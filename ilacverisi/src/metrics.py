@@ -0,0 +1,266 @@
+"""
+Inference Metrikleri
+predict() aşamalarının süre ölçümü, process seviyesinde sayaç/histogramlar
+ve Prometheus-text / JSON snapshot dışa aktarımı.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Saniye cinsinden histogram sınırları (Prometheus varsayılanlarına yakın)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_key(labels):
+    """Label sözlüğünü sıralı, hashlenebilir bir anahtara çevir"""
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    """Prometheus label formatı: {a="1",b="2"}"""
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+class Counter:
+    """Sadece artan sayaç"""
+
+    type = 'counter'
+
+    def __init__(self, name, help_text, lock):
+        self.name = name
+        self.help = help_text
+        self._lock = lock
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self):
+        return [{'labels': dict(key), 'value': value} for key, value in self._values.items()]
+
+    def to_prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Gauge(Counter):
+    """Anlık değer (artıp azalabilir, ör. yüklü model belleği)"""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def to_prometheus(self):
+        lines = super().to_prometheus()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    """Kümülatif bucket'lı histogram"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, lock, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = lock
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def snapshot(self):
+        return [
+            {
+                'labels': dict(key),
+                'buckets': dict(zip(self.buckets, state['counts'])),
+                'sum': state['sum'],
+                'count': state['count'],
+            }
+            for key, state in self._values.items()
+        ]
+
+    def to_prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, state in self._values.items():
+            for bound, count in zip(self.buckets, state['counts']):
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {state['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {state['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Process seviyesindeki metrikler ve kullanıcı sink'leri"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._sinks = []
+
+    def counter(self, name, help_text=''):
+        """Sayacı getir, yoksa oluştur"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text, self._lock)
+            return self._metrics[name]
+
+    def gauge(self, name, help_text=''):
+        """Gauge'u getir, yoksa oluştur"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Gauge(name, help_text, self._lock)
+            return self._metrics[name]
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        """Histogramı getir, yoksa oluştur"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, self._lock, buckets)
+            return self._metrics[name]
+
+    def add_sink(self, sink):
+        """
+        Her olayda çağrılacak fonksiyon ekle
+        sink(event: dict) - örn. log, StatsD, OpenTelemetry köprüsü
+        """
+        self._sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def emit(self, event):
+        """Olayı tüm sink'lere ilet (sink hataları inference'ı bozmaz)"""
+        for sink in list(self._sinks):
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"⚠ Metrik sink hatası: {e}")
+
+    def snapshot(self):
+        """Tüm metriklerin JSON-uyumlu kopyası"""
+        with self._lock:
+            return {
+                name: {
+                    'type': metric.type,
+                    'help': metric.help,
+                    'values': metric.snapshot(),
+                }
+                for name, metric in self._metrics.items()
+            }
+
+    def to_prometheus(self):
+        """Prometheus text exposition formatı"""
+        with self._lock:
+            lines = []
+            for metric in self._metrics.values():
+                lines.extend(metric.to_prometheus())
+            return '\n'.join(lines) + '\n'
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, default=str)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+# Process genelinde tek registry
+REGISTRY = MetricsRegistry()
+
+class StageTimer:
+    """Tek bir predict çağrısının aşama sürelerini (saniye) toplar"""
+
+    enabled = True
+
+    def __init__(self):
+        self.timings = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Aynı aşama birden çok kez çalışırsa süreler toplanır
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start)
+
+    def total(self):
+        return time.perf_counter() - self._start
+
+class _NullTimer:
+    """Metrikler kapalıyken kullanılan, hiçbir şey ölçmeyen timer"""
+
+    enabled = False
+    timings = None
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def total(self):
+        return 0.0
+
+NULL_TIMER = _NullTimer()
+
+def snapshot(fmt='prometheus', registry=REGISTRY):
+    """Metrik snapshot'ı: 'prometheus' (text) veya 'json'"""
+    if fmt == 'json':
+        return registry.to_json()
+    return registry.to_prometheus()
+
+def serve_metrics(port=9100, host='0.0.0.0', registry=REGISTRY):
+    """
+    Arka planda /metrics (Prometheus) ve /metrics.json endpoint'lerini aç
+    Returns: HTTP server (kapatmak için server.shutdown())
+    """
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = registry.to_prometheus().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = registry.to_json().encode('utf-8')
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"✓ Metrik endpoint'i: http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,398 @@
+"""
+Çoklu Model Registry
+ilacverisi (YOLO + ViT) pipeline'ı, turkish_pill PillClassifier'ı ve
+müşteriye özel fine-tune'ları tek process'te isim + versiyon ile sunar.
+
+- Modeller ilk istekte (lazy) yüklenir
+- Aynı detector dosyası ve aynı ayarlı ViT processor'ları modeller arasında
+  paylaşılır (ComponentCache, referans sayımlı)
+- RAM bütçesi aşılırsa en uzun süredir kullanılmayan (LRU) modeller boşaltılır
+- Yükleme / boşaltma sayaçları, yükleme süresi histogramı ve yüklü bellek
+  gauge'u metrics.REGISTRY'ye yazılır
+
+Config (config.yaml -> registry):
+    registry:
+      memory_budget_mb: 4096
+      models:
+        turkish_pill:
+          kind: pill                         # medicine | pill
+          config: ../turkish_pill/config.yaml  # registry config'ine göre
+          versions:
+            default: {}
+            musteri_a: {models: {checkpoint: models/musteri_a}}  # config override
+
+Kullanım:
+    registry = ModelRegistry.from_config('config.yaml')
+    result = registry.predict('turkish_pill', image, version='musteri_a')
+"""
+
+import copy
+import gc
+import importlib.util
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import torch
+import yaml
+
+from metrics import REGISTRY
+
+MB = 1024 * 1024
+PILL_SRC = Path(__file__).resolve().parent.parent.parent / 'turkish_pill'
+
+# Config'lerde config klasörüne göreli olan yollar (ilacverisi ve turkish_pill)
+PATH_KEYS = (
+    ('data', 'dataset_path'), ('data', 'data_yaml'), ('data', 'cropped_path'),
+    ('detection', 'project'),
+    ('models', 'detection'), ('models', 'classification'), ('models', 'e2e_onnx'), ('models', 'checkpoint'),
+    ('cascade', 'calibration'),
+    ('hot_reload', 'smoke_dir'),
+    ('degradation', 'fast_classifier', 'checkpoint'),
+)
+
+def state_bytes(module):
+    """Modülün state_dict tensör byte'ı (INT8 paketlenmiş ağırlıklar dahil)"""
+    total = 0
+    stack = list(module.state_dict().values())
+    while stack:
+        value = stack.pop()
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, (tuple, list)):
+            stack.extend(value)
+    return total
+
+def component_bytes(component):
+    """Paylaşılan bileşenin (YOLO, processor) yaklaşık bellek boyutu"""
+    module = component if isinstance(component, torch.nn.Module) else getattr(component, 'model', None)
+    return state_bytes(module) if isinstance(module, torch.nn.Module) else 0
+
+def _merge(config, overrides):
+    """overrides sözlüğünü config'e iç içe birleştir"""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            _merge(config[key], value)
+        else:
+            config[key] = value
+
+def absolute_overrides(config_path, overrides=None):
+    """
+    Versiyon override'ları + config'teki göreli yolların config klasörüne göre mutlak hali
+
+    Process'in çalışma klasörü değiştirilmez; model sonradan çözdüğü yolları da
+    (lazy OCR, hot reload checkpoint_files, hızlı sınıflandırıcı) doğru bulur.
+    """
+    config_path = Path(config_path)
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    overrides = copy.deepcopy(overrides or {})
+    _merge(config, copy.deepcopy(overrides))
+
+    for keys in PATH_KEYS:
+        value = config
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        if not value or Path(value).is_absolute():
+            continue
+        target = overrides
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = str(config_path.parent / value)
+    return overrides
+
+def _load_pill_classifier_class():
+    """turkish_pill/inference.py (ilacverisi'deki inference.py ile aynı isimli)"""
+    if str(PILL_SRC) not in sys.path:
+        sys.path.append(str(PILL_SRC))
+    module = sys.modules.get('turkish_pill_inference')
+    if module is None:
+        spec = importlib.util.spec_from_file_location('turkish_pill_inference', PILL_SRC / 'inference.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules['turkish_pill_inference'] = module
+    return module.PillClassifier
+
+class ComponentCache:
+    """Modeller arasında paylaşılan bileşenler (referans sayımlı)"""
+
+    def __init__(self):
+        self._items = {}
+        self._loading = {}  # (tür, anahtar) -> Future; aynı bileşeni bekleyenler tek yüklemeyi paylaşır
+        # Sadece kayıt işleri için; bileşen yükleme bu kilidin dışında yapılır
+        self._lock = threading.RLock()
+
+    def _hit(self, kind, key):
+        """Kayıtlıysa referansı artırıp bileşeni döndür (kilit altında çağrılır)"""
+        item = self._items.get((kind, key))
+        if item is None:
+            return None
+        item['refs'] += 1
+        return item['component']
+
+    def acquire(self, kind, key, loader):
+        """
+        Bileşeni getir, yoksa yükle
+
+        key None ise bileşen yüklenip ayarlarından (to_json_string) anahtar üretilir;
+        aynı ayarlı bir örnek varsa yeni yüklenen atılır. Yükleme kilit dışında
+        yapılır (resident_bytes / yüklü bileşenler beklemez).
+
+        Returns:
+            (bileşen, anahtar)
+        """
+        if key is None:
+            component = loader()
+            key = component.to_json_string()
+            with self._lock:
+                existing = self._hit(kind, key)
+                if existing is not None:
+                    return existing, key
+                self._items[(kind, key)] = {'component': component, 'refs': 1, 'bytes': component_bytes(component)}
+                return component, key
+
+        while True:
+            with self._lock:
+                existing = self._hit(kind, key)
+                if existing is not None:
+                    return existing, key
+                future = self._loading.get((kind, key))
+                owner = future is None
+                if owner:
+                    future = self._loading[(kind, key)] = Future()
+            if owner:
+                break
+            # Diğer yükleme bitince tekrar bak (bu arada bırakılmış olabilir)
+            future.result()
+
+        try:
+            component = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[(kind, key)]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[(kind, key)]
+            self._items[(kind, key)] = {'component': component, 'refs': 1, 'bytes': component_bytes(component)}
+        future.set_result(component)
+        return component, key
+
+    def release(self, keys):
+        """Modelin kullandığı bileşenleri bırak; referansı kalmayanlar silinir"""
+        with self._lock:
+            for kind_key in keys:
+                item = self._items.get(kind_key)
+                if item is None:
+                    continue
+                item['refs'] -= 1
+                if item['refs'] <= 0:
+                    del self._items[kind_key]
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(item['bytes'] for item in self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+class ModelRegistry:
+    """İsim + versiyon ile lazy model yükleme, RAM bütçesi ve LRU boşaltma"""
+
+    def __init__(self, specs, memory_budget_mb=4096, base_dir='.'):
+        """
+        Args:
+            specs: {isim: {'kind', 'config', 'versions': {versiyon: override}}}
+            memory_budget_mb: Yüklü model + paylaşılan bileşen bütçesi
+            base_dir: specs içindeki config yollarının göreli olduğu klasör
+        """
+        self.specs = specs
+        self.budget_bytes = memory_budget_mb * MB
+        self.base_dir = Path(base_dir)
+        self.components = ComponentCache()
+        self.models = OrderedDict()  # (isim, versiyon) -> {'model', 'bytes'}, LRU sırası
+        self.known_sizes = {}  # Önceki yüklemelerden boyut tahmini
+        self.loading = {}  # (isim, versiyon) -> Future; aynı modeli bekleyenler tek yüklemeyi paylaşır
+        # Sadece kayıt işleri için; model yükleme bu kilidin dışında yapılır
+        self.lock = threading.RLock()
+
+        self.metrics = {
+            'loads': REGISTRY.counter('model_registry_loads_total', 'Registry model yüklemeleri'),
+            'evictions': REGISTRY.counter('model_registry_evictions_total', 'Bütçe için boşaltılan modeller'),
+            'hits': REGISTRY.counter('model_registry_hits_total', 'Zaten yüklü modele gelen istekler'),
+            'load_seconds': REGISTRY.histogram('model_registry_load_seconds', 'Model yükleme süresi (saniye)',
+                                               buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120)),
+            'resident_mb': REGISTRY.gauge('model_registry_resident_mb', 'Yüklü model + bileşen belleği (MB)'),
+        }
+
+    @classmethod
+    def from_config(cls, config_path='config.yaml'):
+        """config.yaml içindeki registry bölümünden oluştur"""
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        registry_config = config.get('registry') or {}
+        return cls(registry_config.get('models', {}),
+                   memory_budget_mb=registry_config.get('memory_budget_mb', 4096),
+                   base_dir=Path(config_path).resolve().parent)
+
+    def _resolve(self, name, version):
+        if name not in self.specs:
+            raise KeyError(f"Registry'de model yok: {name} (mevcut: {', '.join(self.specs)})")
+        spec = self.specs[name]
+        versions = spec.get('versions') or {'default': {}}
+        version = version or next(iter(versions))
+        if version not in versions:
+            raise KeyError(f"{name} için versiyon yok: {version} (mevcut: {', '.join(versions)})")
+        return spec, version, versions[version] or {}
+
+    def resident_bytes(self):
+        """Yüklü modeller (paylaşılmayan kısım) + paylaşılan bileşenler"""
+        with self.lock:
+            return sum(entry['bytes'] for entry in self.models.values()) + self.components.total_bytes()
+
+    def get(self, name, version=None):
+        """
+        Modeli getir (yüklü değilse yükle); MedicineInference veya PillClassifier
+
+        Yükleme registry kilidi dışında yapılır: yüklü modellere gelen istekler
+        beklemez, aynı modeli isteyen diğer thread'ler aynı yüklemeyi bekler.
+        """
+        spec, version, overrides = self._resolve(name, version)
+        key = (name, version)
+        with self.lock:
+            entry = self.models.get(key)
+            if entry is not None:
+                self.models.move_to_end(key)
+                self.metrics['hits'].inc(model=name, version=version)
+                return entry['model']
+
+            future = self.loading.get(key)
+            owner = future is None
+            if owner:
+                future = self.loading[key] = Future()
+                # Önceki yüklemeden boyut biliniyorsa önce yer aç (yükleme anında tepe bellek)
+                self._evict_until(self.known_sizes.get(key, spec.get('estimate_mb', 0) * MB))
+        if not owner:
+            return future.result()
+
+        try:
+            entry = self._load(spec, overrides, name, version)
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.loading[key]
+            self.models[key] = entry
+            self.known_sizes[key] = entry['bytes']
+            self._evict_until(0, keep=key)
+            self._update_gauge()
+        future.set_result(entry['model'])
+        return entry['model']
+
+    def predict(self, name, image, version=None, **kwargs):
+        """Modeli getir ve predict çağır"""
+        return self.get(name, version).predict(image, **kwargs)
+
+    def _load(self, spec, overrides, name, version):
+        kind = spec.get('kind', 'medicine')
+        config_path = (self.base_dir / spec['config']).resolve()
+        overrides = absolute_overrides(config_path, overrides)
+        if kind == 'medicine':
+            from inference import MedicineInference as model_class
+        elif kind == 'pill':
+            model_class = _load_pill_classifier_class()
+        else:
+            raise ValueError(f"Bilinmeyen model türü: {kind} (medicine / pill)")
+
+        start = time.perf_counter()
+        # __init__ ayrı çağrılır: yarıda hata olursa o ana kadar alınan bileşenler bırakılabilsin
+        model = model_class.__new__(model_class)
+        try:
+            model.__init__(config_path=str(config_path), overrides=overrides, components=self.components)
+        except BaseException:
+            self.components.release(getattr(model, 'shared_components', []))
+            raise
+        owned = state_bytes(model.classification_model if kind == 'medicine' else model.model)
+        elapsed = time.perf_counter() - start
+
+        self.metrics['loads'].inc(model=name, version=version)
+        self.metrics['load_seconds'].observe(elapsed, model=name)
+        print(f"✓ Registry: {name}@{version} yüklendi ({owned / MB:.0f} MB, {elapsed:.1f} s, "
+              f"paylaşılan bileşen: {len(model.shared_components)})")
+        return {'model': model, 'bytes': owned}
+
+    def _evict_until(self, incoming_bytes, keep=None):
+        """Bütçe aşılıyorsa LRU sırasıyla modelleri boşalt"""
+        while self.models and self.resident_bytes() + incoming_bytes > self.budget_bytes:
+            key = next(iter(self.models))
+            if key == keep:
+                if len(self.models) == 1:
+                    print(f"⚠ Registry: {key[0]}@{key[1]} tek başına bütçeyi aşıyor "
+                          f"({self.resident_bytes() / MB:.0f} MB > {self.budget_bytes / MB:.0f} MB)")
+                    break
+                self.models.move_to_end(key)
+                continue
+            self.evict(*key)
+
+    def evict(self, name, version):
+        """Modeli boşalt ve paylaşılan bileşen referanslarını bırak"""
+        with self.lock:
+            entry = self.models.pop((name, version), None)
+            if entry is None:
+                return False
+            self.components.release(entry['model'].shared_components)
+            self.metrics['evictions'].inc(model=name, version=version)
+            del entry
+            gc.collect()
+            self._update_gauge()
+            print(f"Registry: {name}@{version} boşaltıldı")
+            return True
+
+    def _update_gauge(self):
+        self.metrics['resident_mb'].set(self.resident_bytes() / MB)
+
+    def stats(self):
+        """Yüklü modeller (LRU sırası, en eski başta) ve bellek"""
+        with self.lock:
+            return {
+                'loaded': [{'model': name, 'version': version, 'mb': entry['bytes'] / MB}
+                           for (name, version), entry in self.models.items()],
+                'shared_components': len(self.components),
+                'resident_mb': self.resident_bytes() / MB,
+                'budget_mb': self.budget_bytes / MB,
+            }
+
+def main():
+    """Registry'deki modelleri sırayla yükleyip bütçe davranışını göster"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Çoklu model registry")
+    parser.add_argument('image', help="Test görüntüsü")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--budget-mb', type=int, help="Varsayılan: config registry.memory_budget_mb")
+    args = parser.parse_args()
+
+    registry = ModelRegistry.from_config(args.config)
+    if args.budget_mb:
+        registry.budget_bytes = args.budget_mb * MB
+
+    for name, spec in registry.specs.items():
+        for version in (spec.get('versions') or {'default': {}}):
+            result = registry.predict(name, args.image, version=version)
+            print(f"   {name}@{version}: {result.get('class_name')} ({result.get('confidence', 0):.2%})")
+
+    stats = registry.stats()
+    loaded = ', '.join(f"{m['model']}@{m['version']}" for m in stats['loaded'])
+    print(f"\nYüklü: {loaded}")
+    print(f"Bellek: {stats['resident_mb']:.0f} / {stats['budget_mb']:.0f} MB, "
+          f"paylaşılan bileşen: {stats['shared_components']}")
+
+if __name__ == '__main__':
+    main()
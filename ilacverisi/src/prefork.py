@@ -0,0 +1,222 @@
+"""
+Pre-fork Worker Supervisor (Copy-on-Write Paylaşımlı Modeller)
+Modeller (YOLO, ViT, varsa OCR) parent process'te bir kez yüklenir, ağırlık
+tensörleri paylaşımlı belleğe taşınır ve worker'lar fork ile açılır. Böylece
+host belleği worker sayısıyla değil model boyutuyla büyür.
+
+- Detector parent'ta bir kez çalıştırılır (Conv+BN füzyonu fork öncesi yapılır)
+- Ağırlıklar share_memory_() ile MAP_SHARED bölgelere taşınır: worker'larda
+  yazma / refcount değişimi ağırlık sayfalarını kopyalamaz (refcount Python
+  nesne başlığında, tensör verisi ayrı storage'da durur)
+- Fork öncesi gc.freeze(): parent'taki nesneler GC tarafından taranmaz, nesne
+  sayfaları da gereksiz yere kopyalanmaz
+- Her worker ayrı CPU setine pinlenir; torch thread sayısı ve worker'da create_session
+  ile açılan ORT session'larının intra-op thread sayısı set boyutuna eşitlenir
+- Çöken worker parent'taki hazır modellerden yeniden fork edilir (model yüklenmez).
+  Yeniden başlatma monitor thread'inden yapılır; parent'ta collector / monitor /
+  kuyruk thread'leri çalışırken fork güvenli kalsın diye parent'ta torch tek
+  thread'le tutulur (OpenMP havuzu hiç açılmaz), parent'ta predict çağrılmaz ve
+  fork'lar tek kilit altında, stdout/stderr boşaltılarak yapılır
+- İstek taşıma WorkerPool'un paylaşımlı bellek slotlarıyla yapılır
+
+Sadece fork destekleyen platformlarda (Linux) çalışır; Windows'ta WorkerPool kullanın.
+
+Kullanım:
+    python src/prefork.py --workers 4
+"""
+
+import gc
+import os
+import sys
+import threading
+
+import torch
+
+from worker_pool import WorkerPool, _serve, _load_config
+
+def warm_detector(inference):
+    """
+    Detector'ı parent'ta bir kez çalıştır
+
+    Ultralytics ilk predict'te AutoBackend(fuse=True) kurar ve Conv+BN'leri yeni
+    ayrılan füzyon tensörleriyle değiştirir; bu fork sonrası olursa her worker
+    detector ağırlıklarının kendi kopyasını oluşturur. Parent'ta tek thread ile
+    çalıştırılır (OpenMP havuzu fork öncesi açılmasın).
+    """
+    from PIL import Image
+
+    size = inference.config['detection']['image_size']
+    previous = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        inference.detection_model(Image.new('RGB', (size, size)), imgsz=size, verbose=False)
+    finally:
+        torch.set_num_threads(previous)
+
+def share_model_weights(inference):
+    """
+    Model ağırlıklarını paylaşımlı belleğe taşı (önce warm_detector çağrılmalı)
+
+    Returns:
+        int: paylaşılan tensör byte'ı
+    """
+    modules = [inference.classification_model]
+    # Füzyon sonrası predict'in kullandığı model predictor.model (AutoBackend)
+    predictor = getattr(inference.detection_model, 'predictor', None)
+    detector = getattr(predictor, 'model', None)
+    if detector is None:
+        detector = getattr(inference.detection_model, 'model', None)
+    if isinstance(detector, torch.nn.Module):
+        modules.append(detector)
+
+    shared = 0
+    for module in modules:
+        # INT8 quantize modellerde paketlenmiş ağırlıklar parameters() içinde değil,
+        # bunlar fork sonrası CoW ile paylaşılır
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if tensor.device.type == 'cpu' and not tensor.is_shared():
+                tensor.share_memory_()
+                shared += tensor.numel() * tensor.element_size()
+    return shared
+
+def split_cpus(workers, cpus=None):
+    """Kullanılabilir CPU'ları worker'lara eşit bloklar halinde böl"""
+    cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    per_worker = max(1, len(cpus) // workers)
+    return [cpus[(i * per_worker) % len(cpus):][:per_worker] for i in range(workers)]
+
+def pin_worker(cpus):
+    """Process'i CPU setine pinle, thread sayılarını set boyutuna eşitle"""
+    os.sched_setaffinity(0, cpus)
+    # OMP_NUM_THREADS process başladıktan sonra okunmaz; ORT session'ları
+    # create_session üzerinden bu sınırı uygular
+    os.environ['ORT_INTRA_OP_THREADS'] = str(len(cpus))
+    torch.set_num_threads(len(cpus))
+
+def process_memory(pid):
+    """/proc/<pid>/smaps_rollup: RSS, PSS ve private (MB); okunamazsa None"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+
+    def kb(*names):
+        return sum(int(fields[n].split()[0]) for n in names if n in fields) / 1024
+
+    return {
+        'rss_mb': kb('Rss'),
+        'pss_mb': kb('Pss'),
+        'private_mb': kb('Private_Clean', 'Private_Dirty'),
+    }
+
+def _prefork_worker_main(index, inference, cpus, threads, image_shm, records, slot_bytes, tasks, results,
+                         conf_threshold, current, dequeue_lock):
+    """Fork edilen worker: parent'ın yüklediği modelleri kullanır"""
+    if cpus:
+        pin_worker(cpus)
+    else:
+        # Parent tek thread'de tutulur; worker yüklemedeki thread sayısına döner
+        torch.set_num_threads(threads)
+    results.put(('ready', index))
+    _serve(index, inference, image_shm.buf, records, slot_bytes, tasks, results, conf_threshold, current,
+           dequeue_lock)
+
+class PreforkPool(WorkerPool):
+    """Modelleri parent'ta bir kez yükleyip fork eden WorkerPool"""
+
+    start_method = 'fork'
+
+    def __init__(self, config_path='config.yaml', workers=None, slots=None, max_pixels=None,
+                 conf_threshold=0.5, pin_cpus=None, **kwargs):
+        """
+        Args:
+            pin_cpus: Worker'ları CPU setlerine pinle (None: config worker_pool.pin_cpus)
+            Diğerleri: WorkerPool
+        """
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("PreforkPool fork gerektirir (Linux); bu platformda WorkerPool kullanın")
+        from inference import MedicineInference
+
+        config = _load_config(config_path)
+        pool_config = config.get('worker_pool') or {}
+        workers = workers or pool_config.get('workers', 2)
+        if pin_cpus is None:
+            pin_cpus = pool_config.get('pin_cpus', True)
+        self.cpu_sets = split_cpus(workers) if pin_cpus and hasattr(os, 'sched_setaffinity') else [None] * workers
+
+        # Fork öncesi parent'ta paralel torch işi çalıştırılmaz (OpenMP havuzu fork-safe değil);
+        # yükleme sonrası parent tek thread'de kalır, yeniden başlatma fork'ları da güvenli olur
+        self.inference = MedicineInference(config_path=config_path)
+        self.worker_threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+        self.fork_lock = threading.Lock()
+        warm_detector(self.inference)
+        shared = share_model_weights(self.inference)
+        print(f"✓ Paylaşımlı ağırlıklar: {shared / (1024 * 1024):.1f} MB")
+
+        super().__init__(config_path, workers=workers, slots=slots, max_pixels=max_pixels,
+                         conf_threshold=conf_threshold, **kwargs)
+
+    def _start_worker(self, index):
+        """
+        Parent'taki modellerden worker fork et (yeniden başlatmada da model yüklenmez)
+        Monitor thread'inden de çağrılır: fork'lar tek kilit altında, tamponlar boşaltılarak yapılır
+        """
+        with self.fork_lock:
+            gc.freeze()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            worker = self.context.Process(
+                target=_prefork_worker_main,
+                args=(index, self.inference, self.cpu_sets[index], self.worker_threads, self.image_shm,
+                      self.records, self.slot_bytes, self.tasks, self.results, self.conf_threshold,
+                      self.current, self.dequeue_lock),
+                daemon=True,
+            )
+            worker.start()
+            self.workers[index] = worker
+
+    def memory_report(self):
+        """Parent ve worker'ların RSS / PSS / private belleği"""
+        rows = [('parent', os.getpid())] + [(f'worker {i}', w.pid) for i, w in enumerate(self.workers)]
+        lines = [f"{'Process':<10} {'RSS':>10} {'PSS':>10} {'Private':>10}"]
+        for name, pid in rows:
+            memory = process_memory(pid)
+            if memory is None:
+                lines.append(f"{name:<10} {'-':>10} {'-':>10} {'-':>10}")
+                continue
+            lines.append(f"{name:<10} {memory['rss_mb']:>8.1f}MB {memory['pss_mb']:>8.1f}MB "
+                         f"{memory['private_mb']:>8.1f}MB")
+        return '\n'.join(lines)
+
+def main():
+    """Test setinde pre-fork havuzu verimi ve bellek raporu"""
+    import argparse
+    import time
+    from pathlib import Path
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="Pre-fork worker supervisor")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--workers', type=int, help="Varsayılan: config worker_pool.workers")
+    parser.add_argument('--max-images', type=int, default=200)
+    parser.add_argument('--no-pin', action='store_true', help="CPU pinleme yapma")
+    args = parser.parse_args()
+
+    config = _load_config(args.config)
+    images_dir = Path(config['data']['dataset_path']) / 'test' / 'images'
+    images = [Image.open(p).convert('RGB') for p in sorted(images_dir.glob('*.jpg'))[:args.max_images]]
+
+    with PreforkPool(args.config, workers=args.workers, pin_cpus=False if args.no_pin else None) as pool:
+        for index, cpus in enumerate(pool.cpu_sets):
+            print(f"   worker {index}: CPU {cpus if cpus else 'pinlenmedi'}")
+        start = time.perf_counter()
+        records = [f.result() for f in [pool.submit(image) for image in images]]
+        elapsed = time.perf_counter() - start
+        print(f"\n{len(records)} görüntü, {elapsed:.2f} s ({len(records) / max(elapsed, 1e-9):.1f} görüntü/s)")
+        print("\n" + pool.memory_report())
+        print(f"Yeniden başlatma: {pool.restarts}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Profiling Yardımcıları
+Birden çok tahmini Python sampling profiler + torch.profiler altında çalıştırır;
+flamegraph için collapsed-stack, Chrome trace ve self-time özeti üretir.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import torch
+
+class SamplingProfiler:
+    """
+    Hedef thread'in Python stack'ini belirli aralıklarla örnekler
+    Çıktı: flamegraph.pl / speedscope ile açılabilen collapsed-stack formatı
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        return f"{Path(code.co_filename).name}:{code.co_name}"
+
+    def _sample(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def self_time(self):
+        """Fonksiyon bazında self örnek sayısı (stack'in en üstündeki fonksiyon)"""
+        leaf_counts = Counter()
+        for stack, count in self.stacks.items():
+            leaf_counts[stack.rsplit(';', 1)[-1]] += count
+        return leaf_counts
+
+    def write_collapsed(self, output_path):
+        """Collapsed-stack dosyası yaz: 'a;b;c <sayı>' satırları"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def profile_predictions(predict_fn, inputs, runs=10, warmup=2, output_dir='profiles',
+                        prefix='predict', top_n=20, interval=0.001):
+    """
+    predict_fn'i inputs üzerinde ısındırıp runs kez profiling altında çalıştır
+
+    Args:
+        predict_fn: Tek girdi alan tahmin fonksiyonu
+        inputs: Girdi listesi (runs boyunca döngüsel kullanılır)
+        runs: Profil alınacak tahmin sayısı
+        warmup: Profil dışı ısınma tahmin sayısı
+        output_dir: Çıktı klasörü
+        prefix: Dosya adı ön eki
+
+    Returns:
+        dict: Çıktı dosyalarının yolları
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    inputs = list(inputs)
+    if not inputs:
+        raise ValueError("Profil için en az bir girdi gerekli")
+    if runs < 1:
+        raise ValueError(f"Profil tahmin sayısı en az 1 olmalı: {runs}")
+
+    print(f"Isınma: {warmup} tahmin...")
+    for i in range(warmup):
+        predict_fn(inputs[i % len(inputs)])
+
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+    print(f"Profil alınıyor: {runs} tahmin...")
+    sampler = SamplingProfiler(interval=interval)
+    start = time.perf_counter()
+    with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+        with sampler:
+            for i in range(runs):
+                with torch.profiler.record_function(f"{prefix}#{i}"):
+                    predict_fn(inputs[i % len(inputs)])
+    elapsed = time.perf_counter() - start
+
+    collapsed_path = output_dir / f"{prefix}.folded"
+    trace_path = output_dir / f"{prefix}_trace.json"
+    summary_path = output_dir / f"{prefix}_summary.txt"
+
+    sampler.write_collapsed(collapsed_path)
+    prof.export_chrome_trace(str(trace_path))
+
+    sort_key = 'self_cuda_time_total' if torch.cuda.is_available() else 'self_cpu_time_total'
+    op_table = prof.key_averages().table(sort_by=sort_key, row_limit=top_n)
+
+    total_samples = max(sampler.samples, 1)
+    py_lines = [f"{'Fonksiyon':<60} {'Örnek':>8} {'Self %':>8}"]
+    for name, count in sampler.self_time().most_common(top_n):
+        py_lines.append(f"{name:<60} {count:>8} {count / total_samples:>8.1%}")
+
+    summary = [
+        f"Tahmin sayısı: {runs} (ısınma: {warmup})",
+        f"Toplam süre: {elapsed:.3f} s, tahmin başına: {elapsed / runs * 1000:.1f} ms",
+        f"Python örnek sayısı: {sampler.samples} (aralık: {interval * 1000:.1f} ms)",
+        "",
+        f"== En çok self-time harcayan operatörler (torch.profiler, {sort_key}) ==",
+        op_table,
+        "",
+        "== En çok self-time harcayan Python fonksiyonları (sampling) ==",
+        '\n'.join(py_lines),
+    ]
+    summary_text = '\n'.join(summary)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        f.write(summary_text + '\n')
+
+    print(summary_text)
+    print(f"\n✓ Collapsed stack: {collapsed_path}")
+    print(f"✓ Chrome trace: {trace_path}  (chrome://tracing veya ui.perfetto.dev)")
+    print(f"✓ Özet: {summary_path}")
+
+    return {
+        'collapsed': collapsed_path,
+        'chrome_trace': trace_path,
+        'summary': summary_path,
+    }
@@ -0,0 +1,269 @@
+"""
+Video / Kamera Akışı Modu
+Kareleri sırayla işler; tam detection sadece her K karede bir veya sahnede
+belirgin hareket olduğunda çalışır, aradaki karelerde kutu ucuz bir template
+matching tracker ile izlenir. ViT sadece izlenen crop belirgin şekilde
+değiştiğinde tekrar çalışır; sınıf olasılıkları zaman içinde EMA ile yumuşatılır.
+
+Kullanım:
+    stream = inference.stream()
+    for frame in frames:
+        result = stream.process(frame)
+
+    python src/stream.py video.mp4
+    python src/stream.py 0          # kamera
+"""
+
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Hareket / takip hesapları bu genişliğe küçültülmüş gri görüntüde yapılır
+TRACK_WIDTH = 320
+# Crop değişimi bu boyuttaki gri küçük resimle ölçülür
+THUMB_SIZE = 32
+
+def _to_pil(frame):
+    """PIL Image veya RGB numpy dizisi -> RGB PIL Image"""
+    if isinstance(frame, Image.Image):
+        return frame.convert('RGB')
+    return Image.fromarray(np.asarray(frame, dtype=np.uint8))
+
+def _gray(image, width):
+    """Genişliği width olacak şekilde küçültülmüş gri görüntü ve ölçek"""
+    scale = width / image.size[0]
+    small = image.convert('L').resize((width, max(1, round(image.size[1] * scale))), Image.BILINEAR)
+    return np.asarray(small, dtype=np.uint8), scale
+
+class MedicineStream:
+    """MedicineInference üzerinde kare akışı oturumu (tek kutu)"""
+
+    def __init__(self, inference, detect_every=10, motion_threshold=12.0, track_min_score=0.5,
+                 reclassify_threshold=8.0, smoothing=0.6, conf_threshold=0.5):
+        """
+        Args:
+            inference: MedicineInference
+            detect_every: Tam detection aralığı (kare)
+            motion_threshold: Ardışık kareler arası ortalama gri fark (0-255); aşılırsa detection
+            track_min_score: Template eşleşme skoru (TM_CCOEFF_NORMED) bunun altındaysa detection
+            reclassify_threshold: Crop küçük resmindeki ortalama gri fark; aşılırsa ViT tekrar çalışır
+            smoothing: Olasılık EMA katsayısı (0: yumuşatma yok, yeni = s * eski + (1 - s) * son)
+            conf_threshold: Detection için güven eşiği
+        """
+        self.inference = inference
+        self.detect_every = detect_every
+        self.motion_threshold = motion_threshold
+        self.track_min_score = track_min_score
+        self.reclassify_threshold = reclassify_threshold
+        self.smoothing = smoothing
+        self.conf_threshold = conf_threshold
+        self.counts = Counter()
+        self.reset()
+
+    def reset(self):
+        """İzleme durumunu sıfırla (ör. yeni ilaç kutusu gösterilecekse)"""
+        self.frame_index = 0
+        self.previous_gray = None
+        self._lose_track()
+
+    def _lose_track(self):
+        """Kutu kaybolduğunda izleme ve yumuşatma durumunu temizle"""
+        self.bbox = None
+        self.detection_confidence = 0.0
+        self.frames_since_detect = 0
+        self.template = None
+        self.last_thumb = None
+        self.last_probs = None
+        self.last_source = None
+        self.smoothed_probs = None
+
+    def _motion(self, gray):
+        """Önceki kareye göre belirgin hareket var mı"""
+        if self.previous_gray is None or self.previous_gray.shape != gray.shape:
+            return True
+        diff = cv2.absdiff(gray, self.previous_gray)
+        return float(diff.mean()) > self.motion_threshold
+
+    def _set_template(self, gray, scale):
+        x1, y1, x2, y2 = (np.asarray(self.bbox) * scale).round().astype(int)
+        x1, y1 = max(0, x1), max(0, y1)
+        self.template = gray[y1:y2, x1:x2].copy()
+
+    def _track(self, gray, scale):
+        """
+        Önceki kutuyu çevresindeki arama penceresinde template matching ile bul
+        Returns: eşleşme skoru (başarısızsa None)
+        """
+        if self.template is None or min(self.template.shape) < 4:
+            return None
+        h, w = self.template.shape
+        x1, y1 = (np.asarray(self.bbox[:2]) * scale).round().astype(int)
+        margin = max(w, h) // 2
+        rx1, ry1 = max(0, x1 - margin), max(0, y1 - margin)
+        rx2, ry2 = min(gray.shape[1], x1 + w + margin), min(gray.shape[0], y1 + h + margin)
+        region = gray[ry1:ry2, rx1:rx2]
+        if region.shape[0] < h or region.shape[1] < w:
+            return None
+
+        scores = cv2.matchTemplate(region, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (mx, my) = cv2.minMaxLoc(scores)
+        if score < self.track_min_score:
+            return None
+        nx1, ny1 = (rx1 + mx) / scale, (ry1 + my) / scale
+        self.bbox = np.array([nx1, ny1, nx1 + w / scale, ny1 + h / scale])
+        return float(score)
+
+    def _crop_changed(self, crop):
+        """Son sınıflandırılan crop'a göre belirgin değişim var mı"""
+        thumb = np.asarray(crop.convert('L').resize((THUMB_SIZE, THUMB_SIZE), Image.BILINEAR), dtype=np.float32)
+        changed = self.last_thumb is None or float(np.abs(thumb - self.last_thumb).mean()) > self.reclassify_threshold
+        if changed:
+            self.last_thumb = thumb
+        return changed
+
+    def _count_reuse(self, stage):
+        self.counts[f'{stage}_reused'] += 1
+        if self.inference.metrics_enabled:
+            self.inference.metrics['cache_hits'].inc(stage=f'stream_{stage}')
+
+    def process(self, frame):
+        """
+        Tek kare işle
+
+        Args:
+            frame: PIL Image veya RGB numpy dizisi
+        Returns:
+            dict: predict() anahtarları (olasılıklar yumuşatılmış) +
+                  'frame_index', 'detected' (tam detection yapıldı mı),
+                  'classified' (ViT / cascade bu karede çalıştı mı), 'track_score'
+        """
+        inference = self.inference
+        timer = inference._make_timer()
+        image = _to_pil(frame)
+        self.frame_index += 1
+        self.counts['frames'] += 1
+
+        # 1. Hareket / takip, gerekirse tam detection
+        with timer.stage('track'):
+            gray, scale = _gray(image, TRACK_WIDTH)
+            motion = self._motion(gray)
+            self.previous_gray = gray
+            track_score = None
+            if self.bbox is not None and not motion and self.frames_since_detect < self.detect_every:
+                track_score = self._track(gray, scale)
+
+        detection = None
+        if track_score is None:
+            with timer.stage('detect'):
+                detection = inference.detect(image, conf_threshold=self.conf_threshold)
+            self.counts['detections'] += 1
+            self.frames_since_detect = 0
+            if detection is None:
+                self._lose_track()
+                result = {
+                    'class_name': None, 'confidence': 0.0, 'detection_confidence': 0.0, 'bbox': None,
+                    'all_probs': {}, 'ocr_text': None, 'frame_index': self.frame_index,
+                    'detected': True, 'classified': False, 'track_score': None,
+                    'error': 'İlaç kutusu tespit edilemedi',
+                }
+                if timer.enabled:
+                    inference._finish(result, timer)
+                return result
+            self.bbox = detection['bbox']
+            self.detection_confidence = detection['confidence']
+            self._set_template(gray, scale)
+        else:
+            self.frames_since_detect += 1
+            self._count_reuse('detect')
+
+        # 2. Crop değiştiyse tekrar sınıflandır
+        with timer.stage('crop'):
+            crop = inference.crop_image(image, self.bbox)
+        classified = self._crop_changed(crop) or self.last_probs is None
+        if classified:
+            if detection is not None and inference._use_detector_class(detection):
+                self.last_source = 'detector'
+                probs = detection['class_probs']
+            else:
+                self.last_source = 'classifier'
+                with timer.stage('classify'):
+                    _, _, probs = inference.classify(crop)
+            self.last_probs = np.array([probs.get(name, 0.0) for name in inference.class_names])
+            self.counts['classifications'] += 1
+        else:
+            self._count_reuse('classify')
+
+        # 3. Zaman içinde yumuşatma
+        if self.smoothed_probs is None:
+            self.smoothed_probs = self.last_probs.copy()
+        else:
+            self.smoothed_probs = self.smoothing * self.smoothed_probs + (1 - self.smoothing) * self.last_probs
+        predicted_idx = int(self.smoothed_probs.argmax())
+
+        result = {
+            'class_name': inference.class_names[predicted_idx],
+            'confidence': float(self.smoothed_probs[predicted_idx]),
+            'detection_confidence': self.detection_confidence,
+            'bbox': np.asarray(self.bbox).tolist(),
+            'all_probs': {name: float(p) for name, p in zip(inference.class_names, self.smoothed_probs)},
+            'ocr_text': None,
+            'source': self.last_source,
+            'frame_index': self.frame_index,
+            'detected': detection is not None,
+            'classified': classified,
+            'track_score': track_score,
+        }
+        if timer.enabled:
+            inference._finish(result, timer)
+        return result
+
+    def stats(self):
+        """Kare başına detection / sınıflandırma oranları"""
+        frames = self.counts['frames'] or 1
+        return {
+            'frames': self.counts['frames'],
+            'detection_rate': self.counts['detections'] / frames,
+            'classification_rate': self.counts['classifications'] / frames,
+        }
+
+def main():
+    """Video dosyası veya kamera üzerinde akış modu"""
+    import argparse
+    from inference import MedicineInference
+
+    parser = argparse.ArgumentParser(description="Video / kamera akışı ile ilaç tanıma")
+    parser.add_argument('source', help="Video dosyası veya kamera indeksi (ör. 0)")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--max-frames', type=int, default=0, help="0: video sonuna kadar")
+    args = parser.parse_args()
+
+    inference = MedicineInference(config_path=args.config)
+    stream = inference.stream()
+    capture = cv2.VideoCapture(int(args.source) if args.source.isdigit() else args.source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Video açılamadı: {args.source}")
+
+    start = time.perf_counter()
+    last_class = None
+    while True:
+        ok, frame = capture.read()
+        if not ok or (args.max_frames and stream.counts['frames'] >= args.max_frames):
+            break
+        result = stream.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if result['class_name'] != last_class:
+            last_class = result['class_name']
+            print(f"Kare {result['frame_index']}: {last_class} ({result['confidence']:.2%})")
+    capture.release()
+
+    elapsed = time.perf_counter() - start
+    stats = stream.stats()
+    print("\n" + "="*50)
+    print(f"Kare: {stats['frames']}, {stats['frames'] / max(elapsed, 1e-9):.1f} FPS")
+    print(f"Detection oranı: {stats['detection_rate']:.1%}")
+    print(f"Sınıflandırma oranı: {stats['classification_rate']:.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+ViT Token Merging (inference, yeniden eğitim gerektirmez)
+Her encoder katmanının çıkışında birbirine en çok benzeyen token çiftleri
+birleştirilir (bipartite soft matching). Kutu arka planı, parlama gibi düzgün
+bölgeler az sayıda token'a iner; sonraki katmanlar daha kısa dizi işler.
+
+- Birleştirme boyut ağırlıklı ortalamadır (her token'ın kaç yamayı temsil ettiği izlenir)
+- CLS token'ı hiçbir zaman birleştirilmez ve ilk sırada kalır
+- Hook tabanlıdır: PyTorch, TorchScript trace ve ONNX export (opset >= 16) ile çalışır
+
+Kullanım:
+    merging = apply_token_merging(model, ratio=0.1)
+    ...
+    merging.remove()
+"""
+
+import math
+import threading
+
+import torch
+
+def token_schedule(num_tokens, num_layers, ratio, start_layer=0):
+    """Her katmana giren token sayısı (CLS dahil) ve katman başına birleştirilen adet"""
+    counts, merged = [], []
+    tokens = num_tokens
+    for layer in range(num_layers):
+        counts.append(tokens)
+        r = merge_count(tokens, ratio) if start_layer <= layer < num_layers - 1 else 0
+        merged.append(r)
+        tokens -= r
+    return counts, merged
+
+def merge_count(num_tokens, ratio):
+    """Bu katmanda birleştirilecek token sayısı (en fazla yama token'larının yarısı)"""
+    return min(int(num_tokens * ratio), (num_tokens - 1) // 2)
+
+def bipartite_merge(x, sizes, r):
+    """
+    r token'ı en benzer eşlerine birleştir
+
+    Args:
+        x: [B, N, C] gizli durumlar (N[0] = CLS)
+        sizes: [B, N, 1] her token'ın temsil ettiği yama sayısı
+        r: birleştirilecek token sayısı
+
+    Returns:
+        (x [B, N - r, C], sizes [B, N - r, 1])
+    """
+    batch, _, channels = x.shape
+    metric = x / x.norm(dim=-1, keepdim=True)
+    a, b = metric[:, ::2, :], metric[:, 1::2, :]
+    scores = a @ b.transpose(-1, -2)
+    # CLS (a kümesinin ilk elemanı) birleştirilmez
+    cls_mask = torch.zeros_like(scores[:1, :, :1])
+    cls_mask[:, 0] = -math.inf
+    scores = scores + cls_mask
+
+    node_max, node_idx = scores.max(dim=-1)
+    edge_idx = node_max.argsort(dim=-1, descending=True).unsqueeze(-1)
+    # Birleşmeyenler orijinal sırada (CLS ilk)
+    unmerged_idx = edge_idx[:, r:, :].sort(dim=1).values
+    src_idx = edge_idx[:, :r, :]
+    dst_idx = node_idx.unsqueeze(-1).gather(dim=1, index=src_idx)
+
+    def merge(values):
+        width = values.shape[-1]
+        src, dst = values[:, ::2, :], values[:, 1::2, :]
+        unmerged = src.gather(dim=1, index=unmerged_idx.expand(batch, unmerged_idx.shape[1], width))
+        src = src.gather(dim=1, index=src_idx.expand(batch, r, width))
+        dst = dst.scatter_add(1, dst_idx.expand(batch, r, width), src)
+        return torch.cat([unmerged, dst], dim=1)
+
+    weighted = merge(x * sizes)
+    sizes = merge(sizes)
+    return weighted / sizes, sizes
+
+class TokenMerging:
+    """ViTForImageClassification encoder katmanlarına token merging hook'ları"""
+
+    def __init__(self, model, ratio, start_layer=0):
+        if not 0.0 <= ratio < 0.5:
+            raise ValueError(f"Token merging oranı [0, 0.5) aralığında olmalı: {ratio}")
+        self.ratio = ratio
+        self.start_layer = start_layer
+        # Token boyutları forward'a özeldir; aynı modelden eşzamanlı forward'lar
+        # (ör. degradation / hot reload thread'leri) birbirinin durumunu ezmesin
+        self._state = threading.local()
+        self._handles = []
+
+        encoder = model.vit.encoder
+        layers = list(encoder.layer)
+        self._handles.append(encoder.register_forward_pre_hook(self._reset))
+        # Son katmandan sonra sadece CLS kullanılır, birleştirmeye gerek yok
+        for layer in layers[start_layer:len(layers) - 1]:
+            self._handles.append(layer.register_forward_hook(self._merge))
+
+    def _reset(self, module, args):
+        self._state.sizes = None
+
+    def _merge(self, module, args, output):
+        hidden = output[0] if isinstance(output, tuple) else output
+        r = merge_count(hidden.shape[1], self.ratio)
+        if r <= 0:
+            return output
+        sizes = getattr(self._state, 'sizes', None)
+        if sizes is None:
+            sizes = torch.ones_like(hidden[..., :1])
+        hidden, self._state.sizes = bipartite_merge(hidden, sizes, r)
+        return (hidden,) + tuple(output[1:]) if isinstance(output, tuple) else hidden
+
+    def remove(self):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+def apply_token_merging(model, ratio, start_layer=0):
+    """Modele token merging uygula (ratio = 0 ise None döner)"""
+    if not ratio:
+        return None
+    return TokenMerging(model, ratio, start_layer=start_layer)
@@ -15,6 +15,8 @@ from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 from collections import Counter
 import os
 
+from early_exit import ViTEarlyExitForImageClassification, exit_head_loss
+
 def load_config():
     """Config dosyasını yükle"""
     with open('config.yaml', 'r', encoding='utf-8') as f:
@@ -144,11 +146,22 @@ def train_classification_model():
     print(f"\nModel yükleniyor: {model_name}")
     
     processor = ViTImageProcessor.from_pretrained(model_name)
-    model = ViTForImageClassification.from_pretrained(
-        model_name,
-        num_labels=num_classes,
-        ignore_mismatched_sizes=True
-    )
+    early_exit = config['classification'].get('early_exit') or {}
+    if early_exit.get('enabled'):
+        # Ara katman head'leri ana head ile birlikte eğitilir
+        print(f"Early-exit head'leri: katman {early_exit['layers']}")
+        model = ViTEarlyExitForImageClassification.from_pretrained(
+            model_name,
+            num_labels=num_classes,
+            ignore_mismatched_sizes=True,
+            early_exit_layers=early_exit['layers'],
+        )
+    else:
+        model = ViTForImageClassification.from_pretrained(
+            model_name,
+            num_labels=num_classes,
+            ignore_mismatched_sizes=True
+        )
     
     # Class weights hesapla
     if config['classification']['use_class_weights']:
@@ -176,6 +189,7 @@ def train_classification_model():
                 loss_fct = torch.nn.CrossEntropyLoss()
             
             loss = loss_fct(logits.view(-1, num_classes), labels.view(-1))
+            loss = exit_head_loss(loss, outputs.get("exit_logits"), labels, loss_fct)
             return (loss, outputs) if return_outputs else loss
     
     # Training arguments
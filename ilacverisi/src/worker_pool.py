@@ -0,0 +1,356 @@
+"""
+Paylaşımlı Bellek Worker Havuzu
+MedicineInference'ı worker process'lerde çalıştırır. Görüntüler pipe üzerinden
+pickle edilmek yerine multiprocessing.shared_memory halka slotlarına decode
+edilmiş RGB buffer olarak yazılır; sonuçlar da aynı slotun sonuç kaydına
+kompakt NumPy kaydı olarak döner (150 girişlik all_probs sözlüğü yerine
+float32 olasılık dizisi). Kuyruklardan sadece (istek id, slot, boyut) geçer.
+
+- Slot yaşam döngüsü: boş slot kuyruğundan alınır -> görüntü yazılır -> worker
+  sonucu yazar -> sonuç okunup kopyalanınca slot boş kuyruğa geri döner
+- Backpressure: tüm slotlar kullanımdaysa submit boş slot bekler
+  (timeout aşılırsa TimeoutError)
+- Çöken worker yeniden başlatılır; üzerindeki istek RuntimeError ile biter
+
+Kullanım:
+    with WorkerPool('config.yaml', workers=2, slots=8) as pool:
+        future = pool.submit(pil_image)
+        record = future.result()
+        result = pool.to_dict(record)
+"""
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+# Sonuç kaydındaki durum kodları
+STATUS_OK = 0
+STATUS_NOT_FOUND = 1
+STATUS_ERROR = 2
+
+SOURCES = ('classifier', 'detector')
+
+def result_dtype(num_classes):
+    """Slot başına sonuç kaydı"""
+    return np.dtype([
+        ('status', 'i1'),
+        ('source', 'i1'),
+        ('class_index', 'i2'),
+        ('confidence', 'f4'),
+        ('detection_confidence', 'f4'),
+        ('bbox', 'f4', (4,)),
+        ('probs', 'f4', (num_classes,)),
+    ])
+
+def _load_config(config_path):
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+def _load_class_names(config):
+    """MedicineInference ile aynı sınıf sırası"""
+    with open(Path(config['data']['dataset_path']) / 'data.yaml', 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)['names']
+
+def _serve(index, inference, image_buf, records, slot_bytes, tasks, results, conf_threshold, current,
+           dequeue_lock):
+    """Worker döngüsü: slot'taki görüntüyü tahmin et, sonucu slot kaydına yaz"""
+    from PIL import Image
+
+    class_index = {name: i for i, name in enumerate(inference.class_names)}
+    while True:
+        # Kuyruktan alma ve current'a yazma tek adım: monitor bir isteği ya kuyrukta
+        # ya da bir worker'da görür, çökme arada kalan isteği kaybetmez
+        with dequeue_lock:
+            task = tasks.get()
+            if task is not None:
+                current[index] = task[0]
+        if task is None:
+            break
+        request_id, slot, height, width = task
+        record = records[slot]
+        try:
+            pixels = np.ndarray((height, width, 3), dtype=np.uint8, buffer=image_buf,
+                                offset=slot * slot_bytes)
+            result = inference.predict(Image.fromarray(pixels), conf_threshold=conf_threshold)
+            if result['class_name'] is None:
+                record['status'] = STATUS_NOT_FOUND
+            else:
+                record['status'] = STATUS_OK
+                record['source'] = SOURCES.index(result.get('source', 'classifier'))
+                record['class_index'] = class_index[result['class_name']]
+                record['confidence'] = result['confidence']
+                record['detection_confidence'] = result['detection_confidence']
+                record['bbox'] = result['bbox']
+                record['probs'] = [result['all_probs'].get(name, 0.0) for name in inference.class_names]
+        except Exception as e:
+            print(f"⚠ Worker hatası (istek {request_id}): {e}")
+            record['status'] = STATUS_ERROR
+        finally:
+            # Paylaşımlı belleğe açık görünüm kalırsa close() başarısız olur
+            pixels = record = None
+        results.put((request_id, slot))
+        current[index] = -1
+
+def _worker_main(index, config_path, image_shm_name, result_shm_name, slot_bytes, slots, num_classes,
+                 tasks, results, conf_threshold, current, dequeue_lock):
+    """Spawn edilen worker: modelleri kendisi yükler"""
+    from inference import MedicineInference
+
+    image_shm = shared_memory.SharedMemory(name=image_shm_name)
+    result_shm = shared_memory.SharedMemory(name=result_shm_name)
+    records = np.ndarray((slots,), dtype=result_dtype(num_classes), buffer=result_shm.buf)
+    try:
+        inference = MedicineInference(config_path=config_path)
+        results.put(('ready', index))
+        _serve(index, inference, image_shm.buf, records, slot_bytes, tasks, results, conf_threshold, current,
+               dequeue_lock)
+    finally:
+        del records
+        image_shm.close()
+        result_shm.close()
+
+class WorkerPool:
+    """Paylaşımlı bellek slotları üzerinden MedicineInference worker havuzu"""
+
+    # Windows uyumu için spawn; PreforkPool fork kullanır
+    start_method = 'spawn'
+
+    def __init__(self, config_path='config.yaml', workers=None, slots=None, max_pixels=None,
+                 conf_threshold=0.5, start_timeout=300, monitor_interval=1.0):
+        """
+        Args:
+            workers: Worker process sayısı
+            slots: Halka slot sayısı (aynı anda işlemde olabilecek en fazla istek)
+            max_pixels: Slot başına en büyük görüntü (piksel); daha büyük görüntüler reddedilir
+            (None olanlar config'deki worker_pool bölümünden alınır)
+            monitor_interval: Çöken worker kontrol aralığı (saniye)
+        """
+        self.config_path = config_path
+        self.config = _load_config(config_path)
+        pool_config = self.config.get('worker_pool') or {}
+        workers = workers or pool_config.get('workers', 2)
+        slots = slots or pool_config.get('slots', 8)
+        max_pixels = max_pixels or pool_config.get('max_pixels', 1920 * 1920)
+        self.class_names = _load_class_names(self.config)
+        self.slots = slots
+        self.slot_bytes = max_pixels * 3
+        self.max_pixels = max_pixels
+        self.conf_threshold = conf_threshold
+        self.dtype = result_dtype(len(self.class_names))
+        self.monitor_interval = monitor_interval
+        self.collector = self.monitor = None
+        self.closing = False
+        self.restarts = 0
+
+        self.context = mp.get_context(self.start_method)
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.pending = {}
+        self.request_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.dequeue_lock = self.context.Lock()
+        # Worker başına işlenen istek id'si (-1: boşta)
+        self.current = self.context.Array('q', [-1] * workers, lock=False)
+        self.workers = []
+
+        self.image_shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+        self.result_shm = None
+        try:
+            self.result_shm = shared_memory.SharedMemory(create=True, size=slots * self.dtype.itemsize)
+            self.records = np.ndarray((slots,), dtype=self.dtype, buffer=self.result_shm.buf)
+            self.workers = [None] * workers
+            for index in range(workers):
+                self._start_worker(index)
+            # Modeller yüklenene kadar bekle
+            for _ in self.workers:
+                try:
+                    self.results.get(timeout=start_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Worker'lar {start_timeout} s içinde hazır olmadı (model yükleme hatası?)")
+        except BaseException:
+            # Yarım kalan havuz: worker'ları durdur, /dev/shm segmentlerini sil
+            self.close()
+            raise
+
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+        self.monitor = threading.Thread(target=self._monitor, daemon=True)
+        self.monitor.start()
+        print(f"✓ Worker havuzu hazır ({workers} worker, {slots} slot)")
+
+    def _start_worker(self, index):
+        """index numaralı worker process'ini başlat"""
+        worker = self.context.Process(
+            target=_worker_main,
+            args=(index, self.config_path, self.image_shm.name, self.result_shm.name, self.slot_bytes,
+                  self.slots, len(self.class_names), self.tasks, self.results, self.conf_threshold,
+                  self.current, self.dequeue_lock),
+            daemon=True,
+        )
+        worker.start()
+        self.workers[index] = worker
+
+    def submit(self, image, timeout=None):
+        """
+        Görüntüyü boş slota yaz ve kuyruğa ekle
+
+        Args:
+            image: PIL Image veya RGB uint8 numpy dizisi [H, W, 3]
+            timeout: Boş slot bekleme süresi (None: süresiz)
+        Returns:
+            Future: sonuç kaydı (result_dtype)
+        """
+        pixels = np.asarray(image.convert('RGB') if hasattr(image, 'convert') else image, dtype=np.uint8)
+        height, width = pixels.shape[:2]
+        if height * width > self.max_pixels:
+            raise ValueError(f"Görüntü slot boyutunu aşıyor: {width}x{height} > {self.max_pixels} piksel")
+
+        try:
+            slot = self.free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Boş slot yok ({self.slots} istek işlemde)")
+
+        view = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self.image_shm.buf,
+                          offset=slot * self.slot_bytes)
+        view[:] = pixels
+        future = Future()
+        with self.lock:
+            request_id = next(self.request_ids)
+            self.pending[request_id] = (future, slot)
+        self.tasks.put((request_id, slot, height, width))
+        return future
+
+    def predict(self, image, timeout=None):
+        """Senkron tahmin: sonuç kaydı"""
+        return self.submit(image, timeout=timeout).result(timeout=timeout)
+
+    def _complete(self, request_id, record=None, error=None):
+        """İsteği bitir ve slotu serbest bırak (collector ve monitor'dan ilk gelen kazanır)"""
+        with self.lock:
+            entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return
+        future, slot = entry
+        if record is None:
+            future.set_exception(error)
+        else:
+            future.set_result(record)
+        self.free_slots.put(slot)
+
+    def _collect(self):
+        """Sonuç kuyruğunu oku, kaydı kopyala, slotu serbest bırak"""
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            request_id, slot = message
+            if request_id == 'ready':
+                # Yeniden başlatılan worker hazır
+                continue
+            self._complete(request_id, record=self.records[slot].copy())
+
+    def _monitor(self):
+        """Çöken worker'ın yarım kalan isteğini hata ile bitir ve worker'ı yeniden başlat"""
+        while not self.closing:
+            time.sleep(self.monitor_interval)
+            for index, worker in enumerate(self.workers):
+                if self.closing or worker.is_alive():
+                    continue
+                print(f"⚠ Worker {index} çöktü (exit code {worker.exitcode}), yeniden başlatılıyor")
+                request_id = self.current[index]
+                self.current[index] = -1
+                if request_id >= 0:
+                    self._complete(request_id, error=RuntimeError(f"Worker {index} istek sırasında çöktü"))
+                self.restarts += 1
+                self._start_worker(index)
+
+    def to_dict(self, record, top_k=None):
+        """Kaydı MedicineInference.predict biçimine çevir (isimler sadece gerektiğinde)"""
+        if record['status'] != STATUS_OK:
+            error = 'İlaç kutusu tespit edilemedi' if record['status'] == STATUS_NOT_FOUND else 'Worker hatası'
+            return {'class_name': None, 'confidence': 0.0, 'detection_confidence': 0.0,
+                    'bbox': None, 'all_probs': {}, 'error': error}
+        probs = record['probs']
+        indices = np.argsort(-probs)[:top_k] if top_k else range(len(probs))
+        return {
+            'class_name': self.class_names[record['class_index']],
+            'confidence': float(record['confidence']),
+            'detection_confidence': float(record['detection_confidence']),
+            'bbox': record['bbox'].tolist(),
+            'all_probs': {self.class_names[i]: float(probs[i]) for i in indices},
+            'source': SOURCES[record['source']],
+        }
+
+    def close(self):
+        """Worker'ları durdur ve paylaşımlı belleği serbest bırak"""
+        self.closing = True
+        if self.monitor is not None:
+            self.monitor.join(timeout=self.monitor_interval * 2)
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            if worker is None:
+                continue
+            worker.join(timeout=30)
+            if worker.is_alive():
+                # Model yüklemesinde takılan / kapanmayan worker
+                worker.terminate()
+                worker.join(timeout=5)
+        if self.collector is not None:
+            self.results.put(None)
+            self.collector.join(timeout=5)
+        self.records = None
+        for shm in (self.image_shm, self.result_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    """Test setinde havuz verimi"""
+    import argparse
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="Paylaşımlı bellek worker havuzu")
+    parser.add_argument('images', nargs='*', help="Görüntüler (boşsa config test seti)")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--workers', type=int, help="Varsayılan: config worker_pool.workers")
+    parser.add_argument('--slots', type=int, help="Varsayılan: config worker_pool.slots")
+    parser.add_argument('--max-images', type=int, default=200)
+    args = parser.parse_args()
+
+    image_files = [Path(p) for p in args.images]
+    if not image_files:
+        config = _load_config(args.config)
+        images_dir = Path(config['data']['dataset_path']) / 'test' / 'images'
+        image_files = sorted(images_dir.glob('*.jpg'))[:args.max_images]
+    images = [Image.open(p).convert('RGB') for p in image_files]
+
+    with WorkerPool(args.config, workers=args.workers, slots=args.slots) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(image) for image in images]
+        records = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+
+    found = sum(int(r['status'] == STATUS_OK) for r in records)
+    print(f"\n{len(images)} görüntü, {elapsed:.2f} s ({len(images) / elapsed:.1f} görüntü/s), tespit: {found}")
+    print(f"Sonuç kaydı: {records[0].dtype.itemsize} bayt / istek")
+
+if __name__ == '__main__':
+    main()
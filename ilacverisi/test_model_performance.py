@@ -11,6 +11,7 @@ import numpy as np
 from collections import defaultdict, Counter
 from sklearn.metrics import confusion_matrix, classification_report, accuracy_score
 import sys
+import time
 from tqdm import tqdm
 import pandas as pd
 
@@ -45,8 +46,11 @@ def load_test_labels(labels_dir, class_names):
     
     return labels
 
-def test_model_on_test_set():
-    """Test setinde model performansını test et"""
+def test_model_on_test_set(track_memory=False):
+    """
+    Test setinde model performansını test et
+    track_memory: Yükleme/predict aşamaları için bellek raporu üret
+    """
     
     print("="*70)
     print("MODEL PERFORMANS TESTİ BAŞLIYOR")
@@ -80,7 +84,7 @@ def test_model_on_test_set():
     # Inference pipeline'ı başlat
     print(f"\n🤖 Inference modeli yükleniyor...")
     try:
-        inference = MedicineInference()
+        inference = MedicineInference(track_memory=track_memory)
         print("✓ Model yüklendi")
     except Exception as e:
         print(f"❌ Model yükleme hatası: {e}")
@@ -94,6 +98,7 @@ def test_model_on_test_set():
     correct_predictions = 0
     total_predictions = 0
     failed_detections = 0
+    latencies = []
     
     # Her görüntü için test yap
     for img_path in tqdm(image_files, desc="Test ediliyor"):
@@ -114,12 +119,14 @@ def test_model_on_test_set():
         
         # Tahmin yap
         try:
+            start_time = time.perf_counter()
             result = inference.predict(
                 image,
                 return_image=False,
                 use_ocr=False,
                 conf_threshold=0.3  # Düşük threshold ile daha fazla tespit
             )
+            latencies.append(time.perf_counter() - start_time)
         except Exception as e:
             print(f"⚠ Tahmin hatası ({image_name}): {e}")
             continue
@@ -168,6 +175,29 @@ def test_model_on_test_set():
     print(f"  • Genel Doğruluk: {accuracy:.2f}%")
     print(f"  • Tespit Başarı Oranı: {(successful_detections/total_images*100):.2f}%")
     
+    # Gecikme istatistikleri
+    latency_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    latency_stats = {
+        'mean': float(latency_ms.mean()),
+        'p50': float(np.percentile(latency_ms, 50)),
+        'p95': float(np.percentile(latency_ms, 95)),
+        'p99': float(np.percentile(latency_ms, 99)),
+    }
+    print(f"\n⏱ Gecikme (görüntü başına):")
+    print(f"  • Ortalama: {latency_stats['mean']:.1f} ms")
+    print(f"  • p50: {latency_stats['p50']:.1f} ms, p95: {latency_stats['p95']:.1f} ms, p99: {latency_stats['p99']:.1f} ms")
+    
+    # Adaptif tespitte hangi YOLO giriş boyutunun ne sıklıkla kullanıldığı
+    resolution_stats = inference.detection_resolution_stats()
+    print(f"\n🔍 Tespit Çözünürlüğü:")
+    for size, stats in resolution_stats.items():
+        print(f"  • {size}px: {stats['count']} ({stats['share']:.1%})")
+    
+    memory_report = None
+    if inference.memory is not None:
+        memory_report = inference.memory.report()
+        print("\n" + memory_report)
+    
     # Sınıf bazında analiz
     print(f"\n📈 Sınıf Bazında Performans:")
     print("-"*70)
@@ -281,6 +311,19 @@ def test_model_on_test_set():
         f.write(f"- **Yanlış Tahmin:** {successful_detections - correct_predictions}\n")
         f.write(f"- **Genel Doğruluk:** {accuracy:.2f}%\n\n")
         
+        f.write("## Gecikme\n\n")
+        f.write(f"- **Ortalama:** {latency_stats['mean']:.1f} ms\n")
+        f.write(f"- **p50 / p95 / p99:** {latency_stats['p50']:.1f} / {latency_stats['p95']:.1f} / {latency_stats['p99']:.1f} ms\n\n")
+        
+        f.write("## Tespit Çözünürlüğü\n\n")
+        for size, stats in resolution_stats.items():
+            f.write(f"- **{size}px:** {stats['count']} ({stats['share']:.1%})\n")
+        f.write("\n")
+        
+        if memory_report:
+            f.write("## Bellek Kullanımı\n\n")
+            f.write("```\n" + memory_report + "\n```\n\n")
+        
         f.write("## Sınıf Bazında Performans\n\n")
         f.write("| Sınıf | Toplam | Başarılı Tespit | Tespit Başarısız | Doğru | Yanlış | Doğruluk (%) |\n")
         f.write("|-------|--------|-----------------|------------------|-------|--------|-------------|\n")
@@ -309,5 +352,11 @@ def test_model_on_test_set():
     print("="*70)
 
 if __name__ == '__main__':
-    test_model_on_test_set()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Model performans testi")
+    parser.add_argument('--memory', action='store_true', help="Bellek raporunu da üret")
+    args = parser.parse_args()
+    
+    test_model_on_test_set(track_memory=args.memory)
 
@@ -0,0 +1,221 @@
+"""
+ONNX Runtime Session Autotune
+Verilen .onnx modeli icin bu makinede intra/inter-op thread sayisi, execution
+mode, graph optimizasyon seviyesi, memory arena ve batch boyutunu tarar;
+en iyi ayari inference loader'larin otomatik okudugu profile yazar.
+
+Kullanim:
+    python autotune_onnx.py models/classification/classification_150_optimized.onnx --workers 2
+"""
+
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ort_session import create_session, save_profile, host_key
+
+# Windows konsol encoding sorununu coz
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# ORT girdi tipi -> numpy dtype
+INPUT_DTYPES = {
+    'tensor(float)': np.float32,
+    'tensor(float16)': np.float16,
+    'tensor(uint8)': np.uint8,
+}
+
+def dummy_input(session, batch_size=1, image_size=224):
+    """
+    Session'in ilk girdisinin tipine ve sekline uygun rastgele girdi
+    Sabit boyutlar aynen, dinamik batch boyutu batch_size, diger dinamik
+    boyutlar image_size ile doldurulur (float NCHW, uint8 NHWC ve e2e graph'lari).
+    """
+    spec = session.get_inputs()[0]
+    dtype = INPUT_DTYPES.get(spec.type)
+    if dtype is None:
+        raise ValueError(f"Desteklenmeyen girdi tipi: {spec.name} {spec.type}")
+    shape = []
+    for axis, dim in enumerate(spec.shape):
+        if isinstance(dim, int) and dim > 0:
+            if axis == 0 and dim != batch_size:
+                raise ValueError(f"Model sabit batch={dim} bekliyor")
+            shape.append(dim)
+        else:
+            shape.append(batch_size if axis == 0 else image_size)
+    if dtype == np.uint8:
+        return spec.name, np.random.randint(0, 256, shape, dtype=np.uint8)
+    return spec.name, np.random.randn(*shape).astype(dtype)
+
+def measure(onnx_path, settings, batch_size=1, workers=1, runs=20, warmup=3, image_size=224):
+    """
+    Ayni anda `workers` session calistirarak goruntu basina gecikmeyi olc
+    (ayni hosttaki worker'larin thread yarismasini simule eder)
+
+    Returns:
+        dict: {'ms_per_image': float, 'p90_batch_ms': float, 'images_per_second': float}
+    """
+    sessions = [create_session(onnx_path, settings=settings) for _ in range(workers)]
+    input_name, pixel_values = dummy_input(sessions[0], batch_size=batch_size, image_size=image_size)
+
+    for session in sessions:
+        for _ in range(warmup):
+            session.run(None, {input_name: pixel_values})
+
+    times = [[] for _ in range(workers)]
+
+    def worker(idx):
+        for _ in range(runs):
+            start = time.perf_counter()
+            sessions[idx].run(None, {input_name: pixel_values})
+            times[idx].append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    all_times = np.concatenate([np.array(t) for t in times])
+    return {
+        'ms_per_image': float(all_times.mean() / batch_size),
+        'p90_batch_ms': float(np.percentile(all_times, 90)),
+        'images_per_second': float(workers * runs * batch_size / wall),
+    }
+
+def thread_candidates(cores):
+    """1, 2, 4, ... cores (ve cores'un kendisi)"""
+    candidates = []
+    n = 1
+    while n < cores:
+        candidates.append(n)
+        n *= 2
+    candidates.append(cores)
+    return candidates
+
+def sweep(onnx_path, base, key, values, workers, runs, batch_size=1):
+    """Tek bir parametreyi tara, en dusuk gecikmeli degeri sec"""
+    best_value, best_result = None, None
+    for value in values:
+        settings = dict(base, **{key: value}) if not isinstance(value, dict) else dict(base, **value)
+        try:
+            result = measure(onnx_path, settings, batch_size=batch_size, workers=workers, runs=runs)
+        except Exception as e:
+            print(f"   [ATLA] {key}={value}: {e}")
+            continue
+        print(f"   {key}={value}: {result['ms_per_image']:.2f} ms/goruntu (p90 batch {result['p90_batch_ms']:.1f} ms)")
+        if best_result is None or result['ms_per_image'] < best_result['ms_per_image']:
+            best_value, best_result = value, result
+    if best_result is None:
+        raise RuntimeError(f"{key} taramasinda hicbir ayar calismadi (yukaridaki [ATLA] hatalarina bakin)")
+    return best_value, best_result
+
+def autotune(onnx_path, workers=1, runs=20, batch_sizes=(1, 2, 4, 8, 16), latency_budget_ms=None):
+    """
+    Koordinat bazli tarama (tam grid yerine her parametreyi sirayla optimize eder)
+
+    Returns:
+        dict: En iyi ayarlar + olcumler
+    """
+    cores = max(1, (os.cpu_count() or 1) // workers)
+    base = {
+        'intra_op_num_threads': None,
+        'inter_op_num_threads': None,
+        'execution_mode': 'sequential',
+        'graph_optimization_level': 'all',
+        'enable_cpu_mem_arena': True,
+    }
+
+    print(f"\n[1/5] Intra-op thread sayisi (worker basina en fazla {cores} cekirdek)...")
+    value, _ = sweep(onnx_path, base, 'intra_op_num_threads', thread_candidates(cores), workers, runs)
+    base['intra_op_num_threads'] = value
+
+    print(f"\n[2/5] Execution mode / inter-op thread...")
+    modes = [{'execution_mode': 'sequential', 'inter_op_num_threads': 1}]
+    modes += [{'execution_mode': 'parallel', 'inter_op_num_threads': n} for n in (2, 4) if n <= cores]
+    value, _ = sweep(onnx_path, base, 'execution_mode', modes, workers, runs)
+    base.update(value)
+
+    print(f"\n[3/5] Graph optimizasyon seviyesi...")
+    value, _ = sweep(onnx_path, base, 'graph_optimization_level', ['basic', 'extended', 'all'], workers, runs)
+    base['graph_optimization_level'] = value
+
+    print(f"\n[4/5] CPU memory arena...")
+    value, best = sweep(onnx_path, base, 'enable_cpu_mem_arena', [True, False], workers, runs)
+    base['enable_cpu_mem_arena'] = value
+
+    print(f"\n[5/5] Batch boyutu...")
+    batch_results = {}
+    for batch_size in batch_sizes:
+        try:
+            result = measure(onnx_path, base, batch_size=batch_size, workers=workers, runs=max(5, runs // 2))
+        except Exception as e:
+            print(f"   [ATLA] batch={batch_size}: {e}")
+            continue
+        batch_results[batch_size] = result
+        print(f"   batch={batch_size}: {result['images_per_second']:.1f} goruntu/s, "
+              f"p90 batch {result['p90_batch_ms']:.1f} ms")
+
+    # Gecikme butcesini asmayan en yuksek throughput
+    eligible = {
+        b: r for b, r in batch_results.items()
+        if latency_budget_ms is None or r['p90_batch_ms'] <= latency_budget_ms
+    } or {1: batch_results.get(1, best)}
+    best_batch = max(eligible, key=lambda b: eligible[b]['images_per_second'])
+
+    return dict(
+        base,
+        batch_size=best_batch,
+        workers=workers,
+        ms_per_image=best['ms_per_image'],
+        images_per_second=eligible[best_batch]['images_per_second'],
+        tuned_at=time.strftime('%Y-%m-%d %H:%M:%S'),
+    )
+
+def main():
+    """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="ONNX Runtime session autotune")
+    parser.add_argument('model', help=".onnx artifact")
+    parser.add_argument('--workers', type=int, default=1, help="Ayni hostta paralel calisacak worker sayisi")
+    parser.add_argument('--runs', type=int, default=20, help="Her ayar icin olcum tekrari")
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--latency-budget-ms', type=float, help="Batch p90 gecikme ust siniri")
+    args = parser.parse_args()
+
+    onnx_path = Path(args.model)
+    print("=" * 70)
+    print(f"ORT Autotune: {onnx_path.name}")
+    print(f"Host: {host_key(args.workers)}")
+    print("=" * 70)
+
+    try:
+        settings = autotune(
+            onnx_path,
+            workers=args.workers,
+            runs=args.runs,
+            batch_sizes=[int(b) for b in args.batch_sizes.split(',')],
+            latency_budget_ms=args.latency_budget_ms,
+        )
+    except RuntimeError as e:
+        print(f"\n[HATA] Autotune durduruldu: {e}")
+        sys.exit(1)
+    path = save_profile(onnx_path, settings, workers=args.workers)
+
+    print("\n" + "=" * 70)
+    print("[OK] En iyi ayarlar:")
+    for key, value in settings.items():
+        print(f"   - {key}: {value}")
+    print(f"\nProfil: {path}")
+    print(f"Loader'lar bu profili ORT_WORKERS={args.workers} iken otomatik kullanir")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Model Artifact Build Pipeline
+Checkpoint'ten istenen ONNX varyantlarini (FP32, optimize, FP16, INT8) uretir.
+Girdilerinin icerik hash'i degismeyen adimlar atlanir; sonuc hash, boyut ve
+olculen gecikmelerle birlikte manifest.json'a yazilir.
+
+Kullanim:
+    python build_artifacts.py --variants fp32,optimized,int8,fp16 --layout merged
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+from checkpoints import resolve_checkpoint, checkpoint_step, checkpoint_weight_files
+from ort_session import host_key
+
+# Windows konsol encoding sorununu coz
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Adim mantigi degistiginde arttirilir (eski cache gecersiz olur)
+PIPELINE_VERSION = 1
+
+VARIANTS = ['fp32', 'optimized', 'fp16', 'int8']
+
+def load_config():
+    """Config dosyasini yukle"""
+    config_path = Path(__file__).parent / 'config.yaml'
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+def artifact_files(onnx_path):
+    """Model dosyasi + (varsa) external data dosyasi"""
+    onnx_path = Path(onnx_path)
+    files = [onnx_path]
+    data_path = onnx_path.with_name(onnx_path.name + '.data')
+    if data_path.exists():
+        files.append(data_path)
+    return files
+
+class BuildCache:
+    """
+    manifest.json uzerinden adim cache'i
+    Dosya hash'leri (yol, boyut, mtime) ile saklanir; degismeyen buyuk dosyalar tekrar hash'lenmez
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = Path(manifest_path)
+        self.manifest = {'artifacts': {}, 'file_hashes': {}}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            self.manifest.setdefault('artifacts', {})
+            self.manifest.setdefault('file_hashes', {})
+
+    def file_hash(self, path):
+        """Dosyanin sha256'si (stat degismediyse cache'den)"""
+        path = Path(path)
+        stat = path.stat()
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        cached = self.manifest['file_hashes'].get(str(path))
+        if cached and cached['stamp'] == stamp:
+            return cached['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        self.manifest['file_hashes'][str(path)] = {'stamp': stamp, 'sha256': sha}
+        return sha
+
+    def files_hash(self, paths):
+        """Birden fazla dosyanin birlesik hash'i"""
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update(Path(path).name.encode('utf-8'))
+            digest.update(self.file_hash(path).encode('utf-8'))
+        return digest.hexdigest()
+
+    def step_key(self, step, input_files, params):
+        """Adim cache anahtari: adim + parametreler + girdi icerik hash'leri"""
+        payload = {
+            'version': PIPELINE_VERSION,
+            'step': step,
+            'params': params,
+            'inputs': self.files_hash(input_files),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, name, key, output_path):
+        """Artifact ayni anahtarla uretilmis ve dosyalar degismemis mi?"""
+        entry = self.manifest['artifacts'].get(name)
+        if not entry or entry.get('cache_key') != key or not Path(output_path).exists():
+            return False
+        return self.files_hash(artifact_files(output_path)) == entry.get('sha256')
+
+    def record(self, name, key, output_path, extra=None):
+        files = artifact_files(output_path)
+        self.manifest['artifacts'][name] = dict(
+            {
+                'path': str(output_path),
+                'files': [f.name for f in files],
+                'cache_key': key,
+                'sha256': self.files_hash(files),
+                'size_bytes': sum(f.stat().st_size for f in files),
+                'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            },
+            **(extra or {})
+        )
+
+    def save(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+
+def run_step(cache, name, input_files, params, output_path, build_fn, force=False):
+    """Girdiler degismediyse atla, aksi halde build_fn(output_path) calistir"""
+    key = cache.step_key(name, input_files, params)
+    if not force and cache.is_fresh(name, key, output_path):
+        print(f"   [CACHE] {name}: degisiklik yok, atlandi")
+        return False
+
+    start = time.perf_counter()
+    print(f"   [BUILD] {name} -> {output_path}")
+    # Eski external data dosyasi kalirsa artifact hash'ine karisir
+    stale_data = Path(output_path).with_name(Path(output_path).name + '.data')
+    if stale_data.exists():
+        stale_data.unlink()
+    build_fn(output_path)
+    cache.record(name, key, output_path, {'params': params, 'build_seconds': round(time.perf_counter() - start, 2)})
+    cache.save()
+    return True
+
+def build(config, checkpoint, variants, output_dir, layout='merged', opset=17, force=False,
+          benchmark_runs=30, fp16_mode='storage'):
+    """Istenen varyantlari uret ve manifest'i dondur"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = BuildCache(output_dir / 'manifest.json')
+    model_name = config['classification']['model_name']
+    checkpoint_inputs = checkpoint_weight_files(checkpoint)
+
+    cache.manifest['checkpoint'] = {
+        'path': str(checkpoint),
+        'step': checkpoint_step(checkpoint),
+        'sha256': cache.files_hash(checkpoint_inputs),
+    }
+
+    paths = {
+        'fp32': output_dir / 'classification_150.onnx',
+        'optimized': output_dir / 'classification_150_optimized.onnx',
+        'fp16': output_dir / 'classification_150_fp16.onnx',
+        'int8': output_dir / 'classification_150_quantized.onnx',
+    }
+    # Bagimliliklar: optimized/fp16/int8 hepsi fp32'den turetilir, fp16 optimize modelden
+    needed = set(variants)
+    if needed & {'optimized', 'fp16', 'int8'}:
+        needed.add('fp32')
+    if 'fp16' in needed:
+        needed.add('optimized')
+
+    model_state = {}
+
+    def load_model():
+        if not model_state:
+            from convert_to_onnx import load_model_and_processor
+            model_state['model'], model_state['processor'] = load_model_and_processor(checkpoint, model_name)
+        return model_state['model'], model_state['processor']
+
+    print(f"\n[1/3] Artifact'ler ({layout})...")
+
+    def build_fp32(output_path):
+        from convert_to_onnx import convert_to_onnx
+        model, processor = load_model()
+        # Manifest'teki opset gercek olsun: opset 11'e dusmek yerine adim basarisiz olur
+        convert_to_onnx(model, processor, output_path, opset_version=opset, fallback=False)
+        apply_layout(output_path, layout)
+
+    run_step(cache, 'fp32', checkpoint_inputs, {'opset': opset, 'layout': layout}, paths['fp32'], build_fp32, force)
+
+    if 'optimized' in needed:
+        def build_optimized(output_path):
+            from optimize_onnx import optimize_vit_onnx
+            optimize_vit_onnx(paths['fp32'], output_path)
+            apply_layout(output_path, layout)
+
+        run_step(cache, 'optimized', artifact_files(paths['fp32']), {'layout': layout},
+                 paths['optimized'], build_optimized, force)
+
+    if 'fp16' in needed:
+        def build_fp16(output_path):
+            from fp16_onnx import convert_to_fp16
+            convert_to_fp16(paths['optimized'], output_path, mode=fp16_mode)
+            apply_layout(output_path, layout)
+
+        run_step(cache, 'fp16', artifact_files(paths['optimized']), {'layout': layout, 'mode': fp16_mode},
+                 paths['fp16'], build_fp16, force)
+
+    if 'int8' in needed:
+        def build_int8(output_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(str(paths['fp32']), str(output_path), weight_type=QuantType.QUInt8)
+            apply_layout(output_path, layout)
+
+        run_step(cache, 'int8', artifact_files(paths['fp32']), {'weight_type': 'QUInt8', 'layout': layout},
+                 paths['int8'], build_int8, force)
+
+    print(f"\n[2/3] Gecikme olcumu...")
+    for name in VARIANTS:
+        if name not in needed:
+            continue
+        entry = cache.manifest['artifacts'][name]
+        # Ayni artifact ve ayni makine icin olcum tekrar kullanilir
+        bench_key = f"{entry['sha256']}:{benchmark_runs}:{host_key()}"
+        if entry.get('latency', {}).get('key') == bench_key:
+            print(f"   [CACHE] {name}: {entry['latency']['mean_ms']:.2f} ms")
+            continue
+        from optimize_onnx import benchmark_latency
+        result = benchmark_latency(paths[name], runs=benchmark_runs)
+        entry['latency'] = dict(result, key=bench_key, batch_size=1)
+        print(f"   {name}: {result['mean_ms']:.2f} ms (p90 {result['p90_ms']:.2f} ms)")
+    cache.save()
+
+    # Istenmeyen ara adimlar manifest'te kalir ama raporlanmaz
+    return cache.manifest, paths
+
+def apply_layout(onnx_path, layout):
+    """'merged': tek dosya, 'external': agirliklar <model>.onnx.data dosyasinda"""
+    onnx_path = Path(onnx_path)
+    data_path = onnx_path.with_name(onnx_path.name + '.data')
+    if layout == 'merged' and data_path.exists():
+        from merge_onnx_model import merge_external_data
+        merged_path = onnx_path.with_name(onnx_path.stem + '_merged_tmp.onnx')
+        merge_external_data(onnx_path, merged_path)
+        data_path.unlink()
+        merged_path.replace(onnx_path)
+    elif layout == 'external' and not data_path.exists():
+        from merge_onnx_model import split_external_data
+        split_path = onnx_path.with_name(onnx_path.stem + '_split_tmp.onnx')
+        split_external_data(onnx_path, split_path, location=data_path.name)
+        split_path.replace(onnx_path)
+
+def main():
+    """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="ONNX artifact build pipeline")
+    parser.add_argument('--checkpoint', help="Checkpoint yolu (varsayilan: config / en yuksek adim)")
+    parser.add_argument('--variants', default='fp32,optimized,int8',
+                        help=f"Virgulle ayrilmis varyantlar: {', '.join(VARIANTS)}")
+    parser.add_argument('--layout', choices=['merged', 'external'], default='merged',
+                        help="merged: tek dosya (mobil), external: .onnx + .onnx.data")
+    parser.add_argument('--output-dir', help="Cikti klasoru (varsayilan: <models>/build)")
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--fp16-mode', choices=['storage', 'compute'], default='storage',
+                        help="storage: FP16 agirlik + FP32 hesap (her EP), compute: FP16 hesap (GPU/ARM)")
+    parser.add_argument('--force', action='store_true', help="Cache'i yok say, her seyi yeniden uret")
+    parser.add_argument('--benchmark-runs', type=int, default=30)
+    args = parser.parse_args()
+
+    variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"Bilinmeyen varyant: {', '.join(sorted(unknown))}")
+
+    config = load_config()
+    models_dir = Path(config['models']['classification'])
+    checkpoint = resolve_checkpoint(models_dir, args.checkpoint or config['models'].get('checkpoint'))
+    output_dir = Path(args.output_dir) if args.output_dir else models_dir / 'build'
+
+    print("=" * 70)
+    print("Artifact Build")
+    print("=" * 70)
+    print(f"Checkpoint: {checkpoint} (adim {checkpoint_step(checkpoint)})")
+    print(f"Varyantlar: {', '.join(variants)}")
+
+    start = time.perf_counter()
+    manifest, paths = build(config, checkpoint, variants, output_dir, layout=args.layout,
+                            opset=args.opset, force=args.force, benchmark_runs=args.benchmark_runs,
+                            fp16_mode=args.fp16_mode)
+
+    print(f"\n[3/3] Ozet")
+    print(f"   {'Varyant':<12} {'Boyut MB':>10} {'Gecikme ms':>12}  sha256")
+    for name in variants:
+        entry = manifest['artifacts'][name]
+        latency = entry.get('latency', {}).get('mean_ms', float('nan'))
+        print(f"   {name:<12} {entry['size_bytes'] / (1024 * 1024):>10.1f} {latency:>12.2f}  {entry['sha256'][:12]}")
+    print(f"\n[OK] Manifest: {output_dir / 'manifest.json'} ({time.perf_counter() - start:.1f} s)")
+
+if __name__ == "__main__":
+    main()
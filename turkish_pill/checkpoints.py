@@ -0,0 +1,51 @@
+"""
+Checkpoint Secimi
+Tum scriptler (egitim sonrasi test, inference, ONNX export, build) ayni
+checkpoint'i secsin diye tek ve deterministik kural:
+
+1. Acikca verilen yol (CLI / config models.checkpoint)
+2. Aksi halde en yuksek adim numarali checkpoint-<adim> klasoru
+"""
+
+from pathlib import Path
+
+def checkpoint_step(path):
+    """checkpoint-<adim> klasor adindan adim numarasi (gecersizse -1)"""
+    _, _, step = Path(path).name.partition('-')
+    return int(step) if step.isdigit() else -1
+
+def list_checkpoints(models_dir):
+    """Adim numarasina gore artan sirali checkpoint listesi"""
+    models_path = Path(models_dir)
+    if not models_path.exists():
+        raise FileNotFoundError(f"Model klasoru bulunamadi: {models_dir}")
+    checkpoints = [
+        d for d in models_path.iterdir()
+        if d.is_dir() and d.name.startswith('checkpoint-') and checkpoint_step(d) >= 0
+    ]
+    return sorted(checkpoints, key=lambda d: (checkpoint_step(d), d.name))
+
+def resolve_checkpoint(models_dir, explicit=None):
+    """
+    Kullanilacak checkpoint'i sec
+
+    Args:
+        models_dir: checkpoint-* klasorlerini iceren klasor
+        explicit: Acik checkpoint yolu (varsa dogrudan kullanilir)
+    """
+    if explicit:
+        path = Path(explicit)
+        if not path.exists():
+            raise FileNotFoundError(f"Checkpoint bulunamadi: {explicit}")
+        return path
+
+    checkpoints = list_checkpoints(models_dir)
+    if not checkpoints:
+        raise FileNotFoundError(f"Checkpoint bulunamadi: {models_dir}")
+    return checkpoints[-1]
+
+def checkpoint_weight_files(checkpoint_path):
+    """Modeli tanimlayan dosyalar (optimizer/scheduler durumu haric)"""
+    checkpoint_path = Path(checkpoint_path)
+    names = ['config.json', 'model.safetensors', 'pytorch_model.bin']
+    return [checkpoint_path / name for name in names if (checkpoint_path / name).exists()]
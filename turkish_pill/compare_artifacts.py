@@ -0,0 +1,300 @@
+"""
+Artifact Karsilastirma Scripti
+PyTorch checkpoint, FP32 ONNX, optimize ONNX ve INT8 ONNX modellerini gercek
+validation ornekleri uzerinde batch halinde calistirir; dogruluk, PyTorch ile
+uyum, logit hata dagilimi, gecikme ve model boyutunu tek tabloda raporlar.
+--pytorch-int8 ile ONNX kullanmayan CPU yolu (dinamik INT8 PyTorch) da eklenir.
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import yaml
+from PIL import Image
+from transformers import ViTForImageClassification, ViTImageProcessor
+
+from checkpoints import resolve_checkpoint
+from ort_session import create_session
+
+# Windows konsol encoding sorununu coz
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ortak CPU optimizasyon yardimcilari ilacverisi/src altinda
+SHARED_SRC = Path(__file__).resolve().parent.parent / 'ilacverisi' / 'src'
+
+# Varsayilan artifact adlari (models/classification altinda)
+DEFAULT_ARTIFACTS = {
+    'onnx_fp32': 'classification_150.onnx',
+    'onnx_optimized': 'classification_150_optimized.onnx',
+    'onnx_int8': 'classification_150_quantized.onnx',
+}
+
+def load_config():
+    """Config dosyasini yukle"""
+    config_path = Path(__file__).parent / 'config.yaml'
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+def load_class_names(data_yaml_path):
+    """Sinif isimlerini yukle"""
+    with open(data_yaml_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+        return data['names']
+
+def load_validation_sample(data_dir, class_names, processor, max_samples=256, split='valid'):
+    """
+    Validation setinden sinif dengeli bir ornek al ve on isle
+
+    Returns:
+        (pixel_values [N, 3, H, W] float32, labels [N] int64)
+    """
+    per_class = {}
+    for class_idx, class_name in enumerate(class_names):
+        class_dir = Path(data_dir) / split / class_name
+        if class_dir.exists():
+            per_class[class_idx] = sorted(class_dir.glob('*.jpg')) + sorted(class_dir.glob('*.JPG'))
+
+    if not per_class:
+        raise FileNotFoundError(f"Validation seti bulunamadi: {Path(data_dir) / split}")
+
+    # Round-robin: her siniftan sirayla bir goruntu
+    samples = []
+    depth = 0
+    while len(samples) < max_samples:
+        added = False
+        for class_idx, files in per_class.items():
+            if depth < len(files) and len(samples) < max_samples:
+                samples.append((files[depth], class_idx))
+                added = True
+        if not added:
+            break
+        depth += 1
+
+    pixel_values = []
+    for path, _ in samples:
+        image = Image.open(path).convert('RGB')
+        pixel_values.append(processor(image, return_tensors="np")['pixel_values'][0])
+
+    labels = np.array([label for _, label in samples], dtype=np.int64)
+    print(f"   {len(samples)} goruntu, {len(per_class)} sinif ({split})")
+    return np.stack(pixel_values).astype(np.float32), labels
+
+def artifact_size_mb(path):
+    """Model boyutu (external data dosyasi dahil)"""
+    path = Path(path)
+    size = path.stat().st_size
+    data_path = path.with_name(path.name + '.data')
+    if data_path.exists():
+        size += data_path.stat().st_size
+    return size / (1024 * 1024)
+
+def run_batched(forward, pixel_values, batch_size, warmup=1):
+    """
+    forward'u batch'ler halinde calistir
+
+    Returns:
+        (logits [N, C], batch basina sure listesi (saniye))
+    """
+    for _ in range(warmup):
+        forward(pixel_values[:batch_size])
+
+    outputs = []
+    batch_times = []
+    for start in range(0, len(pixel_values), batch_size):
+        batch = pixel_values[start:start + batch_size]
+        t0 = time.perf_counter()
+        outputs.append(forward(batch))
+        batch_times.append((time.perf_counter() - t0, len(batch)))
+    return np.concatenate(outputs, axis=0), batch_times
+
+def pytorch_forward(model):
+    def forward(batch):
+        with torch.inference_mode():
+            return model(pixel_values=torch.from_numpy(batch)).logits.numpy()
+    return forward
+
+def prepared_forward(forward):
+    """cpu_optimization.prepare_classifier ciktisini numpy batch'lerle calistir"""
+    def run(batch):
+        with torch.inference_mode():
+            return forward(torch.from_numpy(batch)).numpy()
+    return run
+
+def onnx_forward(onnx_path):
+    session = create_session(onnx_path)
+    input_name = session.get_inputs()[0].name
+
+    def forward(batch):
+        return session.run(None, {input_name: batch})[0]
+    return forward
+
+def summarize(name, logits, batch_times, labels, reference_logits, size_mb):
+    """Tek bir artifact icin metrikleri hesapla"""
+    top5 = np.argsort(-logits, axis=1)[:, :5]
+    ref_top5 = np.argsort(-reference_logits, axis=1)[:, :5]
+    abs_err = np.abs(logits.astype(np.float64) - reference_logits.astype(np.float64)).max(axis=1)
+
+    per_image_ms = [t / n * 1000 for t, n in batch_times]
+    batch_ms = [t * 1000 for t, _ in batch_times]
+
+    return {
+        'artifact': name,
+        'accuracy': float((top5[:, 0] == labels).mean()),
+        'top5_accuracy': float((top5 == labels[:, None]).any(axis=1).mean()),
+        'top1_agreement': float((top5[:, 0] == ref_top5[:, 0]).mean()),
+        'top5_agreement': float(np.mean([len(set(a) & set(b)) / 5 for a, b in zip(top5, ref_top5)])),
+        'logit_err_mean': float(abs_err.mean()),
+        'logit_err_p99': float(np.percentile(abs_err, 99)),
+        'logit_err_max': float(abs_err.max()),
+        'ms_per_image': float(np.mean(per_image_ms)),
+        'batch_p50_ms': float(np.percentile(batch_ms, 50)),
+        'batch_p95_ms': float(np.percentile(batch_ms, 95)),
+        'size_mb': size_mb,
+    }
+
+def recommend(rows, min_agreement=0.99, max_accuracy_drop=0.005):
+    """
+    Dagitim onerisi:
+    - Sunucu: kriterleri saglayan en hizli artifact
+    - Mobil: kriterleri saglayan en kucuk artifact
+    """
+    reference = next(r for r in rows if r['artifact'] == 'pytorch')
+    eligible = [
+        r for r in rows
+        if r['artifact'] != 'pytorch'
+        and r['top1_agreement'] >= min_agreement
+        and reference['accuracy'] - r['accuracy'] <= max_accuracy_drop
+    ]
+    if not eligible:
+        return None, None
+    server = min(eligible, key=lambda r: r['ms_per_image'])
+    mobile = min(eligible, key=lambda r: r['size_mb'])
+    return server['artifact'], mobile['artifact']
+
+def format_table(rows):
+    """Markdown tablo"""
+    header = ("| Artifact | Acc | Top-5 Acc | Top-1 Uyum | Top-5 Uyum | Logit Hata (ort/p99/max) "
+              "| ms/goruntu | Batch p50/p95 ms | Boyut MB |")
+    lines = [header, "|" + "---|" * 9]
+    for r in rows:
+        lines.append(
+            f"| {r['artifact']} | {r['accuracy']:.4f} | {r['top5_accuracy']:.4f} | {r['top1_agreement']:.4f} "
+            f"| {r['top5_agreement']:.4f} | {r['logit_err_mean']:.4f} / {r['logit_err_p99']:.4f} / {r['logit_err_max']:.4f} "
+            f"| {r['ms_per_image']:.2f} | {r['batch_p50_ms']:.1f} / {r['batch_p95_ms']:.1f} | {r['size_mb']:.1f} |"
+        )
+    return '\n'.join(lines)
+
+def main():
+    """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="PyTorch / ONNX / INT8 artifact karsilastirmasi")
+    parser.add_argument('--checkpoint', help="PyTorch checkpoint (varsayilan: config / en son)")
+    parser.add_argument('--artifact', action='append', default=[], metavar='AD=YOL',
+                        help="Ek/degistirilmis ONNX artifact (orn. onnx_fp16=models/classification/x.onnx)")
+    parser.add_argument('--samples', type=int, default=256, help="Validation ornek sayisi")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--split', default='valid')
+    parser.add_argument('--output', default='artifact_report.md')
+    parser.add_argument('--pytorch-int8', action='store_true',
+                        help="Dinamik INT8 PyTorch CPU yolunu da olc (ONNX'siz sunucular icin)")
+    parser.add_argument('--compile', choices=['trace', 'compile'],
+                        help="--pytorch-int8 ile ek olarak TorchScript trace / torch.compile varyantini olc")
+    args = parser.parse_args()
+
+    config = load_config()
+    models_dir = Path(config['models']['classification'])
+    class_names = load_class_names(config['data']['data_yaml'])
+
+    print("=" * 70)
+    print("Artifact Karsilastirmasi")
+    print("=" * 70)
+
+    checkpoint = resolve_checkpoint(models_dir, args.checkpoint or config['models'].get('checkpoint'))
+    print(f"\n[1/3] PyTorch modeli yukleniyor: {checkpoint}")
+    model = ViTForImageClassification.from_pretrained(str(checkpoint))
+    model.eval()
+    processor = ViTImageProcessor.from_pretrained(config['classification']['model_name'])
+
+    artifacts = {name: models_dir / filename for name, filename in DEFAULT_ARTIFACTS.items()}
+    for spec in args.artifact:
+        name, _, path = spec.partition('=')
+        artifacts[name] = Path(path)
+
+    print(f"\n[2/3] Validation ornegi hazirlaniyor...")
+    pixel_values, labels = load_validation_sample(
+        config['data']['dataset_path'], class_names, processor, max_samples=args.samples, split=args.split
+    )
+
+    print(f"\n[3/3] Modeller calistiriliyor (batch={args.batch_size})...")
+    checkpoint_size = sum(f.stat().st_size for f in Path(checkpoint).glob('*.safetensors')) or \
+        sum(f.stat().st_size for f in Path(checkpoint).glob('*.bin'))
+    reference_logits, batch_times = run_batched(pytorch_forward(model), pixel_values, args.batch_size)
+    rows = [summarize('pytorch', reference_logits, batch_times, labels, reference_logits,
+                      checkpoint_size / (1024 * 1024))]
+    print(f"   [OK] pytorch: {rows[-1]['ms_per_image']:.2f} ms/goruntu")
+
+    if args.pytorch_int8:
+        if str(SHARED_SRC) not in sys.path:
+            sys.path.append(str(SHARED_SRC))
+        from cpu_optimization import prepare_classifier, model_size_mb
+
+        variants = [('pytorch_int8', None)]
+        if args.compile:
+            variants.append((f'pytorch_int8_{args.compile}', args.compile))
+        for name, compile_mode in variants:
+            # quantize_dynamic kopya uzerinde calisir, FP32 referans degismez
+            int8_model, forward = prepare_classifier(model, quantize=True, channels_last=True,
+                                                     compile_mode=compile_mode)
+            logits, batch_times = run_batched(prepared_forward(forward), pixel_values, args.batch_size)
+            rows.append(summarize(name, logits, batch_times, labels, reference_logits, model_size_mb(int8_model)))
+            print(f"   [OK] {name}: {rows[-1]['ms_per_image']:.2f} ms/goruntu")
+
+    for name, path in artifacts.items():
+        if not path.exists():
+            print(f"   [ATLA] {name}: {path} bulunamadi")
+            continue
+        try:
+            logits, batch_times = run_batched(onnx_forward(path), pixel_values, args.batch_size)
+        except Exception as e:
+            print(f"   [HATA] {name}: {e}")
+            continue
+        rows.append(summarize(name, logits, batch_times, labels, reference_logits, artifact_size_mb(path)))
+        print(f"   [OK] {name}: {rows[-1]['ms_per_image']:.2f} ms/goruntu")
+
+    table = format_table(rows)
+    server, mobile = recommend(rows)
+
+    report = [
+        "# Artifact Karsilastirma Raporu\n",
+        f"- Checkpoint: `{checkpoint}`",
+        f"- Ornek: {len(labels)} goruntu ({args.split}), batch {args.batch_size}",
+        f"- Uyum referansi: PyTorch FP32\n",
+        table,
+        "",
+        "## Oneri\n",
+    ]
+    if server:
+        report.append(f"- **Sunucu**: `{server}` (top-1 uyum >= %99, accuracy kaybi <= 0.5 puan olanlar icinde en hizli)")
+        report.append(f"- **PharmaApp mobil**: `{mobile}` (ayni kriterlerle en kucuk)")
+    else:
+        report.append("- Kriterleri saglayan artifact yok, FP32 PyTorch checkpoint kullanin")
+    report_text = '\n'.join(report) + '\n'
+
+    print("\n" + table)
+    print('\n'.join(report[-3:]))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report_text)
+    with open(Path(args.output).with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump({'rows': rows, 'server': server, 'mobile': mobile}, f, indent=2)
+    print(f"\n[OK] Rapor kaydedildi: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -8,18 +8,30 @@ Ozellikler:
 - PyTorch vs ONNX inference karsilastirmasi
 - Detayli hata yonetimi
 - Windows encoding sorunlari cozumu
+- Transformer fusion ile graph optimizasyonu (Attention, LayerNorm, GELU, BiasAdd)
+- Opsiyonel: on isleme + softmax/top-k graph icinde (uint8 NHWC girdi)
+- Opsiyonel: FP16 agirlikli model
+- Opsiyonel: token merging ile kisaltilmis encoder
 """
 
 import torch
 from transformers import ViTForImageClassification, ViTImageProcessor
 import onnx
-import onnxruntime as ort
 import numpy as np
 from pathlib import Path
 import yaml
 import os
 import sys
 import io
+import argparse
+
+from optimize_onnx import optimize_vit_onnx, check_top1_parity, compare_latency
+from fp16_onnx import convert_to_fp16, report_fp16
+from ort_session import create_session
+from checkpoints import resolve_checkpoint
+
+# Ortak yardimcilar (token merging) ilacverisi/src altinda
+SHARED_SRC = Path(__file__).resolve().parent.parent / 'ilacverisi' / 'src'
 
 # Windows konsol encoding sorununu coz
 if sys.platform == 'win32':
@@ -33,23 +45,9 @@ def load_config():
     with open(config_path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-def find_latest_checkpoint(models_dir):
-    """En son checkpoint'i bul"""
-    models_path = Path(models_dir)
-    if not models_path.exists():
-        raise FileNotFoundError(f"Model klasoru bulunamadi: {models_dir}")
-    
-    checkpoints = sorted(
-        [d for d in models_path.iterdir() 
-         if d.is_dir() and d.name.startswith('checkpoint-')],
-        key=lambda x: int(x.name.split('-')[1]) if x.name.split('-')[1].isdigit() else 0,
-        reverse=True
-    )
-    
-    if not checkpoints:
-        raise FileNotFoundError(f"Checkpoint bulunamadi: {models_dir}")
-    
-    return checkpoints[0]
+def find_latest_checkpoint(models_dir, explicit=None):
+    """En son (en yuksek adimli) checkpoint'i bul"""
+    return resolve_checkpoint(models_dir, explicit)
 
 def load_model_and_processor(checkpoint_path, model_name):
     """Model ve processor'i yukle"""
@@ -69,8 +67,11 @@ def load_model_and_processor(checkpoint_path, model_name):
     
     return model, processor
 
-def convert_to_onnx(model, processor, output_path, opset_version=17):
-    """Modeli ONNX formatina donustur"""
+def convert_to_onnx(model, processor, output_path, opset_version=17, fallback=True):
+    """
+    Modeli ONNX formatina donustur
+    fallback=False ise istenen opset basarisiz olunca opset 11 denenmez, hata yukseltilir
+    """
     print(f"\n[2/5] ONNX formatina donusturuluyor...")
     print(f"   Opset version: {opset_version}")
     
@@ -109,11 +110,124 @@ def convert_to_onnx(model, processor, output_path, opset_version=17):
     except Exception as e:
         print(f"   [HATA] ONNX donusturme hatasi: {e}")
         # Opset version dusurerek tekrar dene
-        if opset_version > 11:
+        if fallback and opset_version > 11:
             print(f"   [INFO] Opset {opset_version} basarisiz, opset 11 deneniyor...")
             return convert_to_onnx(model, processor, output_path, opset_version=11)
         raise
 
+class PreprocessingViT(torch.nn.Module):
+    """
+    On isleme ve son islemeyi iceren ViT sarmalayici
+    Girdi: uint8 [N, H, W, 3] (ham kamera/RGB buffer)
+    Cikti: top_k_probs [N, k] float32, top_k_indices [N, k] int64
+    """
+    
+    def __init__(self, model, image_mean, image_std, image_size=224, top_k=5):
+        super().__init__()
+        self.model = model
+        self.image_size = image_size
+        self.top_k = top_k
+        self.register_buffer('mean', torch.tensor(image_mean, dtype=torch.float32).view(1, 3, 1, 1))
+        self.register_buffer('std', torch.tensor(image_std, dtype=torch.float32).view(1, 3, 1, 1))
+    
+    def forward(self, images):
+        # NHWC uint8 -> NCHW float
+        x = images.permute(0, 3, 1, 2).float()
+        # ViTImageProcessor: bilinear resize -> 1/255 -> (x - mean) / std
+        x = torch.nn.functional.interpolate(
+            x, size=(self.image_size, self.image_size), mode='bilinear', align_corners=False
+        )
+        x = (x / 255.0 - self.mean) / self.std
+        logits = self.model(pixel_values=x).logits
+        probs = torch.nn.functional.softmax(logits, dim=-1)
+        return torch.topk(probs, self.top_k, dim=-1)
+
+def convert_to_onnx_with_preprocessing(model, processor, output_path, top_k=5, opset_version=17):
+    """On isleme + softmax/top-k iceren ONNX modeli olustur"""
+    print(f"\n[2b] On isleme dahil ONNX export (top-{top_k})...")
+    num_labels = model.config.num_labels
+    if not 1 <= top_k <= num_labels:
+        # torch.topk export icinde anlasilmaz bir hatayla dusmesin
+        raise ValueError(f"top_k 1..{num_labels} araliginda olmali: {top_k}")
+    
+    size = processor.size
+    image_size = size.get('height', model.config.image_size) if isinstance(size, dict) else size
+    wrapper = PreprocessingViT(
+        model, processor.image_mean, processor.image_std, image_size=image_size, top_k=top_k
+    )
+    wrapper.eval()
+    
+    # Farkli cozunurluk ve batch ile calismasi icin H, W ve batch dinamik
+    dummy_images = torch.randint(0, 256, (1, 480, 640, 3), dtype=torch.uint8)
+    torch.onnx.export(
+        wrapper,
+        dummy_images,
+        str(output_path),
+        input_names=['images'],
+        output_names=['top_k_probs', 'top_k_indices'],
+        dynamic_axes={
+            'images': {0: 'batch_size', 1: 'height', 2: 'width'},
+            'top_k_probs': {0: 'batch_size'},
+            'top_k_indices': {0: 'batch_size'}
+        },
+        opset_version=opset_version,
+        do_constant_folding=True,
+        export_params=True,
+        verbose=False
+    )
+    
+    model_size_mb = output_path.stat().st_size / (1024 * 1024)
+    print(f"   [OK] On islemeli ONNX model olusturuldu: {output_path} ({model_size_mb:.2f} MB)")
+    print(f"   - Girdi: images uint8 [N, H, W, 3]")
+    print(f"   - Cikti: top_k_probs [N, {top_k}], top_k_indices [N, {top_k}]")
+    return True
+
+def sample_image_paths(data_dir, num_images=16):
+    """Valid setinden her siniftan bir goruntu (cesitlilik icin), en fazla num_images"""
+    valid_dir = Path(data_dir) / 'valid'
+    image_paths = []
+    if valid_dir.exists():
+        for class_dir in sorted(d for d in valid_dir.iterdir() if d.is_dir()):
+            files = sorted(class_dir.glob('*.jpg')) + sorted(class_dir.glob('*.JPG'))
+            if files:
+                image_paths.append(files[0])
+            if len(image_paths) >= num_images:
+                break
+    return image_paths
+
+def verify_preprocessing_parity(model, processor, onnx_path, data_dir, num_images=16):
+    """
+    Processor + PyTorch yolu ile graph ici on isleme yolunun top-1 uyumunu kontrol et
+    Not: PIL bilinear resize kucultmede antialias uygular, graph icindeki Resize uygulamaz;
+    bu yuzden olasiliklarda kucuk farklar beklenir, top-1 uyumu raporlanir.
+    """
+    from PIL import Image
+    
+    print(f"\n[2c] On isleme uyumu kontrol ediliyor...")
+    image_paths = sample_image_paths(data_dir, num_images)
+    if image_paths:
+        images = [Image.open(p).convert('RGB') for p in image_paths]
+    else:
+        images = [Image.fromarray(np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8))
+                  for _ in range(num_images)]
+    
+    session = create_session(onnx_path)
+    matches = 0
+    max_prob_diff = 0.0
+    for image in images:
+        with torch.no_grad():
+            inputs = processor(image, return_tensors="pt")
+            ref_probs = torch.nn.functional.softmax(model(**inputs).logits, dim=-1)[0].numpy()
+        raw = np.asarray(image, dtype=np.uint8)[None]
+        top_probs, top_indices = session.run(None, {'images': raw})
+        matches += int(top_indices[0][0] == ref_probs.argmax())
+        max_prob_diff = max(max_prob_diff, float(abs(top_probs[0][0] - ref_probs[top_indices[0][0]])))
+    
+    agreement = matches / len(images)
+    status = '[OK]' if agreement == 1.0 else '[UYARI]'
+    print(f"   {status} Top-1 uyum: {agreement:.2%} ({len(images)} goruntu), max olasilik farki: {max_prob_diff:.4f}")
+    return agreement
+
 def validate_onnx_model(onnx_path):
     """ONNX modelini dogrula"""
     print(f"\n[3/5] ONNX model dogrulanıyor...")
@@ -168,7 +282,7 @@ def compare_inference(pytorch_model, processor, onnx_path, num_tests=3):
     
     # ONNX inference
     try:
-        ort_session = ort.InferenceSession(str(onnx_path))
+        ort_session = create_session(onnx_path)
         onnx_results = []
         
         for img in test_images:
@@ -207,8 +321,86 @@ def compare_inference(pytorch_model, processor, onnx_path, num_tests=3):
         traceback.print_exc()
         return False
 
+def load_sample_pixel_values(processor, data_dir, num_images=16):
+    """
+    Dogrulama icin valid setinden ornek goruntuleri yukle
+    Veri seti yoksa random goruntu kullanilir
+    """
+    from PIL import Image
+    
+    valid_dir = Path(data_dir) / 'valid'
+    image_paths = sample_image_paths(data_dir, num_images)
+    
+    if image_paths:
+        images = [Image.open(p).convert('RGB') for p in image_paths]
+        print(f"   {len(images)} gercek goruntu kullaniliyor ({valid_dir})")
+    else:
+        images = [Image.fromarray(np.random.randint(0, 255, (224, 224, 3), dtype=np.uint8))
+                  for _ in range(num_images)]
+        print(f"   [UYARI] Valid seti bulunamadi, {num_images} random goruntu kullaniliyor")
+    
+    return processor(images, return_tensors="pt")['pixel_values']
+
+def optimize_and_verify(model, processor, onnx_path, data_dir):
+    """Fused modeli olustur, PyTorch ile top-1 uyumunu ve hizlanmayi raporla"""
+    print(f"\n[5/5] Graph optimizasyonu (transformer fusion)...")
+    
+    optimized_path = onnx_path.with_name(f"{onnx_path.stem}_optimized.onnx")
+    try:
+        optimize_vit_onnx(
+            onnx_path,
+            optimized_path,
+            num_heads=model.config.num_attention_heads,
+            hidden_size=model.config.hidden_size,
+        )
+    except Exception as e:
+        print(f"   [HATA] Optimizasyon hatasi: {e}")
+        return None
+    
+    pixel_values = load_sample_pixel_values(processor, data_dir)
+    with torch.no_grad():
+        reference_logits = model(pixel_values=pixel_values).logits.numpy()
+    
+    parity = check_top1_parity(reference_logits, optimized_path, pixel_values.numpy(), label='Fused ONNX')
+    if parity['top1_agreement'] < 1.0:
+        print(f"   [UYARI] Fused model PyTorch ile tam uyumlu degil, dagitmadan once inceleyin")
+    
+    compare_latency(onnx_path, optimized_path)
+    return optimized_path
+
+def convert_fp16_and_verify(model, processor, source_path, data_dir, mode='storage'):
+    """FP16 modeli olustur, boyut / yukleme suresi / PyTorch paritesini raporla"""
+    print(f"\n[FP16] Agirliklar FP16'ya cevriliyor ({mode})...")
+    
+    fp16_path = source_path.with_name(f"{source_path.stem}_fp16.onnx")
+    try:
+        convert_to_fp16(source_path, fp16_path, mode=mode)
+    except Exception as e:
+        print(f"   [HATA] FP16 donusum hatasi: {e}")
+        return None
+    
+    pixel_values = load_sample_pixel_values(processor, data_dir)
+    with torch.no_grad():
+        reference_logits = model(pixel_values=pixel_values).logits.numpy()
+    
+    report = report_fp16(source_path, fp16_path, pixel_values.numpy(), reference_logits)
+    if report['parity']['top1_agreement'] < 1.0:
+        print(f"   [UYARI] FP16 model PyTorch ile tam uyumlu degil, dagitmadan once inceleyin")
+    return fp16_path
+
 def main():
     """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="Turkish Pill Model -> ONNX")
+    parser.add_argument('--skip-optimize', action='store_true', help="Transformer fusion adimini atla")
+    parser.add_argument('--with-preprocessing', action='store_true',
+                        help="Ek olarak uint8 NHWC girdi alan, softmax/top-k donduren model uret")
+    parser.add_argument('--top-k', type=int, default=5, help="On islemeli modelin dondurecegi sinif sayisi")
+    parser.add_argument('--token-merging', type=float, default=0.0, metavar='ORAN',
+                        help="Katman basina token birlestirme orani ile export (orn. 0.1, opset >= 16)")
+    parser.add_argument('--fp16', choices=['storage', 'compute'],
+                        help="Ek olarak FP16 model uret (storage: FP16 agirlik + FP32 hesap, compute: FP16 hesap)")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("Turkish Pill Model -> ONNX Donusturme ve Dogrulama")
     print("=" * 70)
@@ -220,7 +412,7 @@ def main():
         model_name = config['classification']['model_name']
         
         # En son checkpoint'i bul
-        checkpoint_path = find_latest_checkpoint(models_dir)
+        checkpoint_path = find_latest_checkpoint(models_dir, config['models'].get('checkpoint'))
         print(f"\nEn son checkpoint: {checkpoint_path.name}")
         
         # Output path
@@ -228,12 +420,32 @@ def main():
         
         # Model ve processor yukle
         model, processor = load_model_and_processor(checkpoint_path, model_name)
+        if args.with_preprocessing and not 1 <= args.top_k <= model.config.num_labels:
+            print(f"\n[HATA] --top-k 1..{model.config.num_labels} araliginda olmali: {args.top_k}")
+            return False
+        
+        # Token merging (opsiyonel, hook'lar export graph'ina dahil olur)
+        if args.token_merging:
+            if str(SHARED_SRC) not in sys.path:
+                sys.path.append(str(SHARED_SRC))
+            from token_merging import apply_token_merging
+            apply_token_merging(model, args.token_merging)
+            output_path = models_dir / f"classification_150_tm{round(args.token_merging * 100):02d}.onnx"
+            print(f"Token merging: oran {args.token_merging} -> {output_path.name}")
         
         # ONNX'a donustur
         if not convert_to_onnx(model, processor, output_path):
             print("\n[HATA] ONNX donusturme basarisiz!")
             return False
         
+        # On isleme dahil model (opsiyonel)
+        preprocessed_path = None
+        if args.with_preprocessing:
+            # Token merging varsa _tmNN eki korunur, normal mobil artifact ezilmez
+            preprocessed_path = output_path.with_name(f"{output_path.stem}_preprocessed.onnx")
+            convert_to_onnx_with_preprocessing(model, processor, preprocessed_path, top_k=args.top_k)
+            verify_preprocessing_parity(model, processor, preprocessed_path, config['data']['dataset_path'])
+        
         # ONNX modelini dogrula
         if not validate_onnx_model(output_path):
             print("\n[HATA] ONNX dogrulama basarisiz!")
@@ -243,12 +455,31 @@ def main():
         if not compare_inference(model, processor, output_path):
             print("\n[UYARI] Inference karsilastirmasi uyumsuz, ancak model olusturuldu")
         
+        # Graph optimizasyonu
+        optimized_path = None
+        if not args.skip_optimize:
+            optimized_path = optimize_and_verify(model, processor, output_path, config['data']['dataset_path'])
+        
+        # FP16 (opsiyonel, varsa optimize modelden)
+        fp16_path = None
+        if args.fp16:
+            fp16_path = convert_fp16_and_verify(model, processor, optimized_path or output_path,
+                                                config['data']['dataset_path'], mode=args.fp16)
+        
         # Sonuc
         print("\n" + "=" * 70)
         print("[OK] Donusturme ve dogrulama tamamlandi!")
         print("=" * 70)
         print(f"\nONNX Model: {output_path}")
         print(f"Boyut: {output_path.stat().st_size / (1024 * 1024):.2f} MB")
+        if optimized_path is not None:
+            print(f"Optimize ONNX Model: {optimized_path}")
+        if preprocessed_path is not None:
+            print(f"On islemeli ONNX Model: {preprocessed_path}")
+        if fp16_path is not None:
+            print(f"FP16 ONNX Model: {fp16_path} ({fp16_path.stat().st_size / (1024 * 1024):.2f} MB)")
+        print(f"\nGercek veri ile artifact karsilastirmasi:")
+        print(f"  python compare_artifacts.py")
         print(f"\nSonraki adim:")
         print(f"  Copy-Item \"{output_path}\" \"PharmaApp\\android\\app\\src\\main\\assets\\classification_150.onnx\"")
         
@@ -0,0 +1,269 @@
+"""
+Knowledge Distillation (ViT-Base teacher -> kucuk student)
+Fine-tune edilmis 150 sinif teacher checkpoint'inin soft target'lari ile
+kucuk bir student (varsayilan DeiT-Small) egitir.
+
+- Teacher logit'leri bir kez hesaplanir ve diske yazilir (goruntu yolu -> logit);
+  her epoch tekrar hesaplanmaz. Augmentation label'i koruyan hafif donusumler
+  oldugu icin temiz goruntunun logit'i augmented ornek icin de kullanilir.
+- Loss: alpha * KL(student/T || teacher/T) * T^2 + (1 - alpha) * class weight'li CE
+- Student, teacher ile ayni on islemeyi (ViTImageProcessor) kullanir; PharmaApp
+  ve sunucu tarafinda normalizasyon degismez.
+- Student ViTForImageClassification oldugu icin ayni ONNX yolundan export edilir.
+
+Kullanim:
+    python distill_vit.py
+    python distill_vit.py --student facebook/deit-tiny-patch16-224 --epochs 40
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import torch
+from torch.utils.data import Dataset, DataLoader
+from transformers import ViTForImageClassification, ViTImageProcessor, TrainingArguments
+from tqdm import tqdm
+
+from checkpoints import resolve_checkpoint, checkpoint_weight_files
+from train_vit import (
+    MedicineDataset, WeightedTrainer, compute_class_weights, compute_metrics,
+    load_class_names, load_config, device,
+)
+
+CACHE_NAME = 'teacher_logits.pt'
+
+def compute_teacher_logits(teacher, dataset, batch_size=64):
+    """Teacher logit'leri (augmentation olmadan), dataset sirasiyla [N, C]"""
+    teacher.to(device)
+    teacher.eval()
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False)
+    outputs = []
+    with torch.inference_mode():
+        for batch in tqdm(loader, desc=f"Teacher ({dataset.split})"):
+            logits = teacher(pixel_values=batch['pixel_values'].to(device)).logits
+            outputs.append(logits.float().cpu())
+    return torch.cat(outputs)
+
+def teacher_stamp(teacher_path):
+    """
+    Teacher agirlik dosyalarinin (ad, boyut, mtime) listesi
+    Ayni checkpoint klasorune yeniden egitim yazilirsa degisir (BuildCache ile ayni kural)
+    """
+    stamp = []
+    for path in checkpoint_weight_files(teacher_path):
+        stat = path.stat()
+        stamp.append([path.name, stat.st_size, stat.st_mtime_ns])
+    return stamp
+
+def load_or_compute_cache(cache_path, teacher_path, datasets, batch_size=64, recompute=False):
+    """
+    Teacher logit cache'i: {split: {goruntu yolu: logit}}
+    Teacher checkpoint'i (yol veya agirlik dosyalari) ya da goruntu listesi
+    degistiyse yeniden hesaplanir.
+    """
+    cache_path = Path(cache_path)
+    stamp = teacher_stamp(teacher_path)
+    if cache_path.exists() and not recompute:
+        cache = torch.load(cache_path)
+        valid = cache.get('teacher') == str(teacher_path) and cache.get('teacher_files') == stamp and all(
+            set(map(str, dataset.images)) <= set(cache['logits'].get(dataset.split, {}))
+            for dataset in datasets
+        )
+        if valid:
+            print(f"   [CACHE] Teacher logit'leri: {cache_path}")
+            return cache['logits']
+        print(f"   Cache eski (teacher veya veri degisti), yeniden hesaplaniyor")
+
+    teacher = ViTForImageClassification.from_pretrained(str(teacher_path))
+    logits = {}
+    for dataset in datasets:
+        split_logits = compute_teacher_logits(teacher, dataset, batch_size)
+        # fp16 saklanir: 150 sinif x N goruntu icin yeterli hassasiyet
+        logits[dataset.split] = {str(p): l.half() for p, l in zip(dataset.images, split_logits)}
+    del teacher
+
+    torch.save({'teacher': str(teacher_path), 'teacher_files': stamp, 'logits': logits}, cache_path)
+    print(f"   [OK] Teacher logit'leri kaydedildi: {cache_path}")
+    return logits
+
+class DistillationDataset(Dataset):
+    """MedicineDataset ornegine cache'teki teacher logit'ini ekler"""
+
+    def __init__(self, dataset, teacher_logits):
+        self.dataset = dataset
+        self.teacher_logits = teacher_logits
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        item = self.dataset[idx]
+        item['teacher_logits'] = self.teacher_logits[str(self.dataset.images[idx])].float()
+        return item
+
+class DistillationTrainer(WeightedTrainer):
+    """Soft target (KL) + class weight'li CE"""
+
+    def __init__(self, *args, temperature=4.0, alpha=0.7, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        teacher_logits = inputs.pop('teacher_logits', None)
+        if teacher_logits is None and model.training:
+            # remove_unused_columns=True iken Trainer bu kolonu sessizce dusurur
+            raise ValueError("Egitim batch'inde teacher_logits yok (TrainingArguments remove_unused_columns=False olmali)")
+        hard_loss, outputs = super().compute_loss(model, inputs, return_outputs=True, **kwargs)
+        if teacher_logits is None:
+            # Validation: sadece CE
+            return (hard_loss, outputs) if return_outputs else hard_loss
+
+        t = self.temperature
+        soft_loss = torch.nn.functional.kl_div(
+            torch.nn.functional.log_softmax(outputs.logits / t, dim=-1),
+            torch.nn.functional.softmax(teacher_logits / t, dim=-1),
+            reduction='batchmean',
+        ) * (t * t)
+        loss = self.alpha * soft_loss + (1 - self.alpha) * hard_loss
+        return (loss, outputs) if return_outputs else loss
+
+def teacher_accuracy(logits, dataset):
+    """Cache'teki logit'lerle teacher dogrulugu"""
+    predictions = torch.stack([logits[str(p)] for p in dataset.images]).float().argmax(dim=1)
+    return float((predictions == torch.tensor(dataset.labels)).float().mean())
+
+def main():
+    """Ana fonksiyon"""
+    config = load_config()
+    distill_config = config.get('distillation', {})
+
+    parser = argparse.ArgumentParser(description="ViT knowledge distillation")
+    parser.add_argument('--teacher', help="Teacher checkpoint (varsayilan: config / en son)")
+    parser.add_argument('--student', default=distill_config.get('student_model', 'facebook/deit-small-patch16-224'))
+    parser.add_argument('--epochs', type=float, default=distill_config.get('epochs', 30))
+    parser.add_argument('--temperature', type=float, default=distill_config.get('temperature', 4.0))
+    parser.add_argument('--alpha', type=float, default=distill_config.get('alpha', 0.7))
+    parser.add_argument('--output-dir', default=distill_config.get('save_dir', 'models/classification_student'))
+    parser.add_argument('--recompute-teacher', action='store_true', help="Teacher logit cache'ini yenile")
+    parser.add_argument('--skip-export', action='store_true', help="ONNX export adimini atla")
+    args = parser.parse_args()
+
+    data_path = Path(config['data']['dataset_path'])
+    class_names = load_class_names(data_path / 'data.yaml')
+    num_classes = len(class_names)
+    teacher_path = resolve_checkpoint(Path(config['models']['classification']),
+                                      args.teacher or config['models'].get('checkpoint'))
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    batch_size = distill_config.get('batch_size', config['classification']['batch_size'])
+
+    print("=" * 70)
+    print("Knowledge Distillation")
+    print("=" * 70)
+    print(f"Teacher: {teacher_path}")
+    print(f"Student: {args.student}")
+    print(f"T = {args.temperature}, alpha = {args.alpha}")
+
+    # Teacher ile ayni on isleme
+    processor = ViTImageProcessor.from_pretrained(config['classification']['model_name'])
+    train_dataset = MedicineDataset(data_path, split='train', processor=processor, class_names=class_names,
+                                    augment=False)
+    valid_dataset = MedicineDataset(data_path, split='valid', processor=processor, class_names=class_names)
+
+    print(f"\n[1/4] Teacher logit'leri...")
+    teacher_logits = load_or_compute_cache(
+        output_dir / CACHE_NAME, teacher_path, [train_dataset, valid_dataset],
+        batch_size=batch_size, recompute=args.recompute_teacher,
+    )
+    teacher_valid_acc = teacher_accuracy(teacher_logits['valid'], valid_dataset)
+    print(f"   Teacher valid accuracy: {teacher_valid_acc:.4f}")
+
+    print(f"\n[2/4] Student egitimi...")
+    train_dataset.augment = config['classification']['use_augmentation']
+    class_weights = None
+    if config['classification']['use_class_weights']:
+        class_weights, _ = compute_class_weights(data_path, class_names)
+
+    student = ViTForImageClassification.from_pretrained(
+        args.student,
+        num_labels=num_classes,
+        ignore_mismatched_sizes=True,
+    )
+    student.to(device)
+
+    training_args = TrainingArguments(
+        output_dir=str(output_dir),
+        num_train_epochs=args.epochs,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=batch_size,
+        learning_rate=distill_config.get('learning_rate', 5e-4),
+        weight_decay=0.05,
+        warmup_ratio=0.05,
+        logging_steps=10,
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        load_best_model_at_end=True,
+        metric_for_best_model="accuracy",
+        greater_is_better=True,
+        save_total_limit=3,
+        fp16=torch.cuda.is_available(),
+        dataloader_num_workers=0,  # Windows için 0
+        report_to="none",
+        remove_unused_columns=False,  # teacher_logits forward argumani degil, dusurulmemeli
+    )
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=DistillationDataset(train_dataset, teacher_logits['train']),
+        eval_dataset=valid_dataset,
+        compute_metrics=compute_metrics,
+        class_weights=class_weights,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    trainer.train()
+    metrics = trainer.evaluate()
+    trainer.save_model()
+    processor.save_pretrained(output_dir)
+
+    print(f"\n[3/4] Sonuclar")
+    teacher_params = sum(p.numel() for p in ViTForImageClassification.from_pretrained(str(teacher_path)).parameters())
+    student_params = sum(p.numel() for p in student.parameters())
+    print(f"   Teacher: acc {teacher_valid_acc:.4f}, {teacher_params / 1e6:.1f}M parametre")
+    print(f"   Student: acc {metrics['eval_accuracy']:.4f}, {student_params / 1e6:.1f}M parametre")
+
+    summary = {
+        'teacher': str(teacher_path),
+        'student_model': args.student,
+        'temperature': args.temperature,
+        'alpha': args.alpha,
+        'teacher_valid_accuracy': teacher_valid_acc,
+        'student_valid_accuracy': metrics['eval_accuracy'],
+        'teacher_params': teacher_params,
+        'student_params': student_params,
+    }
+
+    if not args.skip_export:
+        print(f"\n[4/4] ONNX export...")
+        from convert_to_onnx import convert_to_onnx, validate_onnx_model, compare_inference
+        from optimize_onnx import benchmark_latency
+        student = student.cpu().eval()
+        onnx_path = output_dir / "classification_150_student.onnx"
+        if convert_to_onnx(student, processor, onnx_path) and validate_onnx_model(onnx_path):
+            compare_inference(student, processor, onnx_path)
+            summary['student_onnx_ms'] = benchmark_latency(onnx_path)['mean_ms']
+            teacher_onnx = Path(config['models']['classification']) / "classification_150.onnx"
+            if teacher_onnx.exists():
+                summary['teacher_onnx_ms'] = benchmark_latency(teacher_onnx)['mean_ms']
+                print(f"   Gecikme: teacher {summary['teacher_onnx_ms']:.2f} ms -> "
+                      f"student {summary['student_onnx_ms']:.2f} ms "
+                      f"({summary['teacher_onnx_ms'] / summary['student_onnx_ms']:.1f}x)")
+
+    with open(output_dir / 'distillation_summary.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\n[OK] Student model: {output_dir}")
+
+if __name__ == '__main__':
+    main()
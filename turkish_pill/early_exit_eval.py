@@ -0,0 +1,173 @@
+"""
+Early-Exit Esik Taramasi
+Early-exit head'leri ile egitilmis checkpoint icin farkli guven esiklerinde
+validation dogrulugunu, tam derinlik (esik yok) ile top-1 uyumunu, cikis katmani
+dagilimini ve gecikmeyi olcer. Opsiyonel olarak model segment ONNX'lerine
+export edilip ONNX Runtime ile de olculur.
+
+Kullanim:
+    python early_exit_eval.py --thresholds 0.8,0.9,0.95,0.99
+    python early_exit_eval.py --export-onnx models/classification_early_exit
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import ViTImageProcessor
+
+from compare_artifacts import (
+    SHARED_SRC, load_config, load_class_names, load_validation_sample, run_batched, summarize,
+)
+from checkpoints import resolve_checkpoint
+
+if str(SHARED_SRC) not in sys.path:
+    sys.path.append(str(SHARED_SRC))
+from early_exit import (
+    ViTEarlyExitForImageClassification, predict_early_exit, format_exit_distribution,
+    export_early_exit_onnx, EarlyExitOnnx,
+)
+
+def early_exit_forward(model, threshold, exit_counts):
+    """numpy batch -> olasiliklar; cikis katmanlari exit_counts'a islenir"""
+    def forward(batch):
+        with torch.inference_mode():
+            probs, exit_layer = predict_early_exit(model, torch.from_numpy(batch), threshold=threshold)
+        exit_counts.update(exit_layer.tolist())
+        return probs.numpy()
+    return forward
+
+def onnx_early_exit_forward(runner):
+    """EarlyExitOnnx tek goruntu calistirir"""
+    def forward(batch):
+        return np.stack([runner.predict(image[None])[0] for image in batch])
+    return forward
+
+def mean_layers(counts):
+    total = sum(counts.values()) or 1
+    return sum(layer * count for layer, count in counts.items()) / total
+
+def format_sweep(rows, num_layers):
+    """Markdown tablo"""
+    lines = [
+        "| Esik | Acc | Top-1 Uyum | Ort. katman | Hesap | ms/goruntu | Hizlanma |",
+        "|" + "---|" * 7,
+    ]
+    baseline_ms = rows[0]['ms_per_image']
+    for r in rows:
+        threshold = "yok" if r['threshold'] is None else f"{r['threshold']:.3f}"
+        lines.append(
+            f"| {threshold} | {r['accuracy']:.4f} | {r['top1_agreement']:.4f} "
+            f"| {r['mean_layers']:.2f} | {r['mean_layers'] / num_layers:.0%} "
+            f"| {r['ms_per_image']:.2f} | {baseline_ms / r['ms_per_image']:.2f}x |"
+        )
+    return '\n'.join(lines)
+
+def main():
+    """Ana fonksiyon"""
+    config = load_config()
+    early_exit = config['classification'].get('early_exit') or {}
+
+    parser = argparse.ArgumentParser(description="Early-exit esik taramasi")
+    parser.add_argument('--checkpoint', help="Early-exit checkpoint (varsayilan: config / en son)")
+    parser.add_argument('--thresholds', default='0.7,0.8,0.9,0.95,0.98,0.99',
+                        help="Virgulle ayrilmis guven esikleri")
+    parser.add_argument('--samples', type=int, default=512, help="Validation ornek sayisi")
+    parser.add_argument('--split', default='valid')
+    parser.add_argument('--export-onnx', metavar='DIR', help="Segment ONNX'lerini bu klasore export edip ORT ile olc")
+    parser.add_argument('--output', default='early_exit_sweep.md')
+    args = parser.parse_args()
+
+    thresholds = [float(t) for t in args.thresholds.split(',') if t.strip()]
+    models_dir = Path(config['models']['classification'])
+    class_names = load_class_names(config['data']['data_yaml'])
+    checkpoint = resolve_checkpoint(models_dir, args.checkpoint or config['models'].get('checkpoint'))
+
+    print("=" * 70)
+    print("Early-Exit Esik Taramasi")
+    print("=" * 70)
+    print(f"Checkpoint: {checkpoint}")
+
+    model = ViTEarlyExitForImageClassification.from_pretrained(str(checkpoint))
+    if not model.exit_layers:
+        raise ValueError(f"Checkpoint'te early-exit head'i yok (early_exit.enabled ile egitin): {checkpoint}")
+    model.eval()
+    num_layers = model.config.num_hidden_layers
+    print(f"Exit katmanlari: {model.exit_layers} / {num_layers}")
+
+    processor = ViTImageProcessor.from_pretrained(config['classification']['model_name'])
+    pixel_values, labels = load_validation_sample(
+        config['data']['dataset_path'], class_names, processor, max_samples=args.samples, split=args.split
+    )
+
+    # Referans: esik yok, her ornek tum katmanlardan gecer
+    rows = []
+    reference_probs = None
+    for threshold in [None] + thresholds:
+        counts = Counter()
+        forward = early_exit_forward(model, float('inf') if threshold is None else threshold, counts)
+        # Isinma cagrisi dagilima sayilmaz
+        forward(pixel_values[:1])
+        counts.clear()
+        probs, batch_times = run_batched(forward, pixel_values, batch_size=1, warmup=0)
+        if reference_probs is None:
+            reference_probs = probs
+        row = summarize(f'early_exit_{threshold}', probs, batch_times, labels, reference_probs, 0.0)
+        row.update(threshold=threshold, mean_layers=mean_layers(counts),
+                   exit_distribution={str(k): v for k, v in sorted(counts.items())})
+        rows.append(row)
+        name = "yok" if threshold is None else f"{threshold:.3f}"
+        print(f"\n   esik {name}: acc {row['accuracy']:.4f}, uyum {row['top1_agreement']:.4f}, "
+              f"{row['ms_per_image']:.2f} ms/goruntu")
+        print(format_exit_distribution(counts, num_layers))
+
+    table = format_sweep(rows, num_layers)
+    print("\n" + table)
+
+    report = [
+        "# Early-Exit Esik Taramasi\n",
+        f"- Checkpoint: `{checkpoint}`",
+        f"- Exit katmanlari: {model.exit_layers} / {num_layers}",
+        f"- Ornek: {len(labels)} goruntu ({args.split}), batch 1",
+        f"- Uyum referansi: esik yok (tam derinlik)\n",
+        table,
+        "",
+        f"Secilen esik `config.yaml` icinde `classification.early_exit.threshold` olarak ayarlanir.",
+    ]
+
+    if args.export_onnx:
+        threshold = early_exit.get('threshold', 0.9)
+        print(f"\nSegment ONNX export (esik {threshold})...")
+        manifest = export_early_exit_onnx(model, args.export_onnx, threshold=threshold,
+                                          image_size=config['classification']['image_size'])
+        runner = EarlyExitOnnx(manifest)
+        forward = onnx_early_exit_forward(runner)
+        forward(pixel_values[:1])
+        runner.exit_counts.clear()
+        probs, batch_times = run_batched(forward, pixel_values, batch_size=1, warmup=0)
+        onnx_row = summarize('early_exit_onnx', probs, batch_times, labels, reference_probs, 0.0)
+        onnx_ms = onnx_row['ms_per_image']
+        onnx_row.update(threshold=threshold, manifest=str(manifest),
+                        mean_layers=mean_layers(runner.exit_counts),
+                        exit_distribution={str(k): v for k, v in sorted(runner.exit_counts.items())})
+        print(f"   ONNX: acc {onnx_row['accuracy']:.4f}, uyum {onnx_row['top1_agreement']:.4f}, "
+              f"{onnx_ms:.2f} ms/goruntu")
+        print(format_exit_distribution(runner.exit_counts, num_layers))
+        report += ["", "## ONNX (segment zinciri)\n",
+                   f"- Manifest: `{manifest}`, esik {threshold}",
+                   f"- Acc {onnx_row['accuracy']:.4f}, top-1 uyum {onnx_row['top1_agreement']:.4f}, "
+                   f"{onnx_ms:.2f} ms/goruntu, ortalama {onnx_row['mean_layers']:.2f} katman"]
+        rows.append(onnx_row)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(report) + '\n')
+    with open(Path(args.output).with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2)
+    print(f"\n[OK] Rapor kaydedildi: {args.output}")
+
+if __name__ == "__main__":
+    main()
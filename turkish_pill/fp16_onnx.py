@@ -0,0 +1,182 @@
+"""
+FP16 ONNX Donusumu (ViT)
+Export edilmis modelin agirliklarini FP16'ya cevirerek boyutu yariya indirir.
+
+Modlar:
+- storage: Agirliklar FP16 saklanir, yuklemede Cast ile FP32'ye acilir. Hesap
+  tamamen FP32 kalir; her execution provider'da (x86 CPU dahil) calisir.
+  ORT constant folding Cast'leri session olusturulurken katlar.
+- compute: Graph FP16'da calisir (GPU / ARM fp16 EP'ler icin). Girdi/cikti
+  FP32 kalir; LayerNorm ve Softmax gibi hassas operatorler FP32'de tutulur.
+
+Her iki modda rapor: boyut, yukleme suresi, FP32 modele gore top-1 uyum, gecikme.
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from optimize_onnx import check_top1_parity, benchmark_latency, run_onnx
+from ort_session import create_session
+
+# Windows konsol encoding sorununu coz
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Sayisal olarak hassas operatorler (girdileri ve agirliklari FP32 kalir)
+FP32_OPS = ['LayerNormalization', 'SkipLayerNormalization', 'EmbedLayerNormalization', 'Softmax']
+
+# Bu boyuttan kucuk agirliklar (bias, scale vb.) FP32 kalir
+MIN_FP16_ELEMENTS = 1024
+
+FP16_MAX = float(np.finfo(np.float16).max)
+
+def convert_to_fp16(input_path, output_path, mode='storage', fp32_ops=None):
+    """
+    ONNX modelini FP16'ya cevir
+
+    Args:
+        input_path: FP32 ONNX modeli (unfused veya optimize)
+        output_path: FP16 model yolu
+        mode: 'storage' (sadece agirlik depolama) veya 'compute' (FP16 hesap)
+        fp32_ops: FP32'de kalacak operator tipleri (varsayilan: FP32_OPS)
+
+    Returns:
+        dict: {'converted': FP16'ya cevrilen agirlik sayisi, 'kept_fp32': FP32 kalan}
+    """
+    import onnx
+
+    fp32_ops = list(fp32_ops or FP32_OPS)
+    model = onnx.load(str(input_path))
+
+    if mode == 'compute':
+        from onnxruntime.transformers.float16 import convert_float_to_float16, DEFAULT_OP_BLOCK_LIST
+        float_inits = sum(1 for t in model.graph.initializer if t.data_type == onnx.TensorProto.FLOAT)
+        model = convert_float_to_float16(
+            model,
+            keep_io_types=True,
+            op_block_list=sorted(set(DEFAULT_OP_BLOCK_LIST) | set(fp32_ops)),
+        )
+        kept = sum(1 for t in model.graph.initializer if t.data_type == onnx.TensorProto.FLOAT)
+        stats = {'converted': float_inits - kept, 'kept_fp32': kept}
+    elif mode == 'storage':
+        stats = _fp16_weight_storage(model, fp32_ops)
+    else:
+        raise ValueError(f"Bilinmeyen FP16 modu: {mode} (storage / compute)")
+
+    onnx.save_model(model, str(output_path))
+    print(f"   [OK] FP16 ({mode}) model kaydedildi: {output_path} "
+          f"({stats['converted']} agirlik FP16, {stats['kept_fp32']} FP32)")
+    return stats
+
+def _fp16_weight_storage(model, fp32_ops):
+    """Buyuk FP32 initializer'lari FP16 sakla, kullanildiklari yerde Cast(FP32) ekle"""
+    import onnx
+    from onnx import helper, numpy_helper
+
+    graph = model.graph
+    consumers = {}
+    for node in graph.node:
+        for name in node.input:
+            consumers.setdefault(name, set()).add(node.op_type)
+
+    converted, kept, clipped = 0, 0, 0
+    cast_nodes = []
+    initializers = []
+    for tensor in graph.initializer:
+        ops = consumers.get(tensor.name, set())
+        if (tensor.data_type != onnx.TensorProto.FLOAT
+                or int(np.prod(tensor.dims)) < MIN_FP16_ELEMENTS
+                or not ops or ops & set(fp32_ops)):
+            if tensor.data_type == onnx.TensorProto.FLOAT:
+                kept += 1
+            initializers.append(tensor)
+            continue
+
+        values = numpy_helper.to_array(tensor)
+        clipped += int((np.abs(values) > FP16_MAX).sum())
+        half = np.clip(values, -FP16_MAX, FP16_MAX).astype(np.float16)
+        initializers.append(numpy_helper.from_array(half, f"{tensor.name}_fp16"))
+        cast_nodes.append(helper.make_node(
+            'Cast', [f"{tensor.name}_fp16"], [tensor.name],
+            name=f"{tensor.name}_cast", to=onnx.TensorProto.FLOAT,
+        ))
+        converted += 1
+
+    del graph.initializer[:]
+    graph.initializer.extend(initializers)
+    # Cast'ler graph basina (topolojik sira)
+    nodes = cast_nodes + list(graph.node)
+    del graph.node[:]
+    graph.node.extend(nodes)
+
+    if clipped:
+        print(f"   [UYARI] {clipped} agirlik FP16 araligini asti, kirpildi")
+    return {'converted': converted, 'kept_fp32': kept}
+
+def measure_load_time(onnx_path, repeats=3):
+    """Session olusturma suresi (en iyi deneme, saniye)"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        create_session(onnx_path)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def report_fp16(fp32_path, fp16_path, pixel_values, reference_logits=None, runs=30):
+    """
+    FP32 ve FP16 modelleri karsilastir
+
+    Args:
+        pixel_values: (N, 3, 224, 224) float32 ornekler
+        reference_logits: Referans (PyTorch) logit'leri; yoksa FP32 ONNX ciktisi kullanilir
+
+    Returns:
+        dict: boyut (MB), yukleme (s), parite ve gecikme (ms)
+    """
+    fp32_path, fp16_path = Path(fp32_path), Path(fp16_path)
+    if reference_logits is None:
+        reference_logits = run_onnx(create_session(fp32_path), pixel_values)
+
+    report = {}
+    for label, path in (('fp32', fp32_path), ('fp16', fp16_path)):
+        report[label] = {
+            'size_mb': path.stat().st_size / (1024 * 1024),
+            'load_s': measure_load_time(path),
+            'latency': benchmark_latency(path, runs=runs),
+        }
+    report['parity'] = check_top1_parity(reference_logits, fp16_path, pixel_values, label='FP16 ONNX')
+
+    fp32, fp16 = report['fp32'], report['fp16']
+    print(f"   {'':<6} {'Boyut MB':>10} {'Yukleme s':>10} {'Gecikme ms':>11}")
+    for label in ('fp32', 'fp16'):
+        row = report[label]
+        print(f"   {label:<6} {row['size_mb']:>10.1f} {row['load_s']:>10.2f} {row['latency']['mean_ms']:>11.2f}")
+    print(f"   Boyut orani: {fp16['size_mb'] / fp32['size_mb']:.2f}x, "
+          f"yukleme: {fp16['load_s'] / fp32['load_s']:.2f}x")
+    return report
+
+def main():
+    """Komut satirindan mevcut bir ONNX modelini FP16'ya cevir"""
+    parser = argparse.ArgumentParser(description="ViT ONNX FP16 donusumu")
+    parser.add_argument('input', help="FP32 ONNX modeli")
+    parser.add_argument('--output', help="Cikti yolu (varsayilan: <input>_fp16.onnx)")
+    parser.add_argument('--mode', choices=['storage', 'compute'], default='storage',
+                        help="storage: FP16 agirlik + FP32 hesap, compute: FP16 hesap (GPU/ARM)")
+    parser.add_argument('--samples', type=int, default=8, help="Parite icin random ornek sayisi")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_path = Path(args.output) if args.output else input_path.with_name(f"{input_path.stem}_fp16.onnx")
+
+    convert_to_fp16(input_path, output_path, mode=args.mode)
+    pixel_values = np.random.randn(args.samples, 3, 224, 224).astype(np.float32)
+    report_fp16(input_path, output_path, pixel_values)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ ViT Classification Inference
 Eğitilmiş model ile ilaç tanıma
 """
 
+import sys
 import yaml
 from pathlib import Path
 import torch
@@ -10,6 +11,11 @@ from transformers import ViTForImageClassification, ViTImageProcessor
 from PIL import Image
 import numpy as np
 
+from checkpoints import resolve_checkpoint, checkpoint_weight_files
+
+# Ortak yardımcılar (profiling, CPU optimizasyonu) ilacverisi/src altında
+SHARED_SRC = Path(__file__).resolve().parent.parent / 'ilacverisi' / 'src'
+
 # CUDA ayarları
 if torch.cuda.is_available():
     device = torch.device("cuda")
@@ -18,18 +24,44 @@ else:
     device = torch.device("cpu")
     print("[WARN] CPU kullaniliyor")
 
+def _merge_config(config, overrides):
+    """overrides sözlüğünü config'e iç içe birleştir"""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            _merge_config(config[key], value)
+        else:
+            config[key] = value
+
 class PillClassifier:
     """İlaç sınıflandırıcı"""
     
-    def __init__(self, config_path='config.yaml'):
-        """Modeli yükle"""
+    def __init__(self, config_path='config.yaml', overrides=None, components=None):
+        """
+        Modeli yükle
+        overrides: Config üzerine yazılacak ayarlar (ör. müşteriye özel checkpoint)
+        components: Paylaşılan bileşen önbelleği (model_registry.ComponentCache)
+        """
         self.config = self._load_config(config_path)
+        if overrides:
+            _merge_config(self.config, overrides)
+        self.components = components
+        self.shared_components = []
         self.model = None
+        self.forward = None
         self.processor = None
         self.class_names = None
+        self.early_exit_threshold = None
         
         self._load_model()
     
+    def _shared(self, kind, key, loader):
+        """Bileşeni paylaşılan önbellekten al (önbellek yoksa doğrudan yükle)"""
+        if self.components is None:
+            return loader()
+        component, key = self.components.acquire(kind, key, loader)
+        self.shared_components.append((kind, key))
+        return component
+    
     def _load_config(self, config_path):
         """Config dosyasını yükle"""
         with open(config_path, 'r', encoding='utf-8') as f:
@@ -42,33 +74,66 @@ class PillClassifier:
             data = yaml.safe_load(f)
             return data['names']
     
+    def checkpoint_files(self):
+        """
+        Yüklenecek checkpoint'in ağırlık dosyaları (hot_reload bunları izler)
+        Seçim kuralı her çağrıda yeniden uygulanır; yeni checkpoint-* klasörü de yakalanır.
+        """
+        models_dir = Path(self.config['models']['classification'])
+        return checkpoint_weight_files(resolve_checkpoint(models_dir, self.config['models'].get('checkpoint')))
+    
     def _load_model(self):
         """Modeli yükle"""
         models_dir = Path(self.config['models']['classification'])
         
-        # En son checkpoint'i bul
-        checkpoints = sorted(
-            [d for d in models_dir.iterdir() 
-             if d.is_dir() and d.name.startswith('checkpoint-')],
-            key=lambda x: x.stat().st_mtime,
-            reverse=True
-        )
-        
-        if not checkpoints:
-            raise FileNotFoundError(f"Checkpoint bulunamadı: {models_dir}")
-        
-        model_path = checkpoints[0]
+        # En son checkpoint'i bul (convert_to_onnx / test_model ile ayni kural)
+        model_path = resolve_checkpoint(models_dir, self.config['models'].get('checkpoint'))
         print(f"Model yükleniyor: {model_path.name}")
         
-        self.model = ViTForImageClassification.from_pretrained(str(model_path))
+        if str(SHARED_SRC) not in sys.path:
+            sys.path.append(str(SHARED_SRC))
+        early_exit = self.config['classification'].get('early_exit') or {}
+        if early_exit.get('enabled'):
+            # Checkpoint early-exit head'leri ile eğitilmiş olmalı (config.early_exit_layers)
+            from early_exit import ViTEarlyExitForImageClassification
+            self.model = ViTEarlyExitForImageClassification.from_pretrained(str(model_path))
+            if not self.model.exit_layers:
+                raise ValueError(f"Checkpoint'te early-exit head'i yok: {model_path}")
+            self.early_exit_threshold = early_exit.get('threshold', 0.9)
+            print(f"[OK] Early-exit: katman {self.model.exit_layers}, esik {self.early_exit_threshold}")
+        else:
+            self.model = ViTForImageClassification.from_pretrained(str(model_path))
         
         # Processor'ı orijinal modelden yükle
         model_name = self.config['classification']['model_name']
-        self.processor = ViTImageProcessor.from_pretrained(model_name)
+        self.processor = self._shared('processor', None, lambda: ViTImageProcessor.from_pretrained(model_name))
         
         self.model.to(device)
         self.model.eval()
         
+        # CPU'da opsiyonel dinamik INT8 / trace (GPU'da model olduğu gibi kullanılır)
+        cpu_config = self.config['classification'].get('cpu_optimization') or {}
+        if device.type != 'cpu':
+            cpu_config = {}
+        merge_ratio = self.config['classification'].get('token_merging_ratio', 0.0)
+        if self.early_exit_threshold is not None:
+            # Katman katman çalıştırma trace/compile edilemez, token merging kullanılmaz
+            cpu_config = {k: v for k, v in cpu_config.items() if k != 'compile'}
+            merge_ratio = 0.0
+        from cpu_optimization import prepare_classifier
+        self.model, self.forward = prepare_classifier(
+            self.model,
+            quantize=cpu_config.get('quantize', False),
+            channels_last=cpu_config.get('channels_last', False),
+            compile_mode=cpu_config.get('compile'),
+            image_size=self.config['classification']['image_size'],
+            threads=cpu_config.get('threads'),
+            merge_ratio=merge_ratio,
+        )
+        if cpu_config.get('quantize') or cpu_config.get('compile'):
+            print(f"[OK] CPU optimizasyonu (INT8: {bool(cpu_config.get('quantize'))}, "
+                  f"compile: {cpu_config.get('compile')})")
+        
         # Sınıf isimlerini yükle
         self.class_names = self._load_class_names()
         
@@ -86,7 +151,8 @@ class PillClassifier:
             dict: {
                 'class_name': str,
                 'confidence': float,
-                'top_k': list of (class_name, confidence)
+                'top_k': list of (class_name, confidence),
+                'exit_layer': int (early-exit açıksa, çıkılan encoder katmanı)
             }
         """
         # Görüntüyü yükle
@@ -100,10 +166,16 @@ class PillClassifier:
         inputs = {k: v.to(device) for k, v in inputs.items()}
         
         # Inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
+        exit_layer = None
+        with torch.inference_mode():
+            if self.early_exit_threshold is not None:
+                from early_exit import predict_early_exit
+                probs, exit_layers = predict_early_exit(self.model, inputs['pixel_values'],
+                                                        threshold=self.early_exit_threshold)
+                exit_layer = int(exit_layers[0])
+            else:
+                logits = self.forward(inputs['pixel_values'])
+                probs = torch.nn.functional.softmax(logits, dim=-1)
         
         # En yüksek olasılıklı sınıfı bul
         predicted_idx = probs.argmax().item()
@@ -117,36 +189,62 @@ class PillClassifier:
             for prob, idx in zip(top_k_probs, top_k_indices)
         ]
         
-        return {
+        result = {
             'class_name': class_name,
             'confidence': confidence,
             'top_k': top_k_results,
             'all_probs': {self.class_names[i]: float(probs[0][i].item()) 
                          for i in range(len(self.class_names))}
         }
+        if exit_layer is not None:
+            result['exit_layer'] = exit_layer
+        return result
 
 def main():
     """Test için main fonksiyonu"""
-    import sys
+    import argparse
     
-    if len(sys.argv) < 2:
-        print("Kullanım: python inference.py <görüntü_yolu>")
-        return
-    
-    image_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Turkish Pill inference")
+    parser.add_argument('images', nargs='+', help="Görüntü yolu (profil modunda birden fazla verilebilir)")
+    parser.add_argument('--config', default='config.yaml', help="Config dosyası")
+    parser.add_argument('--top-k', type=int, default=5, help="Gösterilecek tahmin sayısı")
+    parser.add_argument('--profile', action='store_true', help="Tahminleri profiling altında çalıştır")
+    parser.add_argument('--runs', type=int, default=20, help="Profil alınacak tahmin sayısı")
+    parser.add_argument('--warmup', type=int, default=3, help="Profil öncesi ısınma tahmin sayısı")
+    parser.add_argument('--profile-dir', default='profiles', help="Profil çıktı klasörü")
+    args = parser.parse_args()
     
     # Classifier'ı başlat
-    classifier = PillClassifier()
+    classifier = PillClassifier(config_path=args.config)
+    
+    if args.profile:
+        # Ortak profiling yardımcıları ilacverisi/src altında
+        if str(SHARED_SRC) not in sys.path:
+            sys.path.append(str(SHARED_SRC))
+        from profiling import profile_predictions
+        profile_predictions(
+            lambda image_path: classifier.predict(image_path, top_k=args.top_k),
+            args.images,
+            runs=args.runs,
+            warmup=args.warmup,
+            output_dir=args.profile_dir,
+            prefix='pill_classifier',
+        )
+        return
+    
+    image_path = args.images[0]
     
     # Tahmin yap
-    result = classifier.predict(image_path, top_k=5)
+    result = classifier.predict(image_path, top_k=args.top_k)
     
     print("\n" + "="*60)
     print("TAHMIN SONUÇLARI")
     print("="*60)
     print(f"Sınıf: {result['class_name']}")
     print(f"Güven: {result['confidence']:.2%}")
-    print("\nTop 5 Tahmin:")
+    if 'exit_layer' in result:
+        print(f"Çıkış katmanı: {result['exit_layer']}")
+    print(f"\nTop {args.top_k} Tahmin:")
     for i, (class_name, prob) in enumerate(result['top_k'], 1):
         print(f"  {i}. {class_name}: {prob:.2%}")
 
@@ -1,25 +1,320 @@
-"""ONNX modeli tek dosyaya birleştir"""
-import onnx
-from onnx.external_data_helper import load_external_data_for_model, convert_model_to_external_data
+"""
+ONNX external data birleştirme / ayırma (akış halinde)
+
+onnx.load + load_external_data_for_model tüm ağırlıkları protobuf belleğine
+alır (model boyutunun birkaç katı). Burada ağırlıklar .onnx ile .onnx.data
+arasında parça parça kopyalanır; bellekte yalnızca graph yapısı ve tek bir
+parça tutulur.
+
+Kullanım:
+    python merge_onnx_model.py merge model.onnx model_merged.onnx
+    python merge_onnx_model.py split model.onnx model_external.onnx --alignment 4096
+    python merge_onnx_model.py check model_external.onnx
+"""
+import argparse
+import hashlib
+import mmap
 from pathlib import Path
 
-model_path = Path("models/classification/classification_150.onnx")
-output_path = Path("models/classification/classification_150_merged.onnx")
+import onnx
+from onnx.external_data_helper import ExternalDataInfo
+
+CHUNK_SIZE = 4 * 1024 * 1024
+# ORT external ağırlıkları mmap ile açabilsin diye offset hizalaması
+DEFAULT_ALIGNMENT = mmap.ALLOCATIONGRANULARITY
+# Bu boyuttan küçük tensorler graph içinde kalır
+DEFAULT_SIZE_THRESHOLD = 1024
+# Protobuf tek dosya sınırı
+MAX_PROTOBUF_BYTES = 2 ** 31 - 1
+
+# Protobuf alan numaraları (onnx.proto)
+MODEL_GRAPH = 7
+GRAPH_INITIALIZER = 5
+TENSOR_RAW_DATA = 9
+TENSOR_DATA_LOCATION = 14
+
+WIRE_VARINT, WIRE_FIXED64, WIRE_LEN, WIRE_FIXED32 = 0, 1, 2, 5
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _tag(field, wire):
+    return _encode_varint((field << 3) | wire)
+
+def _read_varint(f):
+    result = shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise EOFError("Beklenmeyen dosya sonu (bozuk protobuf)")
+        result |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return result
+        shift += 7
+
+def _iter_fields(f, start, end):
+    """
+    [start, end) aralığındaki protobuf alanlarını gez (değerleri okumadan)
+
+    Yields:
+        (alan, wire tipi, alan başlangıcı, değer başlangıcı, alan sonu, varint değeri)
+    """
+    f.seek(start)
+    while f.tell() < end:
+        field_start = f.tell()
+        key = _read_varint(f)
+        field, wire = key >> 3, key & 0x7
+        value = None
+        if wire == WIRE_VARINT:
+            value = _read_varint(f)
+            value_start = field_end = f.tell()
+        elif wire == WIRE_LEN:
+            length = _read_varint(f)
+            value_start = f.tell()
+            field_end = value_start + length
+        elif wire in (WIRE_FIXED64, WIRE_FIXED32):
+            value_start = f.tell()
+            field_end = value_start + (8 if wire == WIRE_FIXED64 else 4)
+        else:
+            raise ValueError(f"Desteklenmeyen protobuf wire tipi: {wire}")
+        yield field, wire, field_start, value_start, field_end, value
+        f.seek(field_end)
+
+def _read_range(f, start, end):
+    f.seek(start)
+    return f.read(end - start)
+
+def _copy_range(src, dst, offset, length, chunk_size=CHUNK_SIZE):
+    """src[offset:offset+length] -> dst (parça parça), sha256 döndür"""
+    digest = hashlib.sha256()
+    src.seek(offset)
+    remaining = length
+    while remaining:
+        chunk = src.read(min(chunk_size, remaining))
+        if not chunk:
+            raise EOFError(f"Veri dosyası beklenenden kısa (offset {offset}, uzunluk {length})")
+        dst.write(chunk)
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigest()
+
+def _hash_range(f, offset, length, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    f.seek(offset)
+    remaining = length
+    while remaining:
+        chunk = f.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigest()
+
+def _verify(path, records):
+    """Yazılan her tensorün sha256'sını diskten tekrar okuyarak doğrula"""
+    with open(path, 'rb') as f:
+        for name, offset, length, expected in records:
+            if _hash_range(f, offset, length) != expected:
+                raise IOError(f"Checksum uyuşmuyor: {name} ({path}, offset {offset})")
+
+def _external_initializers(model):
+    """Graph'tan external tensorleri ayır, (graph içi kalan model, external tensorler)"""
+    graph = model.graph
+    external = [t for t in graph.initializer if t.data_location == onnx.TensorProto.EXTERNAL]
+    inline = [t for t in graph.initializer if t.data_location != onnx.TensorProto.EXTERNAL]
+    del graph.initializer[:]
+    graph.initializer.extend(inline)
+    return model, external
+
+def merge_external_data(model_path, output_path, chunk_size=CHUNK_SIZE):
+    """
+    External data (.onnx.data) içeren modeli tek dosyaya kaydet
+
+    Graph yapısı normal şekilde yazılır, external her tensor ardından ayrı bir
+    graph parçası olarak eklenir (protobuf aynı alanın tekrarını birleştirir).
+    Ağırlıklar veri dosyasından çıktıya parça parça kopyalanır.
+    """
+    model_path = Path(model_path)
+    output_path = Path(output_path)
+
+    model, external = _external_initializers(onnx.load(str(model_path), load_external_data=False))
+    header = model.SerializeToString()
+
+    infos = []
+    total = len(header)
+    for tensor in external:
+        info = ExternalDataInfo(tensor)
+        data_path = model_path.parent / info.location
+        offset = info.offset or 0
+        length = info.length if info.length else data_path.stat().st_size - offset
+        infos.append((tensor, data_path, offset, length))
+        total += length + 64
+    if total > MAX_PROTOBUF_BYTES:
+        raise ValueError(f"Birleşik model 2 GB protobuf sınırını aşar ({total / 1024 ** 3:.2f} GB), external kalmalı")
+
+    records = []
+    open_files = {}
+    try:
+        with open(output_path, 'wb') as out:
+            out.write(header)
+            for tensor, data_path, offset, length in infos:
+                # Tensor başlığı: external bilgisi yerine raw_data
+                del tensor.external_data[:]
+                tensor.ClearField('data_location')
+                tensor_header = tensor.SerializeToString()
+                raw_prefix = _tag(TENSOR_RAW_DATA, WIRE_LEN) + _encode_varint(length)
+                tensor_len = len(tensor_header) + len(raw_prefix) + length
+                initializer_prefix = _tag(GRAPH_INITIALIZER, WIRE_LEN) + _encode_varint(tensor_len)
+                graph_len = len(initializer_prefix) + tensor_len
+
+                out.write(_tag(MODEL_GRAPH, WIRE_LEN) + _encode_varint(graph_len))
+                out.write(initializer_prefix + tensor_header + raw_prefix)
+
+                if data_path not in open_files:
+                    open_files[data_path] = open(data_path, 'rb')
+                payload_offset = out.tell()
+                checksum = _copy_range(open_files[data_path], out, offset, length, chunk_size)
+                records.append((tensor.name, payload_offset, length, checksum))
+    finally:
+        for f in open_files.values():
+            f.close()
+
+    _verify(output_path, records)
+    print(f"[OK] {len(records)} external tensor birleştirildi, checksum doğrulandı")
+    return output_path
+
+def split_external_data(model_path, output_path, location=None, alignment=DEFAULT_ALIGNMENT,
+                        size_threshold=DEFAULT_SIZE_THRESHOLD, chunk_size=CHUNK_SIZE):
+    """
+    Tek dosyalık modeli .onnx + .onnx.data olarak ayır
+
+    Kaynak dosya protobuf seviyesinde taranır; raw_data içerikleri belleğe
+    alınmadan, her biri `alignment` katı offset'e hizalanarak veri dosyasına kopyalanır.
+    """
+    model_path = Path(model_path)
+    output_path = Path(output_path)
+    location = location or output_path.name + '.data'
+    data_path = output_path.parent / location
+    if alignment <= 0:
+        raise ValueError("alignment pozitif olmalı")
+
+    records = []
+    top_level = []  # (alan, bytes) - graph dışındaki alanlar olduğu gibi kopyalanır
+    graph_parts = []
+
+    with open(model_path, 'rb') as src, open(data_path, 'wb') as data:
+        size = src.seek(0, 2)
+        for field, wire, field_start, value_start, field_end, _ in _iter_fields(src, 0, size):
+            if field != MODEL_GRAPH or wire != WIRE_LEN:
+                top_level.append(_read_range(src, field_start, field_end))
+                continue
+            top_level.append(None)  # graph yeri
+
+            for g_field, g_wire, g_start, g_value, g_end, _ in _iter_fields(src, value_start, field_end):
+                if g_field != GRAPH_INITIALIZER or g_wire != WIRE_LEN:
+                    graph_parts.append(_read_range(src, g_start, g_end))
+                    continue
+
+                header = bytearray()
+                raw = None
+                for t_field, t_wire, t_start, t_value, t_end, t_varint in _iter_fields(src, g_value, g_end):
+                    if t_field == TENSOR_RAW_DATA and t_wire == WIRE_LEN:
+                        raw = (t_value, t_end - t_value)
+                    elif t_field == TENSOR_DATA_LOCATION and t_varint == onnx.TensorProto.EXTERNAL:
+                        raise ValueError(f"{model_path} zaten external data kullanıyor, önce merge edin")
+                    else:
+                        header += _read_range(src, t_start, t_end)
+
+                if raw is None or raw[1] < size_threshold:
+                    graph_parts.append(_read_range(src, g_start, g_end))
+                    continue
+
+                tensor = onnx.TensorProto()
+                tensor.ParseFromString(bytes(header))
+                position = data.tell()
+                offset = position + (-position % alignment)
+                data.write(b'\0' * (offset - position))
+                checksum = _copy_range(src, data, raw[0], raw[1], chunk_size)
+                records.append((tensor.name, offset, raw[1], checksum))
+
+                tensor.data_location = onnx.TensorProto.EXTERNAL
+                for key, value in (('location', location), ('offset', str(offset)), ('length', str(raw[1]))):
+                    entry = tensor.external_data.add()
+                    entry.key, entry.value = key, value
+                tensor_bytes = tensor.SerializeToString()
+                graph_parts.append(_tag(GRAPH_INITIALIZER, WIRE_LEN) + _encode_varint(len(tensor_bytes)) + tensor_bytes)
+
+    graph_bytes = b''.join(graph_parts)
+    with open(output_path, 'wb') as out:
+        for part in top_level:
+            if part is None:
+                out.write(_tag(MODEL_GRAPH, WIRE_LEN) + _encode_varint(len(graph_bytes)) + graph_bytes)
+            else:
+                out.write(part)
+
+    _verify(data_path, records)
+    print(f"[OK] {len(records)} tensor {data_path.name} dosyasına ayrıldı "
+          f"(hizalama {alignment} B), checksum doğrulandı")
+    return output_path
+
+def check_alignment(model_path, alignment=DEFAULT_ALIGNMENT):
+    """Offset'i hizalanmamış (mmap ile açılamayacak) external tensorleri listele"""
+    model = onnx.load(str(model_path), load_external_data=False)
+    misaligned = []
+    for tensor in model.graph.initializer:
+        if tensor.data_location == onnx.TensorProto.EXTERNAL:
+            offset = ExternalDataInfo(tensor).offset or 0
+            if offset % alignment:
+                misaligned.append((tensor.name, offset))
+    return misaligned
 
-print("Model birleştiriliyor...")
+def main():
+    """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="ONNX external data birleştir / ayır")
+    parser.add_argument('command', nargs='?', choices=['merge', 'split', 'check'], default='merge')
+    parser.add_argument('input', nargs='?', default="models/classification/classification_150.onnx")
+    parser.add_argument('output', nargs='?', help="Çıktı yolu")
+    parser.add_argument('--alignment', type=int, default=DEFAULT_ALIGNMENT,
+                        help=f"External veri offset hizalaması (varsayılan: {DEFAULT_ALIGNMENT})")
+    parser.add_argument('--size-threshold', type=int, default=DEFAULT_SIZE_THRESHOLD,
+                        help="Bu boyuttan küçük tensorler graph içinde kalır")
+    args = parser.parse_args()
 
-# Model yükle
-model = onnx.load(str(model_path))
+    model_path = Path(args.input)
 
-# External data'yı yükle
-if Path("models/classification/classification_150.onnx.data").exists():
-    load_external_data_for_model(model, "models/classification")
-    print("[OK] External data yüklendi")
+    if args.command == 'check':
+        misaligned = check_alignment(model_path, args.alignment)
+        if misaligned:
+            print(f"[UYARI] {len(misaligned)} tensor {args.alignment} B hizalı değil:")
+            for name, offset in misaligned[:20]:
+                print(f"   {name}: offset {offset}")
+        else:
+            print(f"[OK] Tüm external tensorler {args.alignment} B hizalı")
+        return
 
-# Modeli tek dosyaya kaydet (external data olmadan)
-onnx.save_model(model, str(output_path), save_as_external_data=False)
+    if args.command == 'merge':
+        output_path = Path(args.output or model_path.with_name(model_path.stem + '_merged.onnx'))
+        print("Model birleştiriliyor...")
+        merge_external_data(model_path, output_path)
+        size_mb = output_path.stat().st_size / (1024 * 1024)
+    else:
+        output_path = Path(args.output or model_path.with_name(model_path.stem + '_external.onnx'))
+        print("Model ayrılıyor...")
+        split_external_data(model_path, output_path, alignment=args.alignment,
+                            size_threshold=args.size_threshold)
+        data_path = output_path.with_name(output_path.name + '.data')
+        size_mb = (output_path.stat().st_size + data_path.stat().st_size) / (1024 * 1024)
 
-size_mb = output_path.stat().st_size / (1024 * 1024)
-print(f"[OK] Birleşik model kaydedildi: {output_path}")
-print(f"     Boyut: {size_mb:.2f} MB")
+    print(f"[OK] Model kaydedildi: {output_path}")
+    print(f"     Boyut: {size_mb:.2f} MB")
 
+if __name__ == "__main__":
+    main()
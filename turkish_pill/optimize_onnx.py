@@ -0,0 +1,148 @@
+"""
+ONNX Graph Optimizasyonu (ViT)
+Export edilmis ViT modeline ONNX Runtime transformer fusion'larini uygular
+(Attention, LayerNorm, GELU, BiasAdd) ve offline-optimize modeli kaydeder.
+
+Ozellikler:
+- Fusion istatistikleri
+- PyTorch ile top-1 uyum kontrolu
+- Fused / unfused gecikme karsilastirmasi
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ort_session import create_session
+
+# Windows konsol encoding sorununu coz
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+def optimize_vit_onnx(input_path, output_path, num_heads=12, hidden_size=768, opt_level=1,
+                      use_gpu=False, use_external_data=False):
+    """
+    Transformer fusion'larini uygula ve optimize modeli kaydet
+
+    Args:
+        input_path: Export edilmis (unfused) ONNX modeli
+        output_path: Optimize model yolu
+        num_heads / hidden_size: ViT-Base icin 12 / 768
+        opt_level: 0 = sadece fusion, 1 = + ORT basic, 2 = + ORT extended (CPU'ya ozel), 99 = hepsi
+        use_gpu: GPU'ya ozel fusion'lar
+        use_external_data: >2GB modeller icin agirliklari .data dosyasina yaz
+
+    Returns:
+        dict: Fusion istatistikleri (operator -> adet)
+    """
+    from onnxruntime.transformers.optimizer import optimize_model
+
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+    print(f"   Transformer fusion uygulaniyor: {input_path.name}")
+
+    optimizer = optimize_model(
+        str(input_path),
+        model_type='vit',
+        num_heads=num_heads,
+        hidden_size=hidden_size,
+        opt_level=opt_level,
+        use_gpu=use_gpu,
+    )
+    fusion_stats = optimizer.get_fused_operator_statistics()
+    optimizer.save_model_to_file(str(output_path), use_external_data_format=use_external_data)
+
+    for op_type, count in fusion_stats.items():
+        if count:
+            print(f"   - {op_type}: {count}")
+    if not fusion_stats.get('Attention') and not fusion_stats.get('MultiHeadAttention'):
+        print("   [UYARI] Attention fusion uygulanamadi (opset/graph yapisini kontrol edin)")
+
+    size_mb = output_path.stat().st_size / (1024 * 1024)
+    print(f"   [OK] Optimize model kaydedildi: {output_path} ({size_mb:.2f} MB)")
+    return fusion_stats
+
+def run_onnx(session, pixel_values):
+    """pixel_values (N, 3, 224, 224) float32 -> logits"""
+    input_name = session.get_inputs()[0].name
+    return session.run(None, {input_name: pixel_values.astype(np.float32)})[0]
+
+def check_top1_parity(reference_logits, onnx_path, pixel_values, label='ONNX'):
+    """
+    Referans (PyTorch) logit'leri ile ONNX modelinin top-1 uyumunu kontrol et
+
+    Returns:
+        dict: {'top1_agreement': float, 'max_abs_diff': float}
+    """
+    session = create_session(onnx_path)
+    onnx_logits = run_onnx(session, pixel_values)
+
+    agreement = float((reference_logits.argmax(axis=1) == onnx_logits.argmax(axis=1)).mean())
+    max_diff = float(np.abs(reference_logits - onnx_logits).max())
+    status = '[OK]' if agreement == 1.0 else '[UYARI]'
+    print(f"   {status} {label}: top-1 uyum {agreement:.2%}, max logit farki {max_diff:.6f}")
+    return {'top1_agreement': agreement, 'max_abs_diff': max_diff}
+
+def benchmark_latency(onnx_path, batch_size=1, runs=50, warmup=5, image_size=224):
+    """
+    Ortalama ve p90 gecikmesini olc (ms)
+
+    Returns:
+        dict: {'mean_ms': float, 'p90_ms': float}
+    """
+    session = create_session(onnx_path)
+    pixel_values = np.random.randn(batch_size, 3, image_size, image_size).astype(np.float32)
+
+    for _ in range(warmup):
+        run_onnx(session, pixel_values)
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_onnx(session, pixel_values)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return {'mean_ms': float(np.mean(times)), 'p90_ms': float(np.percentile(times, 90))}
+
+def compare_latency(unfused_path, fused_path, batch_size=1, runs=50):
+    """Fused ve unfused modellerin gecikmesini karsilastir"""
+    print(f"   Gecikme olculuyor (batch={batch_size}, {runs} tekrar)...")
+    unfused = benchmark_latency(unfused_path, batch_size=batch_size, runs=runs)
+    fused = benchmark_latency(fused_path, batch_size=batch_size, runs=runs)
+    speedup = unfused['mean_ms'] / fused['mean_ms'] if fused['mean_ms'] > 0 else 0.0
+
+    print(f"   - Unfused: {unfused['mean_ms']:.2f} ms (p90 {unfused['p90_ms']:.2f} ms)")
+    print(f"   - Fused:   {fused['mean_ms']:.2f} ms (p90 {fused['p90_ms']:.2f} ms)")
+    print(f"   - Hizlanma: {speedup:.2f}x")
+    return {'unfused': unfused, 'fused': fused, 'speedup': speedup}
+
+def main():
+    """Komut satirindan mevcut bir ONNX modelini optimize et"""
+    parser = argparse.ArgumentParser(description="ViT ONNX transformer fusion optimizasyonu")
+    parser.add_argument('input', help="Export edilmis ONNX modeli")
+    parser.add_argument('--output', help="Cikti yolu (varsayilan: <input>_optimized.onnx)")
+    parser.add_argument('--num-heads', type=int, default=12)
+    parser.add_argument('--hidden-size', type=int, default=768)
+    parser.add_argument('--opt-level', type=int, default=1)
+    parser.add_argument('--runs', type=int, default=50, help="Gecikme olcumu tekrar sayisi")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_path = Path(args.output) if args.output else input_path.with_name(f"{input_path.stem}_optimized.onnx")
+
+    optimize_vit_onnx(input_path, output_path, num_heads=args.num_heads,
+                      hidden_size=args.hidden_size, opt_level=args.opt_level)
+
+    # PyTorch modeli yoksa unfused ONNX referans alinir
+    pixel_values = np.random.randn(8, 3, 224, 224).astype(np.float32)
+    reference_logits = run_onnx(create_session(input_path), pixel_values)
+    check_top1_parity(reference_logits, output_path, pixel_values, label='Fused ONNX')
+    compare_latency(input_path, output_path, runs=args.runs)
+
+if __name__ == "__main__":
+    main()
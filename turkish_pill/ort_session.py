@@ -0,0 +1,108 @@
+"""
+ONNX Runtime Session Yardimcilari
+Autotune profilini (varsa) okuyup SessionOptions ile session olusturur.
+
+Profil dosyasi modelin yaninda tutulur: <model>.ort_profile.json
+Her makine tipi (cekirdek sayisi) ve worker sayisi icin ayri ayar saklanir.
+ORT_INTRA_OP_THREADS ortam degiskeni (orn. CPU setine pinlenmis worker) intra-op
+thread sayisina ust sinir koyar.
+"""
+
+import json
+import os
+import platform
+from pathlib import Path
+
+import onnxruntime as ort
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL,
+}
+
+OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+def profile_path(onnx_path):
+    """Modelin autotune profil dosyasi"""
+    onnx_path = Path(onnx_path)
+    return onnx_path.with_name(f"{onnx_path.stem}.ort_profile.json")
+
+def host_key(workers=1):
+    """Profil anahtari: islemci + cekirdek sayisi + ayni hosttaki worker sayisi"""
+    return f"{platform.machine()}-{os.cpu_count()}cpu-{workers}w"
+
+def default_workers():
+    """Ayni hostta calisan worker sayisi (ORT_WORKERS ortam degiskeni)"""
+    return int(os.environ.get('ORT_WORKERS', '1'))
+
+def intra_op_limit():
+    """Process'e ayrilan cekirdek sayisi (ORT_INTRA_OP_THREADS), yoksa None"""
+    value = os.environ.get('ORT_INTRA_OP_THREADS')
+    return int(value) if value else None
+
+def build_session_options(settings):
+    """Ayar sozlugunden SessionOptions olustur"""
+    options = ort.SessionOptions()
+    if settings.get('intra_op_num_threads') is not None:
+        options.intra_op_num_threads = settings['intra_op_num_threads']
+    if settings.get('inter_op_num_threads') is not None:
+        options.inter_op_num_threads = settings['inter_op_num_threads']
+    if settings.get('execution_mode'):
+        options.execution_mode = EXECUTION_MODES[settings['execution_mode']]
+    if settings.get('graph_optimization_level'):
+        options.graph_optimization_level = OPTIMIZATION_LEVELS[settings['graph_optimization_level']]
+    if settings.get('enable_cpu_mem_arena') is not None:
+        options.enable_cpu_mem_arena = settings['enable_cpu_mem_arena']
+    return options
+
+def load_profile(onnx_path, workers=None):
+    """
+    Bu makine icin kayitli en iyi ayarlari dondur
+    Returns: dict veya None (profil yoksa / bu makine icin ayar yoksa)
+    """
+    path = profile_path(onnx_path)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    return profiles.get(host_key(workers or default_workers()))
+
+def save_profile(onnx_path, settings, workers=1):
+    """En iyi ayarlari bu makinenin anahtari ile profile yaz (diger hostlar korunur)"""
+    path = profile_path(onnx_path)
+    profiles = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+    profiles[host_key(workers)] = settings
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2)
+    return path
+
+def create_session(onnx_path, providers=None, workers=None, settings=None):
+    """
+    Inference session olustur
+    settings verilmezse autotune profili kullanilir, o da yoksa ORT varsayilanlari
+    (birden fazla worker varsa cekirdekler worker'lar arasinda bolunur)
+    """
+    workers = workers or default_workers()
+    if settings is None:
+        settings = load_profile(onnx_path, workers)
+    if settings is None:
+        # Profil yoksa cekirdekleri worker'lar arasinda bol (thread oversubscription'i onler)
+        settings = {'intra_op_num_threads': max(1, (os.cpu_count() or 1) // workers)} if workers > 1 else {}
+    limit = intra_op_limit()
+    if limit:
+        # Pinlenmis worker'da session tum cekirdekleri kullanmasin
+        settings = dict(settings, intra_op_num_threads=min(settings.get('intra_op_num_threads') or limit, limit))
+    options = build_session_options(settings)
+    return ort.InferenceSession(
+        str(onnx_path),
+        sess_options=options,
+        providers=providers or ['CPUExecutionProvider'],
+    )
@@ -0,0 +1,293 @@
+"""
+ViT Yapisal Budama (Attention Head + MLP Kanal)
+1. Train seti uzerinde head ve MLP kanal onemlerini olc (birinci derece Taylor)
+2. En onemsiz head/kanallari fiziksel olarak sil (hedef FLOPs oranina kadar)
+3. WeightedTrainer ile kisa recovery fine-tune
+4. Kucuk (dense) modeli ONNX'e export et
+
+Budanmis model standart HF formatinda kaydedilir: silinen head'ler
+config.pruned_heads, yeni MLP genisligi config.intermediate_size icinde.
+Bu yuzden ViTForImageClassification.from_pretrained ile (inference, test,
+ONNX donusturme) ek kod olmadan yuklenir. MLP genisligi tum katmanlarda
+aynidir; her katman kendi en onemli kanallarini tutar.
+
+Kullanim:
+    python prune_vit.py --target-flops 0.6 --epochs 2
+"""
+
+import argparse
+import io
+import json
+import sys
+from pathlib import Path
+
+import torch
+import yaml
+from transformers import ViTForImageClassification, ViTImageProcessor
+from transformers.pytorch_utils import prune_linear_layer
+
+from checkpoints import resolve_checkpoint
+
+# Windows konsol encoding sorununu coz
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# MLP genisligi bu katin kati olarak tutulur (GEMM verimi)
+MLP_WIDTH_MULTIPLE = 32
+
+def load_config():
+    """Config dosyasini yukle"""
+    config_path = Path(__file__).parent / 'config.yaml'
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+def num_tokens(model_config):
+    return (model_config.image_size // model_config.patch_size) ** 2 + 1
+
+def encoder_flops(model_config, heads_per_layer, mlp_width):
+    """
+    Encoder MAC sayisi (patch embedding ve classifier haric)
+
+    Args:
+        heads_per_layer: Katman basina kalan head sayisi
+        mlp_width: MLP ara katman genisligi
+    """
+    n = num_tokens(model_config)
+    d = model_config.hidden_size
+    head_dim = d // model_config.num_attention_heads
+    total = 0
+    for heads in heads_per_layer:
+        inner = heads * head_dim
+        total += n * 4 * d * inner          # Q, K, V, cikis projeksiyonu
+        total += 2 * n * n * inner          # QK^T ve attention * V
+        total += n * 2 * d * mlp_width      # MLP (iki Linear)
+    return total
+
+def score_importance(model, dataloader, device, max_batches=50):
+    """
+    Head ve MLP kanal onemleri (|dL/d mask| ve |sum(aktivasyon * gradyan)|)
+
+    Returns:
+        (head_scores [L, H], mlp_scores [L, intermediate_size])
+    """
+    model.to(device)
+    model.eval()
+    config = model.config
+    layers = model.vit.encoder.layer
+
+    head_mask = torch.ones(config.num_hidden_layers, config.num_attention_heads,
+                           device=device, requires_grad=True)
+    head_scores = torch.zeros(config.num_hidden_layers, config.num_attention_heads, device=device)
+    mlp_scores = torch.zeros(config.num_hidden_layers, config.intermediate_size, device=device)
+
+    def make_hook(layer_idx):
+        def hook(module, inputs, output):
+            def accumulate(grad):
+                contribution = (output.detach() * grad).sum(dim=1).abs().sum(dim=0)
+                mlp_scores[layer_idx] += contribution
+            output.register_hook(accumulate)
+        return hook
+
+    handles = [layer.intermediate.register_forward_hook(make_hook(i)) for i, layer in enumerate(layers)]
+    try:
+        for step, batch in enumerate(dataloader):
+            if step >= max_batches:
+                break
+            pixel_values = batch['pixel_values'].to(device)
+            labels = batch['labels'].to(device)
+            loss = model(pixel_values=pixel_values, labels=labels, head_mask=head_mask).loss
+            loss.backward()
+            head_scores += head_mask.grad.abs()
+            head_mask.grad = None
+            model.zero_grad(set_to_none=True)
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    # Katmanlar arasi karsilastirilabilir olsun diye katman icinde L2 normalizasyon
+    head_scores = head_scores / head_scores.norm(dim=1, keepdim=True).clamp(min=1e-12)
+    return head_scores.cpu(), mlp_scores.cpu()
+
+def plan_pruning(model_config, head_scores, mlp_scores, target_flops):
+    """
+    Hedef FLOPs oranina ulasan budama plani
+
+    Head'ler global siralamayla (her katmanda en az 1 head kalir), MLP kanallari
+    katman icinde siralanarak ayni oranda budanir; oran ikili arama ile bulunur.
+
+    Returns:
+        dict: heads_to_prune {katman: [head]}, mlp_keep {katman: [kanal]}, mlp_width, flops_ratio
+    """
+    num_layers, num_heads = head_scores.shape
+    full_width = model_config.intermediate_size
+    full = encoder_flops(model_config, [num_heads] * num_layers, full_width)
+
+    order = sorted(((head_scores[l, h].item(), l, h) for l in range(num_layers) for h in range(num_heads)))
+
+    def build(fraction):
+        remaining = [num_heads] * num_layers
+        heads_to_prune = {}
+        budget = int(round(fraction * num_layers * num_heads))
+        for _, layer, head in order:
+            if budget <= 0:
+                break
+            if remaining[layer] > 1:
+                heads_to_prune.setdefault(layer, []).append(head)
+                remaining[layer] -= 1
+                budget -= 1
+        width = int(round(full_width * (1 - fraction) / MLP_WIDTH_MULTIPLE)) * MLP_WIDTH_MULTIPLE
+        width = max(MLP_WIDTH_MULTIPLE, width)
+        return heads_to_prune, width, encoder_flops(model_config, remaining, width) / full
+
+    low, high = 0.0, 1.0
+    for _ in range(30):
+        mid = (low + high) / 2
+        if build(mid)[2] > target_flops:
+            low = mid
+        else:
+            high = mid
+    heads_to_prune, width, ratio = build(high)
+
+    mlp_keep = {
+        layer: sorted(mlp_scores[layer].argsort(descending=True)[:width].tolist())
+        for layer in range(num_layers)
+    }
+    return {'heads_to_prune': heads_to_prune, 'mlp_keep': mlp_keep, 'mlp_width': width, 'flops_ratio': ratio}
+
+def apply_pruning(model, plan):
+    """Plani modele fiziksel olarak uygula (agirlik matrisleri kuculur)"""
+    if plan['heads_to_prune']:
+        # config.pruned_heads de guncellenir
+        model.prune_heads(plan['heads_to_prune'])
+
+    for layer_idx, layer in enumerate(model.vit.encoder.layer):
+        keep = torch.tensor(plan['mlp_keep'][layer_idx], dtype=torch.long)
+        layer.intermediate.dense = prune_linear_layer(layer.intermediate.dense, keep, dim=0)
+        layer.output.dense = prune_linear_layer(layer.output.dense, keep, dim=1)
+    model.config.intermediate_size = plan['mlp_width']
+    return model
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
+
+def main():
+    """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="ViT yapisal budama + recovery fine-tune + ONNX export")
+    parser.add_argument('--checkpoint', help="Budanacak checkpoint (varsayilan: config / en son)")
+    parser.add_argument('--target-flops', type=float, default=0.6, help="Encoder FLOPs hedefi (orijinale oran)")
+    parser.add_argument('--score-batches', type=int, default=50, help="Onem olcumu icin train batch sayisi")
+    parser.add_argument('--epochs', type=float, default=2, help="Recovery fine-tune epoch sayisi")
+    parser.add_argument('--output-dir', default='models/classification_pruned')
+    parser.add_argument('--skip-export', action='store_true', help="ONNX export adimini atla")
+    args = parser.parse_args()
+
+    # Egitim yardimcilari (CUDA ayarlari import sirasinda yapilir)
+    from torch.utils.data import DataLoader
+    from transformers import TrainingArguments
+    from train_vit import (
+        MedicineDataset, WeightedTrainer, compute_class_weights, compute_metrics, load_class_names, device,
+    )
+
+    config = load_config()
+    data_path = Path(config['data']['dataset_path'])
+    class_names = load_class_names(data_path / 'data.yaml')
+    models_dir = Path(config['models']['classification'])
+    checkpoint = resolve_checkpoint(models_dir, args.checkpoint or config['models'].get('checkpoint'))
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 70)
+    print(f"ViT Yapisal Budama (hedef FLOPs: {args.target_flops:.0%})")
+    print("=" * 70)
+
+    # head_mask gradyani icin eager attention
+    model = ViTForImageClassification.from_pretrained(str(checkpoint), attn_implementation='eager')
+    processor = ViTImageProcessor.from_pretrained(config['classification']['model_name'])
+    original_params = count_parameters(model)
+
+    train_dataset = MedicineDataset(data_path, split='train', processor=processor, class_names=class_names,
+                                    augment=False)
+    valid_dataset = MedicineDataset(data_path, split='valid', processor=processor, class_names=class_names)
+
+    print(f"\n[1/4] Onem skorlari hesaplaniyor ({args.score_batches} batch)...")
+    loader = DataLoader(train_dataset, batch_size=config['classification']['batch_size'], shuffle=True)
+    head_scores, mlp_scores = score_importance(model, loader, device, max_batches=args.score_batches)
+
+    print(f"\n[2/4] Budama uygulaniyor...")
+    plan = plan_pruning(model.config, head_scores, mlp_scores, args.target_flops)
+    apply_pruning(model, plan)
+    pruned_heads = sum(len(h) for h in plan['heads_to_prune'].values())
+    print(f"   - Silinen head: {pruned_heads} / {head_scores.numel()}")
+    print(f"   - MLP genisligi: {model.config.intermediate_size}")
+    print(f"   - Encoder FLOPs: {plan['flops_ratio']:.1%}")
+    print(f"   - Parametre: {original_params / 1e6:.1f}M -> {count_parameters(model) / 1e6:.1f}M")
+
+    print(f"\n[3/4] Recovery fine-tune ({args.epochs} epoch)...")
+    class_weights = None
+    if config['classification']['use_class_weights']:
+        class_weights, _ = compute_class_weights(data_path, class_names)
+    train_dataset.augment = config['classification']['use_augmentation']
+
+    training_args = TrainingArguments(
+        output_dir=str(output_dir),
+        num_train_epochs=args.epochs,
+        per_device_train_batch_size=config['classification']['batch_size'],
+        per_device_eval_batch_size=config['classification']['batch_size'],
+        learning_rate=config['classification']['learning_rate'],
+        weight_decay=0.01,
+        logging_steps=10,
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        load_best_model_at_end=True,
+        metric_for_best_model="accuracy",
+        greater_is_better=True,
+        save_total_limit=2,
+        fp16=torch.cuda.is_available(),
+        dataloader_num_workers=0,  # Windows için 0
+        report_to="none",
+    )
+    trainer = WeightedTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        eval_dataset=valid_dataset,
+        compute_metrics=compute_metrics,
+        class_weights=class_weights,
+    )
+    before = trainer.evaluate()
+    trainer.train()
+    after = trainer.evaluate()
+    trainer.save_model()
+    processor.save_pretrained(output_dir)
+    print(f"   Valid accuracy: {before['eval_accuracy']:.4f} (budama sonrasi) -> {after['eval_accuracy']:.4f}")
+
+    summary = {
+        'source_checkpoint': str(checkpoint),
+        'target_flops': args.target_flops,
+        'flops_ratio': plan['flops_ratio'],
+        'heads_pruned': pruned_heads,
+        'mlp_width': plan['mlp_width'],
+        'params': count_parameters(model),
+        'original_params': original_params,
+        'valid_accuracy_before_recovery': before['eval_accuracy'],
+        'valid_accuracy': after['eval_accuracy'],
+    }
+    with open(output_dir / 'pruning_summary.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    if args.skip_export:
+        return
+
+    print(f"\n[4/4] ONNX export...")
+    from convert_to_onnx import convert_to_onnx, validate_onnx_model, compare_inference
+    model = model.cpu().eval()
+    onnx_path = output_dir / "classification_150_pruned.onnx"
+    if convert_to_onnx(model, processor, onnx_path) and validate_onnx_model(onnx_path):
+        compare_inference(model, processor, onnx_path)
+    print(f"\n[OK] Budanmis model: {output_dir}")
+    print(f"   Optimize / FP16 / INT8 varyantlari icin:")
+    print(f"   python build_artifacts.py --checkpoint {output_dir} --output-dir {output_dir / 'build'}")
+
+if __name__ == "__main__":
+    main()
@@ -17,9 +17,14 @@ from sklearn.metrics import (
     classification_report
 )
 from collections import Counter
+from contextlib import nullcontext
 import pandas as pd
 from tqdm import tqdm
 import json
+import sys
+import time
+
+from checkpoints import resolve_checkpoint
 
 # CUDA ayarları
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -36,17 +41,12 @@ def load_class_names(data_yaml_path):
         data = yaml.safe_load(f)
         return data['names']
 
-def find_latest_checkpoint(models_dir):
-    """En son checkpoint'i bul"""
-    checkpoints = sorted(
-        [d for d in Path(models_dir).iterdir() 
-         if d.is_dir() and d.name.startswith('checkpoint-')],
-        key=lambda x: x.stat().st_mtime,
-        reverse=True
-    )
-    if checkpoints:
-        return checkpoints[0]
-    return None
+def find_latest_checkpoint(models_dir, explicit=None):
+    """En son (en yuksek adimli) checkpoint'i bul"""
+    try:
+        return resolve_checkpoint(models_dir, explicit)
+    except FileNotFoundError:
+        return None
 
 class MedicineDataset(Dataset):
     """Test için Dataset"""
@@ -97,19 +97,24 @@ class MedicineDataset(Dataset):
             'image_path': str(image_path)
         }
 
-def test_model(model, processor, dataset, class_names, split_name):
+def test_model(model, processor, dataset, class_names, split_name, memory=None):
     """Modeli test et"""
     model.eval()
     
     all_predictions = []
     all_labels = []
-    all_probs = []
+    # Tüm olasılık vektörleri yerine sadece raporda kullanılan iki değer tutulur
+    # (150 sınıf x örnek sayısı kadar bellek birikmesini önler)
+    all_pred_conf = []
+    all_true_conf = []
     all_paths = []
     
     dataloader = DataLoader(dataset, batch_size=16, shuffle=False, num_workers=0)
     
     print(f"\n{split_name} seti test ediliyor...")
-    with torch.no_grad():
+    stage = memory.stage(split_name) if memory is not None else nullcontext()
+    start_time = time.perf_counter()
+    with stage, torch.no_grad():
         for batch in tqdm(dataloader, desc=f"Testing {split_name}"):
             pixel_values = batch['pixel_values'].to(device)
             labels = batch['labels'].to(device)
@@ -122,8 +127,10 @@ def test_model(model, processor, dataset, class_names, split_name):
             
             all_predictions.extend(predictions.cpu().numpy())
             all_labels.extend(labels.cpu().numpy())
-            all_probs.extend(probs.cpu().numpy())
+            all_pred_conf.extend(probs.gather(1, predictions.unsqueeze(1)).squeeze(1).cpu().numpy())
+            all_true_conf.extend(probs.gather(1, labels.unsqueeze(1)).squeeze(1).cpu().numpy())
             all_paths.extend(paths)
+    elapsed = time.perf_counter() - start_time
     
     # Metrikleri hesapla
     accuracy = accuracy_score(all_labels, all_predictions)
@@ -159,14 +166,15 @@ def test_model(model, processor, dataset, class_names, split_name):
     
     # Hatalı tahminler
     errors = []
-    for i, (true_label, pred_label, path, prob) in enumerate(zip(all_labels, all_predictions, all_paths, all_probs)):
+    for true_label, pred_label, path, pred_conf, true_conf in zip(
+            all_labels, all_predictions, all_paths, all_pred_conf, all_true_conf):
         if true_label != pred_label:
             errors.append({
                 'image_path': path,
                 'true_class': class_names[true_label],
                 'predicted_class': class_names[pred_label],
-                'confidence': float(prob[pred_label]),
-                'true_class_prob': float(prob[true_label])
+                'confidence': float(pred_conf),
+                'true_class_prob': float(true_conf)
             })
     
     return {
@@ -183,10 +191,12 @@ def test_model(model, processor, dataset, class_names, split_name):
         'errors': errors,
         'total_samples': len(all_labels),
         'correct_predictions': sum(1 for t, p in zip(all_labels, all_predictions) if t == p),
-        'wrong_predictions': len(errors)
+        'wrong_predictions': len(errors),
+        'seconds': elapsed,
+        'images_per_second': len(all_labels) / elapsed if elapsed > 0 else 0.0
     }
 
-def generate_report(test_results, val_results, class_names, output_file='test_report.md'):
+def generate_report(test_results, val_results, class_names, output_file='test_report.md', memory_report=None):
     """Detaylı rapor oluştur"""
     
     report = []
@@ -206,7 +216,8 @@ def generate_report(test_results, val_results, class_names, output_file='test_re
     report.append(f"- **Recall (Weighted)**: {test_results['recall_weighted']:.4f}\n")
     report.append(f"- **F1 Score (Weighted)**: {test_results['f1_weighted']:.4f}\n")
     report.append(f"- **Doğru Tahmin**: {test_results['correct_predictions']}/{test_results['total_samples']}\n")
-    report.append(f"- **Yanlış Tahmin**: {test_results['wrong_predictions']}/{test_results['total_samples']}\n\n")
+    report.append(f"- **Yanlış Tahmin**: {test_results['wrong_predictions']}/{test_results['total_samples']}\n")
+    report.append(f"- **Hız**: {test_results['images_per_second']:.1f} görüntü/s ({test_results['seconds']:.1f} s)\n\n")
     
     # Validation Seti Sonuçları
     report.append("## Validation Seti Sonuçları\n")
@@ -215,7 +226,8 @@ def generate_report(test_results, val_results, class_names, output_file='test_re
     report.append(f"- **Recall (Weighted)**: {val_results['recall_weighted']:.4f}\n")
     report.append(f"- **F1 Score (Weighted)**: {val_results['f1_weighted']:.4f}\n")
     report.append(f"- **Doğru Tahmin**: {val_results['correct_predictions']}/{val_results['total_samples']}\n")
-    report.append(f"- **Yanlış Tahmin**: {val_results['wrong_predictions']}/{val_results['total_samples']}\n\n")
+    report.append(f"- **Yanlış Tahmin**: {val_results['wrong_predictions']}/{val_results['total_samples']}\n")
+    report.append(f"- **Hız**: {val_results['images_per_second']:.1f} görüntü/s ({val_results['seconds']:.1f} s)\n\n")
     
     # Sınıf Bazında Performans (Test)
     report.append("## Sınıf Bazında Performans (Test Seti)\n")
@@ -257,6 +269,10 @@ def generate_report(test_results, val_results, class_names, output_file='test_re
         report.append("- Hatalı tahminlerin çoğu belirli sınıflarda mı? (Confusion matrix'e bakın)\n")
         report.append("- Düşük confidence'lı tahminleri filtreleyin\n")
     
+    if memory_report:
+        report.append("\n## Bellek Kullanımı\n")
+        report.append("```\n" + memory_report + "\n```\n")
+    
     report.append("="*80 + "\n")
     
     # Raporu kaydet
@@ -267,11 +283,24 @@ def generate_report(test_results, val_results, class_names, output_file='test_re
 
 def main():
     """Ana test fonksiyonu"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Model test scripti")
+    parser.add_argument('--memory', action='store_true', help="Yükleme/test aşamaları için bellek raporu")
+    args = parser.parse_args()
+    
+    memory = None
+    if args.memory:
+        # Ortak bellek ölçüm yardımcıları ilacverisi/src altında
+        sys.path.append(str(Path(__file__).resolve().parent.parent / 'ilacverisi' / 'src'))
+        from memory_tracking import MemoryTracker
+        memory = MemoryTracker()
+    
     config = load_config()
     
     # Model yolu
     models_dir = Path(config['classification']['save_dir'])
-    checkpoint = find_latest_checkpoint(models_dir)
+    checkpoint = find_latest_checkpoint(models_dir, config['models'].get('checkpoint'))
     
     if checkpoint is None:
         print("HATA: Checkpoint bulunamadı!")
@@ -297,6 +326,8 @@ def main():
     
     model.to(device)
     model.eval()
+    if memory is not None:
+        memory.checkpoint('model_load')
     
     # Dataset'leri oluştur
     data_path = Path(config['data']['dataset_path'])
@@ -305,13 +336,13 @@ def main():
     print("TEST SETİ TEST EDİLİYOR")
     print("="*80)
     test_dataset = MedicineDataset(data_path, split='test', processor=processor, class_names=class_names)
-    test_results = test_model(model, processor, test_dataset, class_names, "Test")
+    test_results = test_model(model, processor, test_dataset, class_names, "Test", memory=memory)
     
     print("\n" + "="*80)
     print("VALIDATION SETİ TEST EDİLİYOR")
     print("="*80)
     val_dataset = MedicineDataset(data_path, split='valid', processor=processor, class_names=class_names)
-    val_results = test_model(model, processor, val_dataset, class_names, "Validation")
+    val_results = test_model(model, processor, val_dataset, class_names, "Validation", memory=memory)
     
     # Sonuçları yazdır
     print("\n" + "="*80)
@@ -323,6 +354,7 @@ def main():
     print(f"F1 Score: {test_results['f1_weighted']:.4f}")
     print(f"Doğru: {test_results['correct_predictions']}/{test_results['total_samples']}")
     print(f"Yanlış: {test_results['wrong_predictions']}/{test_results['total_samples']}")
+    print(f"Hız: {test_results['images_per_second']:.1f} görüntü/s")
     
     print("\n" + "="*80)
     print("VALIDATION SETİ SONUÇLARI")
@@ -333,6 +365,7 @@ def main():
     print(f"F1 Score: {val_results['f1_weighted']:.4f}")
     print(f"Doğru: {val_results['correct_predictions']}/{val_results['total_samples']}")
     print(f"Yanlış: {val_results['wrong_predictions']}/{val_results['total_samples']}")
+    print(f"Hız: {val_results['images_per_second']:.1f} görüntü/s")
     
     # Sınıf bazında özet
     print("\n" + "="*80)
@@ -348,8 +381,14 @@ def main():
         for error in test_results['errors'][:5]:
             print(f"  {Path(error['image_path']).name}: {error['true_class']} -> {error['predicted_class']} (güven: {error['confidence']:.4f})")
     
+    # Bellek raporu
+    memory_report = None
+    if memory is not None:
+        memory_report = memory.report()
+        print("\n" + memory_report)
+    
     # Rapor oluştur
-    generate_report(test_results, val_results, class_names)
+    generate_report(test_results, val_results, class_names, memory_report=memory_report)
     
     print("\n" + "="*80)
     print("TEST TAMAMLANDI!")
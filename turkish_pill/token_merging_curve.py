@@ -0,0 +1,141 @@
+"""
+Token Merging Dogruluk / Gecikme Egrisi
+Farkli birlestirme oranlari icin validation setinde dogrulugu, FP32 (oran 0)
+ile top-1 uyumu ve gecikmeyi olcer. Opsiyonel olarak her oran ONNX'e export
+edilip ONNX Runtime ile de olculur.
+
+Kullanim:
+    python token_merging_curve.py --ratios 0,0.05,0.1,0.15 --onnx
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from transformers import ViTForImageClassification, ViTImageProcessor
+
+from compare_artifacts import (
+    SHARED_SRC, load_config, load_class_names, load_validation_sample,
+    run_batched, pytorch_forward, onnx_forward, summarize,
+)
+from checkpoints import resolve_checkpoint
+
+if str(SHARED_SRC) not in sys.path:
+    sys.path.append(str(SHARED_SRC))
+from token_merging import apply_token_merging, token_schedule
+
+def relative_compute(model, ratio):
+    """Katman basina token sayilarindan kaba encoder hesap orani (oran 0 = 1.0)"""
+    num_layers = model.config.num_hidden_layers
+    num_tokens = (model.config.image_size // model.config.patch_size) ** 2 + 1
+    counts, _ = token_schedule(num_tokens, num_layers, ratio)
+    return sum(counts) / (num_tokens * num_layers), counts[-1]
+
+def format_curve(rows):
+    """Markdown tablo"""
+    lines = [
+        "| Oran | Son katman token | Hesap | Acc | Top-1 Uyum | PyTorch ms | Hizlanma | ONNX ms | ONNX Uyum |",
+        "|" + "---|" * 9,
+    ]
+    baseline_ms = rows[0]['pytorch']['ms_per_image']
+    for r in rows:
+        onnx_row = r.get('onnx')
+        onnx_ms = f"{onnx_row['ms_per_image']:.2f}" if onnx_row else "-"
+        onnx_agree = f"{onnx_row['top1_agreement']:.4f}" if onnx_row else "-"
+        lines.append(
+            f"| {r['ratio']:.3f} | {r['final_tokens']} | {r['relative_compute']:.2f} "
+            f"| {r['pytorch']['accuracy']:.4f} | {r['pytorch']['top1_agreement']:.4f} "
+            f"| {r['pytorch']['ms_per_image']:.2f} | {baseline_ms / r['pytorch']['ms_per_image']:.2f}x "
+            f"| {onnx_ms} | {onnx_agree} |"
+        )
+    return '\n'.join(lines)
+
+def main():
+    """Ana fonksiyon"""
+    parser = argparse.ArgumentParser(description="Token merging dogruluk / gecikme egrisi")
+    parser.add_argument('--checkpoint', help="PyTorch checkpoint (varsayilan: config / en son)")
+    parser.add_argument('--ratios', default='0,0.025,0.05,0.075,0.1,0.125,0.15',
+                        help="Virgulle ayrilmis birlestirme oranlari (ilk deger referans olmali: 0)")
+    parser.add_argument('--samples', type=int, default=512, help="Validation ornek sayisi")
+    parser.add_argument('--batch-size', type=int, default=1, help="Tek crop gecikmesi icin 1")
+    parser.add_argument('--split', default='valid')
+    parser.add_argument('--onnx', action='store_true', help="Her orani ONNX'e export edip ORT ile de olc")
+    parser.add_argument('--output', default='token_merging_curve.md')
+    args = parser.parse_args()
+
+    ratios = [float(r) for r in args.ratios.split(',') if r.strip()]
+    if ratios[0] != 0.0:
+        ratios.insert(0, 0.0)
+
+    config = load_config()
+    models_dir = Path(config['models']['classification'])
+    class_names = load_class_names(config['data']['data_yaml'])
+    checkpoint = resolve_checkpoint(models_dir, args.checkpoint or config['models'].get('checkpoint'))
+
+    print("=" * 70)
+    print("Token Merging Egrisi")
+    print("=" * 70)
+    print(f"Checkpoint: {checkpoint}")
+
+    model = ViTForImageClassification.from_pretrained(str(checkpoint))
+    model.eval()
+    processor = ViTImageProcessor.from_pretrained(config['classification']['model_name'])
+    pixel_values, labels = load_validation_sample(
+        config['data']['dataset_path'], class_names, processor, max_samples=args.samples, split=args.split
+    )
+
+    rows = []
+    reference_logits = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for ratio in ratios:
+            merging = apply_token_merging(model, ratio)
+            try:
+                logits, batch_times = run_batched(pytorch_forward(model), pixel_values, args.batch_size)
+                if reference_logits is None:
+                    reference_logits = logits
+                compute, final_tokens = relative_compute(model, ratio)
+                row = {
+                    'ratio': ratio,
+                    'final_tokens': final_tokens,
+                    'relative_compute': compute,
+                    'pytorch': summarize(f'tm{ratio}', logits, batch_times, labels, reference_logits, 0.0),
+                }
+
+                if args.onnx:
+                    from convert_to_onnx import convert_to_onnx
+                    onnx_path = Path(tmp_dir) / f"tm_{ratio}.onnx"
+                    if convert_to_onnx(model, processor, onnx_path):
+                        onnx_logits, onnx_times = run_batched(onnx_forward(onnx_path), pixel_values, args.batch_size)
+                        row['onnx'] = summarize(f'tm{ratio}_onnx', onnx_logits, onnx_times, labels,
+                                                reference_logits, 0.0)
+            finally:
+                if merging is not None:
+                    merging.remove()
+
+            rows.append(row)
+            print(f"   oran {ratio:.3f}: acc {row['pytorch']['accuracy']:.4f}, "
+                  f"{row['pytorch']['ms_per_image']:.2f} ms/goruntu, son katman {final_tokens} token")
+
+    table = format_curve(rows)
+    print("\n" + table)
+
+    report = [
+        "# Token Merging Egrisi\n",
+        f"- Checkpoint: `{checkpoint}`",
+        f"- Ornek: {len(labels)} goruntu ({args.split}), batch {args.batch_size}",
+        f"- Uyum referansi: oran 0 (token merging yok)",
+        f"- Hesap: encoder token-katman toplaminin orana gore payi (MLP/projeksiyon icin dogrusal)\n",
+        table,
+        "",
+        f"Secilen oran `config.yaml` icinde `classification.token_merging_ratio` olarak ayarlanir.",
+    ]
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(report) + '\n')
+    with open(Path(args.output).with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2)
+    print(f"\n[OK] Rapor kaydedildi: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -19,8 +19,15 @@ import numpy as np
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix
 from collections import Counter
 import os
+import sys
 from tqdm import tqdm
 
+# Ortak yardımcılar (early-exit) ilacverisi/src altında
+SHARED_SRC = Path(__file__).resolve().parent.parent / 'ilacverisi' / 'src'
+if str(SHARED_SRC) not in sys.path:
+    sys.path.append(str(SHARED_SRC))
+from early_exit import ViTEarlyExitForImageClassification, exit_head_loss
+
 # CUDA ayarları - RTX 5060 için
 torch.backends.cudnn.benchmark = True
 # CUDA ayarları - RTX 5060 için
@@ -156,6 +163,28 @@ def compute_metrics(eval_pred):
         'f1': f1
     }
 
+class WeightedTrainer(Trainer):
+    """Class weight'li CrossEntropy loss ile Trainer (imbalanced data için)"""
+    
+    def __init__(self, *args, class_weights=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.class_weights = class_weights
+    
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        labels = inputs.get("labels")
+        outputs = model(**inputs)
+        logits = outputs.get("logits")
+        
+        if self.class_weights is not None:
+            loss_fct = torch.nn.CrossEntropyLoss(weight=self.class_weights.to(logits.device))
+        else:
+            loss_fct = torch.nn.CrossEntropyLoss()
+        
+        loss = loss_fct(logits.view(-1, logits.shape[-1]), labels.view(-1))
+        # Early-exit modelde ara head'ler de aynı loss ile eğitilir
+        loss = exit_head_loss(loss, outputs.get("exit_logits"), labels, loss_fct)
+        return (loss, outputs) if return_outputs else loss
+
 def train_vit_model():
     """ViT classification modelini eğit"""
     config = load_config()
@@ -181,11 +210,22 @@ def train_vit_model():
     print(f"Model yükleniyor: {model_name}")
     
     processor = ViTImageProcessor.from_pretrained(model_name)
-    model = ViTForImageClassification.from_pretrained(
-        model_name,
-        num_labels=num_classes,
-        ignore_mismatched_sizes=True
-    )
+    early_exit = config['classification'].get('early_exit') or {}
+    if early_exit.get('enabled'):
+        # Ara katman head'leri ana head ile birlikte eğitilir
+        print(f"Early-exit head'leri: katman {early_exit['layers']}")
+        model = ViTEarlyExitForImageClassification.from_pretrained(
+            model_name,
+            num_labels=num_classes,
+            ignore_mismatched_sizes=True,
+            early_exit_layers=early_exit['layers'],
+        )
+    else:
+        model = ViTForImageClassification.from_pretrained(
+            model_name,
+            num_labels=num_classes,
+            ignore_mismatched_sizes=True
+        )
     
     # Modeli GPU'ya taşı
     model.to(device)
@@ -220,21 +260,6 @@ def train_vit_model():
         augment=False
     )
     
-    # Custom loss function (class weights ile)
-    class WeightedTrainer(Trainer):
-        def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
-            labels = inputs.get("labels")
-            outputs = model(**inputs)
-            logits = outputs.get("logits")
-            
-            if class_weights is not None:
-                loss_fct = torch.nn.CrossEntropyLoss(weight=class_weights.to(device))
-            else:
-                loss_fct = torch.nn.CrossEntropyLoss()
-            
-            loss = loss_fct(logits.view(-1, num_classes), labels.view(-1))
-            return (loss, outputs) if return_outputs else loss
-    
     # Training arguments
     output_dir = Path(config['classification']['save_dir'])
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -267,6 +292,7 @@ def train_vit_model():
         train_dataset=train_dataset,
         eval_dataset=valid_dataset,
         compute_metrics=compute_metrics,
+        class_weights=class_weights,
     )
     
     # Eğitimi başlat